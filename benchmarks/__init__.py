@@ -0,0 +1 @@
+"""Offline tooling for benchmarking the exporter without a live org."""
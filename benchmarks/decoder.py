@@ -0,0 +1,106 @@
+"""Benchmark decoding REST query pages into a DataFrame.
+
+Renders ``--rows`` synthetic ``ps__Lead__c`` records as REST pages (the
+same JSON-shaped dicts :mod:`benchmarks.fake_salesforce` serves) and times
+:class:`salesforce_exporter.decoder.RecordColumnsDecoder` against the
+previous per-page ``DataFrame.from_records`` construction, checking that
+both produce the same frame::
+
+    python -m benchmarks.decoder --rows 120000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from salesforce_exporter.decoder import RecordColumnsDecoder
+
+from .fake_salesforce import SoqlEvaluator
+from .synthetic import generate
+
+FIELDS = [
+    "Id",
+    "Name",
+    "ps__No__c",
+    "ps__EntryTime__c",
+    "ps__ReservedDate__c",
+    "ps__ReservedStatus__c",
+    "ps__PmsEmailDelDateTime__c",
+    "ps__StayPersons__c",
+    "ps__ChildFA__c",
+    "ps__email__c",
+    "ps__Field2__c",
+    "LastModifiedDate",
+    "SystemModstamp",
+    "ps__Field310__c",
+    "ps__Relcontact__c",
+]
+
+Page = List[Dict[str, Any]]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark REST page decoding")
+    parser.add_argument("--rows", type=int, default=120_000, help="Number of records")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--page-size", type=int, default=2000, help="Records per page")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation")
+    return parser.parse_args()
+
+
+def render_pages(rows: int, seed: int, page_size: int) -> List[Page]:
+    objects = generate(rows, seed=seed)
+    evaluator = SoqlEvaluator(objects)
+    leads = objects["ps__Lead__c"]
+    records = evaluator.render_records(leads, np.arange(leads.size), FIELDS)
+    return [records[start : start + page_size] for start in range(0, len(records), page_size)]
+
+
+def legacy_frame(pages: List[Page]) -> pd.DataFrame:
+    """The per-page construction _fetch_rest used before the decoder."""
+
+    frames = [
+        pd.DataFrame.from_records(records, exclude=["attributes"]) for records in pages
+    ]
+    return pd.concat(frames, ignore_index=True).infer_objects()
+
+
+def decoder_frame(pages: List[Page]) -> pd.DataFrame:
+    decoder = RecordColumnsDecoder(FIELDS, sum(len(records) for records in pages))
+    for records in pages:
+        decoder.add_page(records)
+    return decoder.to_frame()
+
+
+def best_of(repeat: int, build: Callable[[List[Page]], pd.DataFrame], pages: List[Page]):
+    timings = []
+    frame = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        frame = build(pages)
+        timings.append(time.perf_counter() - started)
+    return min(timings), frame
+
+
+def main() -> None:
+    args = parse_args()
+    pages = render_pages(args.rows, args.seed, args.page_size)
+    rows = sum(len(records) for records in pages)
+    print(f"{rows:,} records in {len(pages):,} page(s) of {len(FIELDS)} field(s)")
+
+    legacy_seconds, expected = best_of(args.repeat, legacy_frame, pages)
+    decoder_seconds, actual = best_of(args.repeat, decoder_frame, pages)
+    pd.testing.assert_frame_equal(actual, expected)
+
+    print(f"from_records + concat: {legacy_seconds:.3f}s")
+    print(f"RecordColumnsDecoder:  {decoder_seconds:.3f}s")
+    print(f"Speed-up: {legacy_seconds / decoder_seconds:.2f}x (frames identical)")
+
+
+if __name__ == "__main__":
+    main()
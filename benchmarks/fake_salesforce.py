@@ -0,0 +1,873 @@
+"""Local stand-in for the Salesforce endpoints used by the exporter.
+
+Serves the SOAP username/password login, REST ``query``/``queryMore``,
+``describe`` and (optionally) Bulk API 2.0 query jobs over HTTPS from
+:mod:`benchmarks.synthetic` data, so exports can be benchmarked and
+profiled without an org::
+
+    python -m benchmarks.fake_salesforce --scale 100000
+
+then point a config at it with ``salesforce.login_url`` and trust its
+self-signed certificate through ``REQUESTS_CA_BUNDLE`` (both printed on
+start-up). ``Salesforce(instance="127.0.0.1:8443", session_id=...)`` works
+as well.
+
+Only the SOQL the exporter generates is understood: ``AND``-joined
+comparisons (parenthesized groups included), ``IN``/``NOT IN`` lists and
+semi-joins, ``DAY_ONLY()`` and the common date literals,
+``COUNT()``/``COUNT``/``MIN``/``MAX`` aggregates, parent relationship
+fields and ``LIMIT``. Other predicates are ignored with a warning.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import ipaddress
+import itertools
+import json
+import logging
+import re
+import ssl
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from salesforce_exporter.soql import split_select
+
+from .synthetic import EPOCH_ORDINAL, SECONDS_PER_DAY, Column, SyntheticObject, generate
+
+LOGGER = logging.getLogger(__name__)
+
+API_VERSION_PATTERN = re.compile(r"^/services/data/v(?P<version>[\d.]+)/(?P<rest>.*)$")
+AGGREGATE_PATTERN = re.compile(
+    r"^(?P<function>COUNT|COUNT_DISTINCT|MIN|MAX)\((?P<field>[\w.]*)\)\s*(?P<alias>\w+)?$",
+    re.IGNORECASE,
+)
+IN_PATTERN = re.compile(
+    r"^(?P<field>\w+)\s+(?P<negated>NOT\s+)?IN\s*\((?P<values>.*)\)$",
+    re.IGNORECASE | re.DOTALL,
+)
+COMPARISON_PATTERN = re.compile(
+    r"^(?P<day_only>DAY_ONLY\()?(?P<field>\w+)\)?\s*(?P<op>=|!=|<>|<=|>=|<|>)\s*"
+    r"(?P<value>.+)$",
+    re.IGNORECASE | re.DOTALL,
+)
+DATE_LITERAL_PATTERN = re.compile(
+    r"^(?P<name>N_DAYS_AGO|NEXT_N_DAYS|LAST_N_DAYS):(?P<n>\d+)$", re.IGNORECASE
+)
+DEFAULT_API_LIMIT = 1_000_000
+# Value used for comparisons that can never match (unknown id prefix etc.).
+NO_MATCH = -2
+
+
+class SoqlError(ValueError):
+    """Raised for statements Salesforce would reject; carries its error code."""
+
+    def __init__(self, code: str, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+@dataclass
+class QueryResult:
+    sobject: SyntheticObject
+    fields: List[str]
+    rows: np.ndarray
+    aggregate: Optional[Dict[str, Any]] = None
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    """Split *text* on the keyword *separator* outside quotes and parentheses."""
+
+    parts: List[str] = []
+    depth = 0
+    quoted = False
+    start = 0
+    index = 0
+    pattern = re.compile(rf"\s+{separator}\s+", re.IGNORECASE)
+    while index < len(text):
+        char = text[index]
+        if quoted:
+            if char == "\\":
+                index += 1
+            elif char == "'":
+                quoted = False
+        elif char == "'":
+            quoted = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and char.isspace():
+            match = pattern.match(text, index)
+            if match:
+                parts.append(text[start:index])
+                start = index = match.end()
+                continue
+        index += 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _strip_parentheses(text: str) -> str:
+    text = text.strip()
+    while text.startswith("(") and text.endswith(")"):
+        depth = 0
+        for index, char in enumerate(text):
+            depth += char == "("
+            depth -= char == ")"
+            if depth == 0 and index < len(text) - 1:
+                return text
+        text = text[1:-1].strip()
+    return text
+
+
+def _parse_string_literals(text: str) -> List[str]:
+    return [
+        value.replace("\\'", "'").replace("\\\\", "\\")
+        for value in re.findall(r"'((?:[^'\\]|\\.)*)'", text)
+    ]
+
+
+class SoqlEvaluator:
+    """Evaluate exporter-style SOQL against synthetic objects."""
+
+    def __init__(self, objects: Dict[str, SyntheticObject], today: Optional[date] = None):
+        self.objects = {name.lower(): obj for name, obj in objects.items()}
+        self.prefixes = {obj.name: obj.prefix for obj in objects.values()}
+        self.today = today or datetime.now(timezone.utc).date()
+        self._warned: set = set()
+
+    # -- statement -------------------------------------------------------
+
+    def execute(self, soql: str) -> QueryResult:
+        parts = split_select(soql)
+        if parts is None:
+            raise SoqlError("MALFORMED_QUERY", f"Unsupported statement: {soql[:200]}")
+        fields, sobject_name, remainder = parts
+        sobject = self.objects.get(sobject_name.lower())
+        if sobject is None:
+            raise SoqlError(
+                "INVALID_TYPE",
+                f"sObject type '{sobject_name}' is not supported.",
+            )
+
+        where, limit = self._split_clauses(remainder)
+        rows = np.arange(sobject.size, dtype=np.int64)
+        if where:
+            rows = rows[self._where_mask(sobject, where)]
+        if limit is not None:
+            rows = rows[:limit]
+
+        aggregates = [AGGREGATE_PATTERN.match(field) for field in fields]
+        if all(aggregates):
+            return QueryResult(
+                sobject, fields, rows, self._aggregate(sobject, rows, aggregates)
+            )
+        for field in fields:
+            self._resolve_path(sobject, field)
+        return QueryResult(sobject, fields, rows)
+
+    @staticmethod
+    def _split_clauses(remainder: str) -> Tuple[str, Optional[int]]:
+        text = remainder.strip()
+        limit = None
+        match = re.search(r"\s+LIMIT\s+(\d+)\s*$", " " + text, re.IGNORECASE)
+        if match:
+            limit = int(match.group(1))
+            text = (" " + text)[: match.start()].strip()
+        text = re.split(r"\s+ORDER\s+BY\s+", " " + text, flags=re.IGNORECASE)[0].strip()
+        if text.upper().startswith("WHERE"):
+            text = text[5:].strip()
+        elif text:
+            raise SoqlError("MALFORMED_QUERY", f"Unexpected clause: {text[:200]}")
+        return text, limit
+
+    def _aggregate(
+        self, sobject: SyntheticObject, rows: np.ndarray, matches: List[Any]
+    ) -> Dict[str, Any]:
+        record: Dict[str, Any] = {}
+        for index, match in enumerate(matches):
+            function = match.group("function").upper()
+            alias = match.group("alias") or f"expr{index}"
+            field = match.group("field")
+            if function == "COUNT" and not field:
+                return {"count": len(rows)}
+            column = self._column(sobject, field)
+            values = column.values[rows]
+            present = self._not_null(column, values)
+            if function == "COUNT":
+                record[alias] = int(present.sum())
+            elif function == "COUNT_DISTINCT":
+                record[alias] = int(len(np.unique(values[present])))
+            elif not present.any():
+                record[alias] = None
+            else:
+                position = np.argmax if function == "MAX" else np.argmin
+                candidates = rows[present]
+                best = candidates[position(column.values[candidates])]
+                record[alias] = column.render(np.array([best]), self.prefixes)[0]
+        return record
+
+    # -- fields ----------------------------------------------------------
+
+    def _column(self, sobject: SyntheticObject, name: str) -> Column:
+        for column_name, column in sobject.columns.items():
+            if column_name.lower() == name.lower():
+                return column
+        raise SoqlError(
+            "INVALID_FIELD",
+            f"No such column '{name}' on entity '{sobject.name}'.",
+        )
+
+    def canonical_name(self, sobject: SyntheticObject, name: str) -> str:
+        for column_name in sobject.columns:
+            if column_name.lower() == name.lower():
+                return column_name
+        return name
+
+    def _relationship(self, sobject: SyntheticObject, name: str) -> Tuple[str, Column]:
+        for column_name, column in sobject.columns.items():
+            if (column.relationship or "").lower() == name.lower():
+                return column.relationship or name, column
+        raise SoqlError(
+            "INVALID_FIELD",
+            f"Didn't understand relationship '{name}' on entity '{sobject.name}'.",
+        )
+
+    def _resolve_path(self, sobject: SyntheticObject, path: str) -> None:
+        parts = path.split(".")
+        for part in parts[:-1]:
+            _, column = self._relationship(sobject, part)
+            sobject = self.objects[(column.target or "").lower()]
+        self._column(sobject, parts[-1])
+
+    def render_records(
+        self, sobject: SyntheticObject, rows: np.ndarray, fields: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Render *rows* as REST records, nesting parent relationship fields."""
+
+        columns: Dict[str, List[Any]] = {}
+        nested: Dict[str, List[str]] = {}
+        for field in fields:
+            head, _, rest = field.partition(".")
+            if rest:
+                nested.setdefault(head.lower(), []).append(rest)
+            else:
+                name = self.canonical_name(sobject, field)
+                columns[name] = self._column(sobject, field).render(rows, self.prefixes)
+
+        for head, rest_fields in nested.items():
+            relationship, column = self._relationship(sobject, head)
+            parent = self.objects[(column.target or "").lower()]
+            parent_rows = column.values[rows]
+            present = parent_rows >= 0
+            rendered = self.render_records(parent, parent_rows[present], rest_fields)
+            values: List[Any] = [None] * len(rows)
+            for index, record in zip(np.flatnonzero(present), rendered):
+                values[index] = record
+            columns[relationship] = values
+
+        attributes_type = sobject.name
+        names = list(columns)
+        return [
+            dict(
+                {"attributes": {"type": attributes_type}},
+                **{name: columns[name][index] for name in names},
+            )
+            for index in range(len(rows))
+        ]
+
+    def render_csv(self, sobject: SyntheticObject, rows: np.ndarray, fields: List[str]) -> str:
+        """Render *rows* as Bulk API 2.0 CSV with dotted relationship headers."""
+
+        records = self.render_records(sobject, rows, fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(fields)
+        for record in records:
+            line = []
+            for field in fields:
+                value: Any = record
+                for part in field.split("."):
+                    if not isinstance(value, dict):
+                        value = None
+                        break
+                    value = next(
+                        (item for key, item in value.items() if key.lower() == part.lower()),
+                        None,
+                    )
+                if value is None:
+                    line.append("")
+                elif isinstance(value, bool):
+                    line.append("true" if value else "false")
+                else:
+                    line.append(value)
+            writer.writerow(line)
+        return buffer.getvalue()
+
+    # -- predicates ------------------------------------------------------
+
+    def _where_mask(self, sobject: SyntheticObject, where: str) -> np.ndarray:
+        mask = np.ones(sobject.size, dtype=bool)
+        if _split_top_level(where, "OR") != [where.strip()]:
+            self._warn(f"OR is not supported; ignoring condition {where!r}")
+            return mask
+        for part in _split_top_level(where, "AND"):
+            predicate = _strip_parentheses(part)
+            if predicate != part:
+                # A parenthesized group such as ``(A AND B) AND C``.
+                mask &= self._where_mask(sobject, predicate)
+            else:
+                mask &= self._predicate_mask(sobject, predicate)
+        return mask
+
+    def _predicate_mask(self, sobject: SyntheticObject, predicate: str) -> np.ndarray:
+        match = IN_PATTERN.match(predicate)
+        if match:
+            column = self._column(sobject, match.group("field"))
+            mask = self._in_mask(column, match.group("values").strip())
+            return ~mask if match.group("negated") else mask
+
+        match = COMPARISON_PATTERN.match(predicate)
+        if match:
+            column = self._column(sobject, match.group("field"))
+            return self._compare(
+                column,
+                match.group("op"),
+                match.group("value").strip(),
+                day_only=bool(match.group("day_only")),
+            )
+
+        self._warn(f"Ignoring unsupported predicate {predicate!r}")
+        return np.ones(sobject.size, dtype=bool)
+
+    def _in_mask(self, column: Column, values_text: str) -> np.ndarray:
+        if values_text.upper().startswith("SELECT"):
+            result = self.execute(values_text)
+            sub_column = self._column(result.sobject, result.fields[0])
+            if (
+                column.kind in ("id", "reference")
+                and sub_column.kind in ("id", "reference")
+                and column.target == sub_column.target
+            ):
+                wanted = sub_column.values[result.rows]
+                return np.isin(column.values, wanted[wanted >= 0])
+            literals = set(sub_column.render(result.rows, self.prefixes))
+        else:
+            literals = set(_parse_string_literals(values_text))
+        keys = {self._key(column, literal) for literal in literals}
+        keys.discard(NO_MATCH)
+        if column.kind == "label":
+            rendered = column.render(np.arange(len(column.values)), self.prefixes)
+            return np.fromiter((value in literals for value in rendered), bool, len(rendered))
+        return np.isin(column.values, np.array(sorted(keys)))
+
+    def _key(self, column: Column, literal: str) -> Any:
+        """Map a string literal into the column's stored representation."""
+
+        if column.kind in ("id", "reference"):
+            prefix = self.prefixes[column.target or ""]
+            digits = literal[len(prefix):]
+            if literal.startswith(prefix) and digits.isdigit():
+                return int(digits)
+            return NO_MATCH
+        if column.kind == "picklist":
+            return column.choices.index(literal) if literal in column.choices else NO_MATCH
+        return literal
+
+    def _compare(
+        self, column: Column, op: str, literal: str, *, day_only: bool
+    ) -> np.ndarray:
+        values = column.values
+        if literal.lower() == "null":
+            null = ~self._not_null(column, values)
+            return null if op == "=" else ~null
+
+        low, high = self._literal_range(column, literal, day_only=day_only)
+        if column.kind == "datetime" and day_only:
+            values = np.where(values >= 0, values // SECONDS_PER_DAY, -1)
+        if column.kind == "label":
+            values = np.array(column.render(np.arange(len(values)), self.prefixes), dtype=object)
+
+        present = self._not_null(column, column.values)
+        if op == "=":
+            result = (values >= low) & (values <= high)
+        elif op in ("!=", "<>"):
+            result = ~((values >= low) & (values <= high))
+        elif op == "<":
+            result = values < low
+        elif op == "<=":
+            result = values <= high
+        elif op == ">":
+            result = values > high
+        else:
+            result = values >= low
+        return np.asarray(result, dtype=bool) & present
+
+    def _literal_range(self, column: Column, literal: str, *, day_only: bool) -> Tuple[Any, Any]:
+        """Return the inclusive (low, high) range a literal denotes for *column*."""
+
+        if literal.startswith("'"):
+            values = _parse_string_literals(literal)
+            key = self._key(column, values[0] if values else "")
+            return key, key
+        if column.kind == "boolean":
+            value = literal.lower() == "true"
+            return value, value
+        if column.kind in ("int", "double"):
+            number = float(literal)
+            return number, number
+        if column.kind in ("date", "datetime"):
+            first, last = self._date_range(literal)
+            if column.kind == "datetime" and not day_only:
+                if "T" in literal:
+                    instant = _parse_datetime(literal)
+                    return instant, instant
+                return first * SECONDS_PER_DAY, last * SECONDS_PER_DAY + SECONDS_PER_DAY - 1
+            return first, last
+        key = self._key(column, literal)
+        return key, key
+
+    def _date_range(self, literal: str) -> Tuple[int, int]:
+        """Inclusive epoch-day range of a date literal such as ``NEXT_N_DAYS:7``."""
+
+        today = self.today.toordinal() - EPOCH_ORDINAL
+        upper = literal.upper()
+        fixed = {"TODAY": 0, "YESTERDAY": -1, "TOMORROW": 1}
+        if upper in fixed:
+            return today + fixed[upper], today + fixed[upper]
+        match = DATE_LITERAL_PATTERN.match(literal)
+        if match:
+            n = int(match.group("n"))
+            name = match.group("name").upper()
+            if name == "N_DAYS_AGO":
+                return today - n, today - n
+            if name == "NEXT_N_DAYS":
+                return today + 1, today + n
+            return today - n, today
+        if "T" in literal:
+            day = _parse_datetime(literal) // SECONDS_PER_DAY
+            return day, day
+        day = date.fromisoformat(literal).toordinal() - EPOCH_ORDINAL
+        return day, day
+
+    @staticmethod
+    def _not_null(column: Column, values: np.ndarray) -> np.ndarray:
+        if column.kind in ("id", "reference", "picklist", "datetime", "date"):
+            return values >= 0
+        if column.kind in ("int", "double"):
+            return ~np.isnan(values)
+        return np.ones(len(values), dtype=bool)
+
+    def _warn(self, message: str) -> None:
+        if message not in self._warned:
+            self._warned.add(message)
+            LOGGER.warning(message)
+
+
+def _parse_datetime(literal: str) -> int:
+    text = literal.strip().replace("Z", "+00:00")
+    text = re.sub(r"([+-]\d{2})(\d{2})$", r"\1:\2", text)
+    return int(datetime.fromisoformat(text).timestamp())
+
+
+# -- HTTP ------------------------------------------------------------------
+
+
+SOAP_LOGIN_RESPONSE = """<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
+  xmlns="urn:partner.soap.sforce.com"><soapenv:Body><loginResponse><result>
+<serverUrl>{server_url}</serverUrl><sessionId>{session_id}</sessionId>
+</result></loginResponse></soapenv:Body></soapenv:Envelope>"""
+
+
+class FakeSalesforceServer:
+    """HTTPS server answering the exporter's Salesforce calls from synthetic data.
+
+    Use as a context manager or call :meth:`start`/:meth:`stop`. *latency*
+    seconds are added to every response to mimic a remote org.
+    """
+
+    def __init__(
+        self,
+        objects: Dict[str, SyntheticObject],
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        page_size: int = 2000,
+        latency: float = 0.0,
+        bulk2: bool = True,
+        api_limit: int = DEFAULT_API_LIMIT,
+        certificate_directory: Optional[Path] = None,
+    ) -> None:
+        self.evaluator = SoqlEvaluator(objects)
+        self.page_size = page_size
+        self.latency = latency
+        self.bulk2 = bulk2
+        self.api_limit = api_limit
+        self.api_calls = 0
+        self.session_id = "00D000000000001!FAKE"
+        self._lock = threading.Lock()
+        self._cursors: Dict[str, Tuple[QueryResult, int]] = {}
+        self._jobs: Dict[str, QueryResult] = {}
+        self._counter = itertools.count(1)
+
+        directory = certificate_directory or Path(tempfile.mkdtemp(prefix="fake-sf-"))
+        self.certificate, key = _self_signed_certificate(directory, host)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.certificate, key)
+
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def instance(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def login_url(self) -> str:
+        return f"https://{self.instance}"
+
+    def start(self) -> "FakeSalesforceServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-salesforce", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeSalesforceServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def expire_sessions(self) -> None:
+        """Invalidate the current session so clients must log in again."""
+
+        with self._lock:
+            self.session_id = f"00D000000000001!FAKE{next(self._counter)}"
+
+    # -- request handling, called from _Handler ---------------------------
+
+    def count_call(self) -> int:
+        with self._lock:
+            self.api_calls += 1
+            return self.api_calls
+
+    def login(self) -> str:
+        return SOAP_LOGIN_RESPONSE.format(
+            server_url=f"{self.login_url}/services/Soap/u/59.0/00D000000000001",
+            session_id=self.session_id,
+        )
+
+    def query(self, soql: str, version: str) -> Dict[str, Any]:
+        result = self.evaluator.execute(soql)
+        if result.aggregate is not None:
+            if "count" in result.aggregate and len(result.aggregate) == 1:
+                return {"totalSize": result.aggregate["count"], "done": True, "records": []}
+            record = dict({"attributes": {"type": "AggregateResult"}}, **result.aggregate)
+            return {"totalSize": 1, "done": True, "records": [record]}
+        return self._page(result, 0, version)
+
+    def query_more(self, cursor: str, version: str) -> Dict[str, Any]:
+        with self._lock:
+            state = self._cursors.pop(cursor, None)
+        if state is None:
+            raise SoqlError("INVALID_QUERY_LOCATOR", "invalid query locator")
+        return self._page(state[0], state[1], version)
+
+    def _page(self, result: QueryResult, start: int, version: str) -> Dict[str, Any]:
+        end = min(start + self.page_size, len(result.rows))
+        response: Dict[str, Any] = {
+            "totalSize": len(result.rows),
+            "done": end >= len(result.rows),
+            "records": self.evaluator.render_records(
+                result.sobject, result.rows[start:end], result.fields
+            ),
+        }
+        if not response["done"]:
+            cursor = f"01g{next(self._counter):015d}-{end}"
+            with self._lock:
+                self._cursors[cursor] = (result, end)
+            response["nextRecordsUrl"] = f"/services/data/v{version}/query/{cursor}"
+        return response
+
+    def describe(self, sobject_name: str) -> Dict[str, Any]:
+        sobject = self.evaluator.objects.get(sobject_name.lower())
+        if sobject is None:
+            raise SoqlError("NOT_FOUND", "The requested resource does not exist")
+        fields = []
+        for name, column in sobject.columns.items():
+            fields.append(
+                {
+                    "name": name,
+                    "type": column.salesforce_type,
+                    "length": column.length if column.kind == "label" else 0,
+                    "relationshipName": column.relationship,
+                    "referenceTo": [column.target] if column.kind == "reference" else [],
+                }
+            )
+        return {"name": sobject.name, "fields": fields}
+
+    def create_job(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        result = self.evaluator.execute(payload.get("query", ""))
+        if result.aggregate is not None:
+            raise SoqlError("API_ERROR", "Aggregate queries are not supported by Bulk API 2.0")
+        job_id = f"750{next(self._counter):015d}"
+        with self._lock:
+            self._jobs[job_id] = result
+        return self.job_info(job_id, state="UploadComplete")
+
+    def job_info(self, job_id: str, state: str = "JobComplete") -> Dict[str, Any]:
+        with self._lock:
+            result = self._jobs.get(job_id)
+        if result is None:
+            raise SoqlError("NOT_FOUND", "The requested resource does not exist")
+        return {
+            "id": job_id,
+            "operation": "query",
+            "object": result.sobject.name,
+            "state": state,
+            "numberRecordsProcessed": len(result.rows),
+        }
+
+    def job_results(self, job_id: str, locator: str, max_records: int) -> Tuple[str, str, int]:
+        with self._lock:
+            result = self._jobs.get(job_id)
+        if result is None:
+            raise SoqlError("NOT_FOUND", "The requested resource does not exist")
+        start = int(locator or 0)
+        end = min(start + max_records, len(result.rows))
+        body = self.evaluator.render_csv(result.sobject, result.rows[start:end], result.fields)
+        next_locator = str(end) if end < len(result.rows) else "null"
+        return body, next_locator, end - start
+
+    def delete_job(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeSalesforceServer
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        LOGGER.debug("%s " + format, self.address_string(), *args)
+
+    def do_GET(self) -> None:  # noqa: N802
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:  # noqa: N802
+        self._dispatch("POST")
+
+    def do_PATCH(self) -> None:  # noqa: N802
+        self._dispatch("PATCH")
+
+    def do_DELETE(self) -> None:  # noqa: N802
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+
+        url = urlsplit(self.path)
+        if url.path.startswith("/services/Soap/u/") and method == "POST":
+            self._send(200, self.fake.login().encode("utf-8"), "text/xml")
+            return
+
+        match = API_VERSION_PATTERN.match(url.path)
+        if match is None:
+            self._error(404, "NOT_FOUND", "The requested resource does not exist")
+            return
+        expected = f"Bearer {self.fake.session_id}"
+        if self.headers.get("Authorization") != expected:
+            self._error(401, "INVALID_SESSION_ID", "Session expired or invalid")
+            return
+
+        version = match.group("version")
+        parts = [part for part in match.group("rest").split("/") if part]
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            self._route(method, parts, params, body, version)
+        except SoqlError as exc:
+            status = 404 if exc.code == "NOT_FOUND" else 400
+            self._error(status, exc.code, str(exc))
+        except (ValueError, KeyError) as exc:
+            self._error(400, "MALFORMED_QUERY", str(exc))
+
+    def _route(
+        self,
+        method: str,
+        parts: List[str],
+        params: Dict[str, str],
+        body: bytes,
+        version: str,
+    ) -> None:
+        if parts and parts[0] in ("query", "queryAll") and method == "GET":
+            if len(parts) == 1:
+                self._json(200, self.fake.query(params.get("q", ""), version))
+            else:
+                self._json(200, self.fake.query_more(parts[1], version))
+            return
+        if len(parts) == 3 and parts[0] == "sobjects" and parts[2] == "describe":
+            self._json(200, self.fake.describe(parts[1]))
+            return
+        if parts[:2] == ["jobs", "query"] and self.fake.bulk2:
+            if len(parts) == 2 and method == "POST":
+                self._json(200, self.fake.create_job(json.loads(body or b"{}")))
+            elif len(parts) == 3 and method == "GET":
+                self._json(200, self.fake.job_info(parts[2]))
+            elif len(parts) == 3 and method == "DELETE":
+                self.fake.delete_job(parts[2])
+                self._send(204, b"", "application/json")
+            elif len(parts) == 4 and parts[3] == "results":
+                csv_body, locator, count = self.fake.job_results(
+                    parts[2],
+                    params.get("locator", ""),
+                    int(params.get("maxRecords", 50000)),
+                )
+                self._send(
+                    200,
+                    csv_body.encode("utf-8"),
+                    "text/csv",
+                    {"Sforce-Locator": locator, "Sforce-NumberOfRecords": str(count)},
+                )
+            else:
+                self._error(404, "NOT_FOUND", "The requested resource does not exist")
+            return
+        self._error(404, "NOT_FOUND", "The requested resource does not exist")
+
+    def _json(self, status: int, payload: Any) -> None:
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def _error(self, status: int, code: str, message: str) -> None:
+        self._json(status, [{"errorCode": code, "message": message}])
+
+    def _send(
+        self,
+        status: int,
+        body: bytes,
+        content_type: str,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        calls = self.fake.count_call()
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type};charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Sforce-Limit-Info", f"api-usage={calls}/{self.fake.api_limit}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _self_signed_certificate(directory: Path, host: str) -> Tuple[str, str]:
+    """Write a throwaway certificate for *host* and return (cert, key) paths."""
+
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    alt_names: List[x509.GeneralName] = [x509.DNSName("localhost")]
+    try:
+        alt_names.append(x509.IPAddress(ipaddress.ip_address(host)))
+    except ValueError:
+        alt_names.append(x509.DNSName(host))
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=5))
+        .not_valid_after(now + timedelta(days=7))
+        .add_extension(x509.SubjectAlternativeName(alt_names), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+    directory.mkdir(parents=True, exist_ok=True)
+    cert_path = directory / "fake-salesforce.pem"
+    key_path = directory / "fake-salesforce.key"
+    cert_path.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption(),
+        )
+    )
+    return str(cert_path), str(key_path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve synthetic Salesforce data locally")
+    parser.add_argument("--scale", type=int, default=10_000, help="Number of ps__Lead__c rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--page-size", type=int, default=2000, help="REST records per page")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every response"
+    )
+    parser.add_argument(
+        "--no-bulk2", action="store_true", help="Do not serve Bulk API 2.0 endpoints"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    started = time.monotonic()
+    objects = generate(args.scale, seed=args.seed)
+    LOGGER.info(
+        "Generated %s in %.1fs",
+        ", ".join(f"{obj.name}={obj.size:,}" for obj in objects.values()),
+        time.monotonic() - started,
+    )
+    server = FakeSalesforceServer(
+        objects,
+        host=args.host,
+        port=args.port,
+        page_size=args.page_size,
+        latency=args.latency,
+        bulk2=not args.no_bulk2,
+    )
+    print(f"salesforce.login_url: {server.login_url}")
+    print(f"export REQUESTS_CA_BUNDLE={server.certificate}")
+    with server:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
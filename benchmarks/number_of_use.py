@@ -0,0 +1,120 @@
+"""Benchmark the number_of_use transform on synthetic reservations.
+
+Builds ``--rows`` ``ps__Lead__c`` rows with :mod:`benchmarks.synthetic`,
+treats them as both the combined output and the reservation history, and
+times :func:`salesforce_exporter.stays.count_prior_stays` against the
+previous per-row implementation, checking that the counts are identical::
+
+    python -m benchmarks.number_of_use --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from salesforce_exporter.stays import count_prior_stays
+
+from .synthetic import generate
+
+CONTACT = "ps__Relcontact__c"
+ENTRY = "ps__EntryTime__c"
+STATUS = "ps__ReservedStatus__c"
+
+
+def load_reservations(rows: int, seed: int) -> pd.DataFrame:
+    leads = generate(rows, seed=seed)["ps__Lead__c"]
+    prefixes = {"Contact": "003", "ps__Lead__c": leads.prefix}
+    everything = np.arange(leads.size)
+    frame = pd.DataFrame(
+        {
+            name: leads.columns[name].render(everything, prefixes)
+            for name in ("Id", CONTACT, ENTRY, STATUS)
+        }
+    )
+    # The exporter compares naive wall-clock times in the app timezone.
+    frame[ENTRY] = pd.to_datetime(frame[ENTRY], utc=True).dt.tz_localize(None)
+    return frame
+
+
+def legacy_counts(
+    contacts: pd.Series, entry_times: pd.Series, relevant: pd.DataFrame, now: datetime
+) -> List[int]:
+    """The per-row loop number_of_use used before it was vectorized."""
+
+    now_timestamp = pd.Timestamp(now)
+    relevant = relevant.sort_values([CONTACT, ENTRY, "Id"])
+    times_by_contact = {
+        contact: pd.Index(group[ENTRY].tolist())
+        for contact, group in relevant.groupby(CONTACT)
+    }
+    counts: List[int] = []
+    for contact, entry_time in zip(contacts, entry_times):
+        if pd.isna(contact) or pd.isna(entry_time):
+            counts.append(0)
+            continue
+        times = times_by_contact.get(contact)
+        if times is None or times.empty:
+            counts.append(0)
+            continue
+        if entry_time <= now_timestamp:
+            counts.append(int(times.searchsorted(entry_time, side="left")))
+        else:
+            counts.append(int(times.searchsorted(now_timestamp, side="right")))
+    return counts
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark number_of_use")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs of the new code")
+    parser.add_argument(
+        "--skip-legacy", action="store_true", help="Do not time the per-row loop"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    started = time.perf_counter()
+    reservations = load_reservations(args.rows, args.seed)
+    print(f"Generated {len(reservations):,} reservations in {time.perf_counter() - started:.1f}s")
+
+    now = datetime.now()
+    confirmed = reservations[reservations[STATUS] == "確定"].dropna(subset=[CONTACT, ENTRY])
+    relevant = confirmed[confirmed[ENTRY] <= now]
+    print(
+        f"{len(relevant):,} past confirmed stays across "
+        f"{relevant[CONTACT].nunique():,} contacts"
+    )
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        counts = count_prior_stays(
+            reservations[CONTACT], reservations[ENTRY], relevant[CONTACT], relevant[ENTRY]
+        )
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"vectorized: {best:.3f}s, {len(reservations) / best:,.0f} rows/s")
+
+    if args.skip_legacy:
+        return
+    started = time.perf_counter()
+    expected = legacy_counts(reservations[CONTACT], reservations[ENTRY], relevant, now)
+    elapsed = time.perf_counter() - started
+    print(f"per-row:    {elapsed:.3f}s, {len(reservations) / elapsed:,.0f} rows/s")
+    identical = np.array_equal(counts, np.asarray(expected, dtype=np.int64))
+    print(f"speed-up: {elapsed / best:.0f}x, identical counts: {identical}")
+    if not identical:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
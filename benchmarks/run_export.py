@@ -0,0 +1,133 @@
+"""Run a facility export end to end against the fake Salesforce server.
+
+Starts :class:`benchmarks.fake_salesforce.FakeSalesforceServer` in-process,
+points a copy of the facility YAML at it and runs the exporter, so changes
+can be timed and profiled without an org::
+
+    python -m benchmarks.run_export --config config/kisara.yaml --scale 1000000
+
+CSV files, state and caches go to a scratch directory (``--workdir``);
+nothing is uploaded to S3.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import yaml
+
+from salesforce_exporter import exporter as exporter_module
+from salesforce_exporter.config import AppConfig
+from salesforce_exporter.exporter import SalesforceExporter
+
+from .fake_salesforce import FakeSalesforceServer
+from .synthetic import generate
+
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark an export against fake data")
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "config" / "kisara.yaml",
+        help="Single facility YAML to run",
+    )
+    parser.add_argument("--scale", type=int, default=10_000, help="Number of ps__Lead__c rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--page-size", type=int, default=2000, help="REST records per page")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every response"
+    )
+    parser.add_argument(
+        "--no-bulk2", action="store_true", help="Do not serve Bulk API 2.0 endpoints"
+    )
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        help="Directory for CSV output, state and caches (default: a new temp dir)",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Enable debug logging")
+    return parser.parse_args()
+
+
+def rewrite_config(raw: Dict[str, Any], login_url: str, workdir: Path) -> Dict[str, Any]:
+    """Point *raw* at the fake server and keep all files inside *workdir*."""
+
+    salesforce = dict(raw.get("salesforce") or {})
+    salesforce.update(
+        username=salesforce.get("username") or "benchmark@example.com",
+        password="benchmark",
+        security_token=None,
+        login_url=login_url,
+    )
+    salesforce.pop("session_cache", None)
+
+    execution = dict(raw.get("execution") or {})
+    execution.update(
+        cache_directory=str(workdir / "cache"),
+        state_directory=str(workdir / "state"),
+    )
+
+    csv_config = dict(raw.get("csv") or {})
+    csv_config.update(output_directory=str(workdir / "csv"))
+    csv_config.pop("archive_directory", None)
+
+    return dict(raw, salesforce=salesforce, execution=execution, csv=csv_config)
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+    workdir = (args.workdir or Path(tempfile.mkdtemp(prefix="export-benchmark-"))).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    started = time.monotonic()
+    objects = generate(args.scale, seed=args.seed)
+    LOGGER.info("Generated synthetic data in %.1fs", time.monotonic() - started)
+
+    with args.config.open("r", encoding="utf-8") as fp:
+        raw_config = yaml.safe_load(fp)
+
+    with FakeSalesforceServer(
+        objects,
+        page_size=args.page_size,
+        latency=args.latency,
+        bulk2=not args.no_bulk2,
+        certificate_directory=workdir,
+    ) as server:
+        config_path = workdir / args.config.name
+        with config_path.open("w", encoding="utf-8") as fp:
+            yaml.safe_dump(
+                rewrite_config(raw_config, server.login_url, workdir),
+                fp,
+                allow_unicode=True,
+                sort_keys=False,
+            )
+        os.environ["REQUESTS_CA_BUNDLE"] = server.certificate
+        # Benchmarks measure fetching and shaping, not uploads; keep the
+        # finished CSV files in the work directory instead.
+        exporter_module.upload_to_s3 = lambda local_path, s3_info, remote_filename: True
+
+        exporter = SalesforceExporter(AppConfig.load(config_path, facility_key="benchmark"))
+        started = time.monotonic()
+        exporter.run()
+        elapsed = time.monotonic() - started
+
+    print(f"Exported scale={args.scale:,} in {elapsed:.2f}s")
+    print(f"Server answered {server.api_calls:,} request(s)")
+    print(f"Output: {workdir / 'csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Synthetic hotel PMS data shaped like the sObjects the exporter reads.
+
+Columns are kept as compact numpy arrays (integer row numbers for ids and
+lookups, codes for picklists, epoch seconds for datetimes) and only turned
+into Salesforce-formatted values for the rows being served, so tens of
+millions of rows fit in a few gigabytes.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+
+
+@dataclass
+class Column:
+    """One field of a synthetic sObject.
+
+    ``kind`` selects how ``values`` are stored and rendered:
+
+    * ``id`` / ``reference``: row numbers of ``target`` (``-1`` is null)
+    * ``label``: row numbers rendered through ``template``
+    * ``picklist``: codes into ``choices`` (``-1`` is null)
+    * ``boolean`` / ``int`` / ``double``: plain values (``NaN`` is null)
+    * ``datetime``: epoch seconds; ``date``: epoch days (``-1`` is null)
+    """
+
+    kind: str
+    values: np.ndarray
+    target: Optional[str] = None
+    template: str = "{}"
+    choices: Sequence[str] = ()
+    relationship: Optional[str] = None
+    length: int = 0
+
+    @property
+    def salesforce_type(self) -> str:
+        if self.kind == "label":
+            return "string"
+        return self.kind
+
+    def render(self, rows: np.ndarray, prefixes: Dict[str, str]) -> List[object]:
+        """Return the Salesforce JSON values of *rows*."""
+
+        values = self.values[rows]
+        if self.kind in ("id", "reference"):
+            prefix = prefixes[self.target or ""]
+            return [f"{prefix}{value:015d}" if value >= 0 else None for value in values]
+        if self.kind == "label":
+            return [self.template.format(value) for value in values]
+        if self.kind == "picklist":
+            return [self.choices[value] if value >= 0 else None for value in values]
+        if self.kind == "boolean":
+            return [bool(value) for value in values]
+        if self.kind == "int":
+            return [None if np.isnan(value) else int(value) for value in values]
+        if self.kind == "double":
+            return [None if np.isnan(value) else float(value) for value in values]
+        if self.kind == "datetime":
+            return [
+                datetime.fromtimestamp(int(value), timezone.utc).strftime(
+                    "%Y-%m-%dT%H:%M:%S.000+0000"
+                )
+                if value >= 0
+                else None
+                for value in values
+            ]
+        if self.kind == "date":
+            return [
+                date.fromordinal(int(value) + EPOCH_ORDINAL).isoformat()
+                if value >= 0
+                else None
+                for value in values
+            ]
+        raise ValueError(f"Unknown column kind {self.kind!r}")
+
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@dataclass
+class SyntheticObject:
+    name: str
+    prefix: str
+    size: int
+    columns: Dict[str, Column] = field(default_factory=dict)
+
+
+def _ids(size: int, name: str) -> Column:
+    return Column("id", np.arange(size, dtype=np.int64), target=name)
+
+
+def _lookup(
+    rng: np.random.Generator,
+    size: int,
+    target: str,
+    target_size: int,
+    *,
+    relationship: str,
+    null_rate: float = 0.0,
+) -> Column:
+    values = rng.integers(0, max(target_size, 1), size, dtype=np.int64)
+    if null_rate:
+        values[rng.random(size) < null_rate] = -1
+    return Column("reference", values, target=target, relationship=relationship)
+
+
+def generate(
+    scale: int, *, seed: int = 0, today: Optional[date] = None
+) -> Dict[str, SyntheticObject]:
+    """Build a synthetic org with *scale* reservations (``ps__Lead__c`` rows).
+
+    Cardinalities follow a typical ryokan: about 0.6 contacts per
+    reservation (repeat guests), one accounting record per checked-in
+    reservation, ~2.5 sales lines per account and ~1.5 estimate lines per
+    reservation. Entry times span two years back and one year ahead of
+    *today* so history and on-hand windows both return data.
+    """
+
+    rng = np.random.default_rng(seed)
+    today = today or datetime.now(timezone.utc).date()
+    today_days = today.toordinal() - EPOCH_ORDINAL
+    now_seconds = int(datetime.now(timezone.utc).timestamp())
+
+    objects: Dict[str, SyntheticObject] = {}
+
+    def add(obj: SyntheticObject) -> SyntheticObject:
+        objects[obj.name] = obj
+        return obj
+
+    plans = add(SyntheticObject("ps__Plan__c", "a0P", 40))
+    plans.columns = {
+        "Id": _ids(plans.size, plans.name),
+        "Name": Column("label", np.arange(plans.size), template="Plan {}", length=80),
+    }
+
+    room_types = add(SyntheticObject("ps__TypeOfRooms__c", "a0T", 12))
+    room_types.columns = {
+        "Id": _ids(room_types.size, room_types.name),
+        "Name": Column("label", np.arange(room_types.size), template="Type {}", length=80),
+        "ps__ActionType__c": Column(
+            "picklist",
+            rng.integers(0, 2, room_types.size),
+            choices=("客室", "宴会場"),
+        ),
+    }
+
+    rooms = add(SyntheticObject("ps__Room__c", "a0R", 60))
+    rooms.columns = {
+        "Id": _ids(rooms.size, rooms.name),
+        "Name": Column("label", np.arange(rooms.size), template="{}号室", length=80),
+        "ps__UseOfRoom__c": Column(
+            "picklist", rng.integers(0, 2, rooms.size), choices=("客室", "休憩")
+        ),
+        "ps__TypeRoomRef__c": _lookup(
+            rng, rooms.size, room_types.name, room_types.size,
+            relationship="ps__TypeRoomRef__r",
+        ),
+        "ps__priority__c": Column("double", np.arange(rooms.size, dtype=float)),
+        "ps__Floor__c": Column(
+            "picklist", rng.integers(0, 4, rooms.size), choices=("1F", "2F", "3F", "4F")
+        ),
+    }
+
+    masters = add(SyntheticObject("ps__AccountMaster__c", "a0M", 300))
+    masters.columns = {
+        "Id": _ids(masters.size, masters.name),
+        "Name": Column("label", np.arange(masters.size), template="商品 {}", length=80),
+        "ps__ActionType__c": Column(
+            "picklist",
+            rng.integers(0, 4, masters.size),
+            choices=("室料", "料理", "飲料", "その他"),
+        ),
+    }
+
+    contacts = add(SyntheticObject("Contact", "003", max(int(scale * 0.6), 1)))
+    contact_modified = now_seconds - rng.integers(0, 730 * SECONDS_PER_DAY, contacts.size)
+    contacts.columns = {
+        "Id": _ids(contacts.size, contacts.name),
+        "Name": Column("label", np.arange(contacts.size), template="Guest {}", length=121),
+        "Email": Column(
+            "label", np.arange(contacts.size), template="guest{}@example.com", length=80
+        ),
+        "Phone": Column(
+            "label", np.arange(contacts.size), template="03-0000-{:04d}", length=40
+        ),
+        "MobilePhone": Column(
+            "label", np.arange(contacts.size), template="090-0000-{:04d}", length=40
+        ),
+        "MailingState": Column(
+            "picklist",
+            rng.integers(0, 5, contacts.size),
+            choices=("東京都", "神奈川県", "石川県", "大阪府", "愛知県"),
+        ),
+        "MailingCity": Column(
+            "label", rng.integers(0, 300, contacts.size), template="City {}", length=40
+        ),
+        "MailingStreet": Column(
+            "label", np.arange(contacts.size), template="{}-1-1", length=255
+        ),
+        "MailingAddress": Column(
+            "label", np.arange(contacts.size), template="Address {}", length=255
+        ),
+        "Field6__c": Column(
+            "picklist", rng.integers(-1, 3, contacts.size), choices=("A", "B", "C")
+        ),
+        "HasOptedOutOfEmail": Column("boolean", rng.random(contacts.size) < 0.1),
+        "LastModifiedDate": Column("datetime", contact_modified),
+        "SystemModstamp": Column("datetime", contact_modified),
+    }
+
+    leads = add(SyntheticObject("ps__Lead__c", "a0L", scale))
+    entry_days = today_days + rng.integers(-730, 366, scale)
+    entry_seconds = entry_days * SECONDS_PER_DAY + rng.integers(5, 10, scale) * 3600
+    modified = np.minimum(
+        entry_seconds - rng.integers(0, 90, scale) * SECONDS_PER_DAY, now_seconds
+    )
+    leads.columns = {
+        "Id": _ids(scale, leads.name),
+        "Name": Column("label", np.arange(scale), template="R-{:08d}", length=80),
+        "ps__No__c": Column("label", np.arange(scale), template="{:08d}", length=20),
+        "ps__EntryTime__c": Column("datetime", entry_seconds),
+        "ps__ReservedDate__c": Column(
+            "date", entry_days - rng.integers(0, 120, scale)
+        ),
+        "ps__ReservedStatus__c": Column(
+            "picklist",
+            rng.choice(3, scale, p=[0.8, 0.15, 0.05]),
+            choices=("確定", "キャンセル", "仮予約"),
+        ),
+        "ps__PmsEmailDelDateTime__c": Column("datetime", np.full(scale, -1)),
+        "ps__StayPersons__c": Column("double", rng.integers(1, 7, scale).astype(float)),
+        "ps__ChildFA__c": Column(
+            "double", (rng.random(scale) < 0.2) * rng.integers(1, 3, scale) * 1.0
+        ),
+        "ps__email__c": Column(
+            "label", rng.integers(0, contacts.size, scale),
+            template="guest{}@example.com", length=80,
+        ),
+        "ps__Field2__c": Column(
+            "picklist", rng.integers(0, 3, scale), choices=("直販", "OTA", "旅行会社")
+        ),
+        "LastModifiedDate": Column("datetime", modified),
+        "SystemModstamp": Column("datetime", modified),
+        "ps__Field310__c": _lookup(
+            rng, scale, plans.name, plans.size, relationship="ps__Field310__r"
+        ),
+        "ps__Relcontact__c": _lookup(
+            rng, scale, contacts.name, contacts.size,
+            relationship="ps__Relcontact__r", null_rate=0.05,
+        ),
+        "ps__Rroom__c": _lookup(
+            rng, scale, rooms.name, rooms.size, relationship="ps__Rroom__r"
+        ),
+    }
+
+    accounted = np.flatnonzero(rng.random(scale) < 0.9)
+    accounts = add(SyntheticObject("ps__AccountAcount__c", "a0A", len(accounted)))
+    accounts.columns = {
+        "Id": _ids(accounts.size, accounts.name),
+        "ps__Relreserve__c": Column(
+            "reference", accounted.astype(np.int64),
+            target=leads.name, relationship="ps__Relreserve__r",
+        ),
+        "LastModifiedDate": Column("datetime", modified[accounted]),
+    }
+
+    lines_per_account = rng.poisson(2.5, accounts.size)
+    sales = add(SyntheticObject("ps__Tran1__c", "a0X", int(lines_per_account.sum())))
+    sales_master = rng.integers(0, masters.size, sales.size)
+    sales.columns = {
+        "Id": _ids(sales.size, sales.name),
+        "ps__Field1__c": Column(
+            "reference",
+            np.repeat(np.arange(accounts.size, dtype=np.int64), lines_per_account),
+            target=accounts.name, relationship="ps__Field1__r",
+        ),
+        "ps__Field5__c": Column(
+            "label", sales_master, template="商品 {}", length=80
+        ),
+        "ps__Field7__c": Column(
+            "reference", sales_master.astype(np.int64),
+            target=masters.name, relationship="ps__Field7__r",
+        ),
+        "ps__Field23__c": Column(
+            "double", rng.integers(5, 500, sales.size) * 100.0
+        ),
+        "ps__TaxRate__c": Column("double", rng.choice([8.0, 10.0], sales.size)),
+        "ps__Field21__c": Column("double", rng.integers(1, 5, sales.size) * 1.0),
+        "LastModifiedDate": Column(
+            "datetime", np.repeat(accounts.columns["LastModifiedDate"].values, lines_per_account)
+        ),
+    }
+
+    items_per_lead = rng.poisson(1.5, scale)
+    estimates = add(
+        SyntheticObject("ps__BookingEstimateItem__c", "a0E", int(items_per_lead.sum()))
+    )
+    estimate_master = rng.integers(0, masters.size, estimates.size)
+    quantity = rng.integers(1, 5, estimates.size) * 1.0
+    unit_price = rng.integers(5, 500, estimates.size) * 100.0
+    estimates.columns = {
+        "Id": _ids(estimates.size, estimates.name),
+        "refBooking__c": Column(
+            "reference",
+            np.repeat(np.arange(scale, dtype=np.int64), items_per_lead),
+            target=leads.name, relationship="refBooking__r",
+        ),
+        "refAccountMaster__c": Column(
+            "reference", estimate_master.astype(np.int64),
+            target=masters.name, relationship="refAccountMaster__r",
+        ),
+        "ps__UnitPrice__c": Column("double", unit_price),
+        "ps__Qty__c": Column("double", quantity),
+        "ps__Amount__c": Column("double", unit_price * quantity),
+        "LastModifiedDate": Column(
+            "datetime", np.repeat(modified, items_per_lead)
+        ),
+    }
+    return objects
+
+
+__all__ = ["Column", "SyntheticObject", "generate"]
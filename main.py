@@ -4,18 +4,26 @@ from __future__ import annotations
 
 import argparse
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
-from salesforce_exporter.config import AppConfig, FacilityExportConfig
+from salesforce_exporter.cassette import CassetteOptions
+from salesforce_exporter.config import AppConfig, FacilityConfig, FacilityExportConfig
 from salesforce_exporter.exporter import SalesforceExporter
 
 LOGGER = logging.getLogger(__name__)
 
 
-def setup_logging(verbose: bool = False) -> None:
+def setup_logging(verbose: bool = False, context: Optional[str] = None) -> None:
     level = logging.DEBUG if verbose else logging.INFO
+    prefix = f"[{context}] " if context else ""
     logging.basicConfig(
-        level=level, format="%(asctime)s %(levelname)s %(name)s %(message)s"
+        level=level,
+        format=f"%(asctime)s %(levelname)s {prefix}%(name)s %(message)s",
+        force=True,
     )
 
 
@@ -36,21 +44,139 @@ def parse_args() -> argparse.Namespace:
         help="Path to config_facility.yaml or a single facility YAML file",
     )
     parser.add_argument("--verbose", action="store_true", help="Enable debug logging")
+    parser.add_argument(
+        "--parallel-facilities",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Run up to N facilities at once in separate processes",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only estimate rows and API calls with COUNT() probes; export nothing",
+    )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record",
+        type=Path,
+        metavar="DIR",
+        help="Save every Salesforce response to DIR for later replay",
+    )
+    cassette.add_argument(
+        "--replay",
+        type=Path,
+        metavar="DIR",
+        help="Serve Salesforce responses from a recording in DIR; nothing is uploaded",
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        default=0.0,
+        metavar="SECONDS",
+        help="Delay added before every replayed response page",
+    )
     return parser.parse_args()
 
 
-def run_single_config(config_path: Path) -> None:
+def cassette_options(args: argparse.Namespace) -> Optional[CassetteOptions]:
+    if args.record is not None:
+        return CassetteOptions(args.record)
+    if args.replay is not None:
+        return CassetteOptions(args.replay, replay=True, latency=args.replay_latency)
+    return None
+
+
+def run_single_config(
+    config_path: Path, cassette: Optional[CassetteOptions] = None
+) -> None:
     config = AppConfig.load(config_path)
-    exporter = SalesforceExporter(config)
+    exporter = SalesforceExporter(config, cassette.open() if cassette else None)
     exporter.run()
 
 
-def run_facility_configs(config_path: Path) -> None:
+def print_plan(
+    app_config: AppConfig,
+    title: Optional[str] = None,
+    cassette: Optional[CassetteOptions] = None,
+) -> None:
+    """Print the dry-run estimates for one facility or config file."""
+
+    lines = SalesforceExporter(
+        app_config, cassette.open(app_config.facility_key) if cassette else None
+    ).plan()
+    if title:
+        print(f"== {title} ==")
+    for line in lines:
+        print(line)
+
+
+def plan_configs(config_path: Path, cassette: Optional[CassetteOptions] = None) -> None:
+    if not FacilityExportConfig.is_facility_config(config_path):
+        print_plan(AppConfig.load(config_path), cassette=cassette)
+        return
+
+    facility_config = FacilityExportConfig.load(config_path)
+    for facility in facility_config.enabled_facilities():
+        app_config = AppConfig.load(
+            facility.config_path,
+            facility_name=facility.name,
+            facility_key=facility.key,
+        )
+        print_plan(
+            app_config, title=f"{facility.name} ({facility.key})", cassette=cassette
+        )
+
+
+def run_facility(
+    facility: FacilityConfig, cassette: Optional[CassetteOptions] = None
+) -> None:
+    LOGGER.info(
+        "Starting export for %s (%s) with %s",
+        facility.name,
+        facility.key,
+        facility.config_path,
+    )
+    app_config = AppConfig.load(
+        facility.config_path,
+        facility_name=facility.name,
+        facility_key=facility.key,
+    )
+    exporter = SalesforceExporter(
+        app_config, cassette.open(facility.key) if cassette else None
+    )
+    exporter.run()
+
+
+def _run_facility_in_worker(
+    facility: FacilityConfig, verbose: bool, cassette: Optional[CassetteOptions]
+) -> Tuple[bool, float]:
+    """Process-pool entry point: run one facility with its own log context."""
+
+    setup_logging(verbose, context=facility.key)
+    started = time.monotonic()
+    try:
+        run_facility(facility, cassette)
+    except Exception:
+        LOGGER.exception("Export failed for %s (%s)", facility.name, facility.key)
+        return False, time.monotonic() - started
+    return True, time.monotonic() - started
+
+
+def run_facility_configs(
+    config_path: Path,
+    *,
+    parallel_facilities: int = 1,
+    verbose: bool = False,
+    cassette: Optional[CassetteOptions] = None,
+) -> bool:
+    """Run every enabled facility; returns ``False`` if any of them failed."""
+
     facility_config = FacilityExportConfig.load(config_path)
     enabled_facilities = facility_config.enabled_facilities()
     if not enabled_facilities:
         LOGGER.warning("No facilities are enabled in %s", config_path)
-        return
+        return True
 
     for facility in enabled_facilities:
         if not facility.config_path.exists():
@@ -59,19 +185,39 @@ def run_facility_configs(config_path: Path) -> None:
                 f"for {facility.name} ({facility.key})"
             )
 
+    if parallel_facilities <= 1 or len(enabled_facilities) == 1:
+        for facility in enabled_facilities:
+            run_facility(facility, cassette)
+        return True
+
+    results: Dict[str, Tuple[bool, float]] = {}
+    workers = min(parallel_facilities, len(enabled_facilities))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                _run_facility_in_worker, facility, verbose, cassette
+            ): facility
+            for facility in enabled_facilities
+        }
+        for future in as_completed(futures):
+            facility = futures[future]
+            try:
+                results[facility.key] = future.result()
+            except Exception:  # the worker process itself died
+                LOGGER.exception("Worker for %s (%s) crashed", facility.name, facility.key)
+                results[facility.key] = (False, 0.0)
+
+    LOGGER.info("Facility export summary:")
+    for facility in enabled_facilities:
+        succeeded, elapsed = results[facility.key]
         LOGGER.info(
-            "Starting export for %s (%s) with %s",
+            "  %s (%s): %s in %.1fs",
             facility.name,
             facility.key,
-            facility.config_path,
+            "succeeded" if succeeded else "FAILED",
+            elapsed,
         )
-        app_config = AppConfig.load(
-            facility.config_path,
-            facility_name=facility.name,
-            facility_key=facility.key,
-        )
-        exporter = SalesforceExporter(app_config)
-        exporter.run()
+    return all(succeeded for succeeded, _ in results.values())
 
 
 def main() -> None:
@@ -81,11 +227,22 @@ def main() -> None:
     if not args.config.exists():
         raise FileNotFoundError(f"Configuration file '{args.config}' was not found")
 
-    if FacilityExportConfig.is_facility_config(args.config):
-        run_facility_configs(args.config)
+    cassette = cassette_options(args)
+    if args.plan:
+        plan_configs(args.config, cassette)
+    elif FacilityExportConfig.is_facility_config(args.config):
+        succeeded = run_facility_configs(
+            args.config,
+            parallel_facilities=args.parallel_facilities,
+            verbose=args.verbose,
+            cassette=cassette,
+        )
+        if not succeeded:
+            raise SystemExit(1)
     else:
-        run_single_config(args.config)
+        run_single_config(args.config, cassette)
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
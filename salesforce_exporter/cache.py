@@ -0,0 +1,130 @@
+"""On-disk cache for query results that rarely change."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QueryResultCache:
+    """Store query results as Feather files keyed by org and SOQL.
+
+    Each entry is a ``<key>.feather`` file plus a ``<key>.json`` sidecar with
+    the time it was written and the freshness fingerprint observed at that
+    time. Feather support requires ``pyarrow``; without it the cache stays
+    disabled and every lookup misses.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        try:
+            from pyarrow import feather
+        except ImportError:  # pragma: no cover - depends on the environment
+            LOGGER.warning("pyarrow is not installed; query result cache disabled")
+            self._feather: Any = None
+        else:
+            self._feather = feather
+
+    @property
+    def enabled(self) -> bool:
+        return self._feather is not None
+
+    @staticmethod
+    def key(org: str, soql: str) -> str:
+        normalized = " ".join(soql.split())
+        return hashlib.sha256(f"{org}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def load(
+        self,
+        key: str,
+        *,
+        max_age: float,
+        fingerprint: Optional[str] = None,
+    ) -> Optional[pd.DataFrame]:
+        """Return the cached frame for *key* if it is fresh enough."""
+
+        if not self.enabled:
+            return None
+
+        data_path, meta_path = self._paths(key)
+        try:
+            with meta_path.open("r", encoding="utf-8") as fp:
+                meta: Dict[str, Any] = json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+        age = time.time() - float(meta.get("created_at", 0))
+        if age > max_age:
+            LOGGER.debug("Cache entry %s expired %.0fs ago", key, age - max_age)
+            return None
+        if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+            LOGGER.debug("Cache entry %s is stale (source data changed)", key)
+            return None
+
+        try:
+            table = self._feather.read_table(str(data_path), memory_map=True)
+        except (OSError, ValueError):
+            LOGGER.warning("Failed to read cache entry %s", data_path)
+            return None
+        return table.to_pandas()
+
+    def cached_rows(self, key: str, *, max_age: float) -> Optional[int]:
+        """Row count of the entry for *key* if it has not expired."""
+
+        if not self.enabled:
+            return None
+        try:
+            with self._paths(key)[1].open("r", encoding="utf-8") as fp:
+                meta: Dict[str, Any] = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        if time.time() - float(meta.get("created_at", 0)) > max_age:
+            return None
+        rows = meta.get("rows")
+        return int(rows) if rows is not None else None
+
+    def store(
+        self, key: str, df: pd.DataFrame, *, fingerprint: Optional[str] = None
+    ) -> None:
+        if not self.enabled:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data_path, meta_path = self._paths(key)
+        temp_data = data_path.with_suffix(".feather.tmp")
+        temp_meta = meta_path.with_suffix(".json.tmp")
+        try:
+            self._feather.write_feather(
+                df.reset_index(drop=True), str(temp_data), compression="uncompressed"
+            )
+        except Exception:  # pyarrow raises several types for unsupported data
+            LOGGER.warning("Unable to cache result %s", key, exc_info=True)
+            temp_data.unlink(missing_ok=True)
+            return
+
+        with temp_meta.open("w", encoding="utf-8") as fp:
+            json.dump(
+                {
+                    "created_at": time.time(),
+                    "fingerprint": fingerprint,
+                    "rows": len(df.index),
+                },
+                fp,
+            )
+        os.replace(temp_data, data_path)
+        os.replace(temp_meta, meta_path)
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.directory / f"{key}.feather", self.directory / f"{key}.json"
+
+
+__all__ = ["QueryResultCache"]
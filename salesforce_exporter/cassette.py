@@ -0,0 +1,185 @@
+"""Record Salesforce responses once and replay them offline."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+LABELS_FILE = "labels.json"
+
+
+class MissingRecordingError(LookupError):
+    """Raised when a replayed run asks for a response that was never recorded."""
+
+
+@dataclass(frozen=True)
+class CassetteOptions:
+    """Where to record to or replay from, as given on the command line."""
+
+    directory: Path
+    replay: bool = False
+    latency: float = 0.0
+
+    def open(self, name: Optional[str] = None) -> "Cassette":
+        """Open the cassette for one facility (a subdirectory when *name* is set)."""
+
+        directory = self.directory / name if name else self.directory
+        return Cassette(directory, replay=self.replay, latency=self.latency)
+
+
+class Cassette:
+    """Salesforce responses stored as compressed, content-addressed pages.
+
+    Every response page is gzip-compressed JSON saved under
+    ``blobs/<sha256>.json.gz``, so identical pages are stored once. An entry
+    per request (``entries/<sha256 of kind and SOQL>.json``) lists its pages
+    in order, and ``labels.json`` maps each caller-supplied label (query name
+    and batch) to the entry last recorded for it. When replaying, requests
+    are matched by SOQL first and by label second, so runs whose date
+    windows or watermarks moved since the recording still find their data.
+    *latency* seconds are slept before every replayed page.
+    """
+
+    def __init__(self, directory: Path, *, replay: bool = False, latency: float = 0.0):
+        self.directory = directory
+        self.replay = replay
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._labels: Dict[str, str] = self._read_labels()
+
+    def call(
+        self, kind: str, request: str, label: str, fetch: Callable[[], Any]
+    ) -> Any:
+        """Return the single response to *request*, recording or replaying it."""
+
+        return list(self.pages(kind, request, label, lambda: [fetch()]))[0]
+
+    def pages(
+        self,
+        kind: str,
+        request: str,
+        label: str,
+        fetch: Callable[[], Iterable[Any]],
+    ) -> Iterator[Any]:
+        """Yield the response pages of *request*, recording or replaying them.
+
+        *fetch* is only called when recording; its pages are passed through
+        as they arrive and the entry is written once the last one is stored.
+        """
+
+        key = self._key(kind, request)
+        if self.replay:
+            yield from self._replay(kind, key, label)
+            return
+
+        digests: List[str] = []
+        for page in fetch():
+            digests.append(self._store_blob(page))
+            yield page
+        self._store_entry(kind, key, label, request, digests)
+
+    def _replay(self, kind: str, key: str, label: str) -> Iterator[Any]:
+        entry = self._read_entry(key)
+        if entry is None:
+            with self._lock:
+                fallback = self._labels.get(f"{kind} {label}")
+            entry = self._read_entry(fallback) if fallback else None
+            if entry is None:
+                raise MissingRecordingError(
+                    f"No recorded {kind} response for {label} in {self.directory}"
+                )
+            LOGGER.warning(
+                "SOQL for %s differs from the recording; replaying the recorded %s",
+                label,
+                kind,
+            )
+        for digest in entry["pages"]:
+            if self.latency:
+                time.sleep(self.latency)
+            yield self._load_blob(digest)
+
+    @staticmethod
+    def _key(kind: str, request: str) -> str:
+        normalized = " ".join(request.split())
+        return hashlib.sha256(f"{kind}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.directory / "blobs" / digest[:2] / f"{digest}.json.gz"
+
+    def _store_blob(self, page: Any) -> str:
+        if isinstance(page, dict) and "nextRecordsUrl" in page:
+            # Query cursors differ on every run and are never followed on
+            # replay; dropping them keeps identical pages identical.
+            page = {key: value for key, value in page.items() if key != "nextRecordsUrl"}
+        data = json.dumps(page, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(path, gzip.compress(data, compresslevel=6))
+        return digest
+
+    def _load_blob(self, digest: str) -> Any:
+        try:
+            data = gzip.decompress(self._blob_path(digest).read_bytes())
+        except OSError as exc:
+            raise MissingRecordingError(
+                f"Recorded page {digest} is missing or corrupt in {self.directory}"
+            ) from exc
+        return json.loads(data)
+
+    def _store_entry(
+        self, kind: str, key: str, label: str, request: str, digests: List[str]
+    ) -> None:
+        entry = {"kind": kind, "label": label, "request": request, "pages": digests}
+        path = self.directory / "entries" / f"{key}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_atomic(path, json.dumps(entry, ensure_ascii=False, indent=1).encode("utf-8"))
+        with self._lock:
+            self._labels[f"{kind} {label}"] = key
+            _write_atomic(
+                self.directory / LABELS_FILE,
+                json.dumps(self._labels, ensure_ascii=False, indent=1, sort_keys=True).encode(
+                    "utf-8"
+                ),
+            )
+        LOGGER.debug("Recorded %d page(s) of %s for %s", len(digests), kind, label)
+
+    def _read_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with (self.directory / "entries" / f"{key}.json").open(
+                "r", encoding="utf-8"
+            ) as fp:
+                return json.load(fp)
+        except FileNotFoundError:
+            return None
+
+    def _read_labels(self) -> Dict[str, str]:
+        try:
+            with (self.directory / LABELS_FILE).open("r", encoding="utf-8") as fp:
+                return dict(json.load(fp))
+        except FileNotFoundError:
+            if self.replay:
+                raise MissingRecordingError(
+                    f"No recording found in {self.directory}"
+                ) from None
+            return {}
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    temp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+__all__ = ["Cassette", "CassetteOptions", "MissingRecordingError"]
@@ -0,0 +1,63 @@
+"""Salesforce REST client used by the exporter."""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Optional, Tuple
+
+from simple_salesforce import Salesforce
+
+from .config import SalesforceAuth
+from .session import SessionManager
+from .transport import RetryingSession
+from .usage import ApiUsageTracker
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ExporterSalesforce(Salesforce):
+    """``Salesforce`` client that obtains and renews sessions via a manager.
+
+    The initial session comes from :class:`SessionManager`, so it may be a
+    cached one. When a REST call is answered with ``INVALID_SESSION_ID`` the
+    client logs in again through the manager and retries the request; Bulk API
+    2.0 handlers do not, so their callers use :meth:`refresh_session` and
+    resubmit the job. HTTP calls go through a pooled :class:`RetryingSession`
+    configured by ``salesforce.transport``.
+    """
+
+    def __init__(
+        self,
+        auth: SalesforceAuth,
+        session_manager: SessionManager,
+        usage: Optional[ApiUsageTracker] = None,
+        **kwargs: Any,
+    ) -> None:
+        session_id, instance = session_manager.get(auth)
+        kwargs.setdefault("session", RetryingSession(auth.transport, usage=usage))
+        super().__init__(instance=instance, session_id=session_id, **kwargs)
+        self._auth = auth
+        self._session_manager = session_manager
+        # simple_salesforce retries INVALID_SESSION_ID responses through this
+        # hook after calling _refresh_session(). Both are private; they are
+        # unchanged across the 1.12.x releases requirements.txt allows.
+        self._salesforce_login_partial = self._login_again
+
+    def _login_again(self) -> Tuple[str, str]:
+        LOGGER.info("Salesforce session expired; logging in again")
+        return self._session_manager.refresh(self._auth)
+
+    def refresh_session(self) -> None:
+        """Log in again and point later REST and Bulk API 2.0 calls at the new session."""
+
+        self._refresh_session()
+
+    def _refresh_session(self) -> None:
+        super()._refresh_session()
+        self.base_url = (
+            f"https://{self.sf_instance}/services/data/v{self.sf_version}/"
+        )
+        self.bulk2_url = f"{self.base_url}jobs/"
+
+
+__all__ = ["ExporterSalesforce"]
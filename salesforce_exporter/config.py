@@ -5,16 +5,30 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import yaml
 
+from .scheduler import find_cycle
+from .soql import split_select
+
 try:  # Python 3.9+
     from zoneinfo import ZoneInfo
 except ImportError:  # pragma: no cover - Python < 3.9 not supported here
     from backports.zoneinfo import ZoneInfo  # type: ignore
 
 
+# Salesforce field types allowed on either side of a semi-join.
+SEMI_JOIN_FIELD_TYPES = ("id", "reference")
+
+
+def _positive_int(value: Any, *, name: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"{name} must be at least 1, got {value!r}")
+    return number
+
+
 @dataclass
 class S3Info:
     bucket_name: str
@@ -120,7 +134,9 @@ class QueryRelationshipFilter:
     source_query: str
     source_field: str
     target_field: str
-    chunk_size: int = 200
+    chunk_size: Optional[int] = None
+    max_query_bytes: Optional[int] = None
+    pushdown: bool = False
 
     @classmethod
     def from_raw(cls, raw: Any) -> "QueryRelationshipFilter":
@@ -137,13 +153,25 @@ class QueryRelationshipFilter:
             ) from exc
 
         chunk_size_raw = raw.get("chunk_size")
-        chunk_size = int(chunk_size_raw) if chunk_size_raw is not None else 200
+        chunk_size = (
+            _positive_int(chunk_size_raw, name="chunk_size")
+            if chunk_size_raw is not None
+            else None
+        )
+        max_query_bytes_raw = raw.get("max_query_bytes")
+        max_query_bytes = (
+            _positive_int(max_query_bytes_raw, name="max_query_bytes")
+            if max_query_bytes_raw is not None
+            else None
+        )
 
         return cls(
             source_query=source_query,
             source_field=source_field,
             target_field=target_field,
             chunk_size=chunk_size,
+            max_query_bytes=max_query_bytes,
+            pushdown=bool(raw.get("pushdown", False)),
         )
 
 
@@ -154,6 +182,14 @@ class QueryJoinConfig:
     right_on: Tuple[str, ...]
     how: str = "left"
     suffixes: Optional[Tuple[str, str]] = None
+    # Right-hand columns to add; ``None`` adds all of them. With
+    # ``auto_columns`` only columns the left side lacks are added.
+    columns: Optional[Tuple[str, ...]] = None
+    auto_columns: bool = False
+
+    @property
+    def projected(self) -> bool:
+        return self.columns is not None or self.auto_columns
 
     @staticmethod
     def _normalize_keys(value: Any, *, name: str) -> Tuple[str, ...]:
@@ -200,12 +236,241 @@ class QueryJoinConfig:
             else:
                 raise ValueError("suffixes must be a list of two strings")
 
+        if "columns" in raw and "select" in raw:
+            raise ValueError("Use either columns or select in a join, not both")
+        columns_raw = raw.get("columns", raw.get("select"))
+        columns: Optional[Tuple[str, ...]] = None
+        auto_columns = False
+        if isinstance(columns_raw, str) and columns_raw.strip().lower() == "auto":
+            auto_columns = True
+        elif columns_raw is not None:
+            columns = cls._normalize_keys(columns_raw, name="columns")
+
         return cls(
             source_query=source_query,
             left_on=left_on,
             right_on=right_on,
             how=how,
             suffixes=suffixes,
+            columns=columns,
+            auto_columns=auto_columns,
+        )
+
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def _parse_duration(value: Any, *, name: str) -> int:
+    """Parse a duration given in seconds or as ``30m``, ``12h``, ``7d`` etc."""
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = int(value)
+    elif isinstance(value, str) and value.strip():
+        text = value.strip().lower()
+        unit = _DURATION_UNITS.get(text[-1])
+        try:
+            seconds = int(float(text[:-1]) * unit) if unit else int(text)
+        except ValueError as exc:
+            raise ValueError(f"{name} must be a duration, got {value!r}") from exc
+    else:
+        raise ValueError(f"{name} must be a duration, got {value!r}")
+
+    if seconds <= 0:
+        raise ValueError(f"{name} must be positive, got {value!r}")
+    return seconds
+
+
+@dataclass
+class QueryCacheConfig:
+    ttl_seconds: int
+    probe: bool = True
+
+    @classmethod
+    def from_raw(cls, raw: Any, *, name: str) -> "QueryCacheConfig":
+        if not isinstance(raw, dict) or "ttl" not in raw:
+            raise ValueError(f"{name} must be a mapping with a ttl")
+        return cls(
+            ttl_seconds=_parse_duration(raw["ttl"], name=f"{name}.ttl"),
+            probe=bool(raw.get("probe", True)),
+        )
+
+
+@dataclass
+class QueryWatermarkConfig:
+    field: str = "SystemModstamp"
+
+    @classmethod
+    def from_raw(cls, raw: Any, *, name: str) -> Optional["QueryWatermarkConfig"]:
+        if raw is None or raw is False:
+            return None
+        if raw is True:
+            return cls()
+        if not isinstance(raw, dict):
+            raise ValueError(f"{name} must be a mapping or boolean")
+        return cls(field=str(raw.get("field", cls.field)))
+
+
+COLUMN_TYPES = ("category", "boolean", "Int64", "float", "datetime", "date", "string")
+_COLUMN_TYPE_ALIASES = {
+    "bool": "boolean",
+    "int": "Int64",
+    "integer": "Int64",
+    "float64": "float",
+    "double": "float",
+    "str": "string",
+}
+
+
+def _normalize_column_type(value: Any, *, name: str) -> str:
+    lowered = str(value).strip().lower()
+    lowered = _COLUMN_TYPE_ALIASES.get(lowered, lowered).lower()
+    for column_type in COLUMN_TYPES:
+        if column_type.lower() == lowered:
+            return column_type
+    allowed = ", ".join(COLUMN_TYPES)
+    raise ValueError(f"{name} must be one of {allowed}, got {value!r}")
+
+
+@dataclass
+class ColumnTypesConfig:
+    """Column dtypes applied to a query's results once, when they are fetched."""
+
+    auto: Optional[bool] = None
+    columns: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_raw(cls, raw: Any, *, name: str) -> Optional["ColumnTypesConfig"]:
+        if raw is None:
+            return None
+        if isinstance(raw, bool):
+            return cls(auto=raw)
+        if isinstance(raw, str) and raw.strip().lower() == "auto":
+            return cls(auto=True)
+        if not isinstance(raw, dict):
+            raise ValueError(f"{name} must be 'auto', a boolean or a mapping")
+
+        auto: Optional[bool] = None
+        columns_raw: Any = raw
+        if "columns" in raw and set(raw) <= {"auto", "columns"}:
+            auto = bool(raw["auto"]) if "auto" in raw else None
+            columns_raw = raw["columns"] or {}
+            if not isinstance(columns_raw, dict):
+                raise ValueError(f"{name}.columns must be a mapping")
+        columns = {
+            str(column): _normalize_column_type(
+                column_type, name=f"{name}.{column}"
+            )
+            for column, column_type in columns_raw.items()
+        }
+        return cls(auto=auto, columns=columns)
+
+
+@dataclass
+class ApiUsageConfig:
+    floor: Optional[int] = None
+    action: str = "throttle"
+    throttle_seconds: float = 30.0
+
+    @classmethod
+    def from_raw(cls, raw: Any) -> "ApiUsageConfig":
+        if raw is None:
+            return cls()
+        if not isinstance(raw, dict):
+            raise ValueError("execution.api_usage must be a mapping")
+
+        defaults = cls()
+        action = str(raw.get("action", defaults.action)).strip().lower()
+        if action not in ("throttle", "abort"):
+            raise ValueError(
+                f"execution.api_usage.action must be throttle or abort, got {action!r}"
+            )
+        floor_raw = raw.get("floor")
+        return cls(
+            floor=int(floor_raw) if floor_raw is not None else None,
+            action=action,
+            throttle_seconds=float(
+                raw.get("throttle_seconds", defaults.throttle_seconds)
+            ),
+        )
+
+
+QUERY_APIS = ("rest", "bulk2", "auto")
+
+
+def _normalize_api(value: Any, *, name: str) -> str:
+    api = str(value).strip().lower()
+    if api not in QUERY_APIS:
+        allowed = ", ".join(QUERY_APIS)
+        raise ValueError(f"{name} must be one of {allowed}, got {value!r}")
+    return api
+
+
+@dataclass
+class ExecutionConfig:
+    """Global tuning knobs that control how queries are executed."""
+
+    api: str = "rest"
+    bulk2_threshold: int = 100_000
+    bulk2_page_size: int = 50_000
+    batch_workers: int = 1
+    max_in_flight: int = 4
+    query_workers: int = 1
+    max_query_bytes: int = 16_000
+    merge_duplicate_queries: bool = True
+    auto_dtypes: bool = False
+    validate_fields: bool = True
+    describe_ttl_seconds: int = 86400
+    cache_directory: Path = Path(".cache")
+    state_directory: Path = Path("state")
+    api_usage: ApiUsageConfig = field(default_factory=ApiUsageConfig)
+
+    @classmethod
+    def from_raw(cls, raw: Any, *, base_dir: Path) -> "ExecutionConfig":
+        if raw is None:
+            raw = {}
+        if not isinstance(raw, dict):
+            raise ValueError("Execution configuration must be a mapping")
+
+        cache_directory = Path(raw.get("cache_directory", ".cache")).expanduser()
+        if not cache_directory.is_absolute():
+            cache_directory = (base_dir / cache_directory).resolve()
+        state_directory = Path(raw.get("state_directory", "state")).expanduser()
+        if not state_directory.is_absolute():
+            state_directory = (base_dir / state_directory).resolve()
+
+        defaults = cls()
+        return cls(
+            api=_normalize_api(raw.get("api", defaults.api), name="execution.api"),
+            bulk2_threshold=int(raw.get("bulk2_threshold", defaults.bulk2_threshold)),
+            bulk2_page_size=int(raw.get("bulk2_page_size", defaults.bulk2_page_size)),
+            batch_workers=_positive_int(
+                raw.get("batch_workers", defaults.batch_workers),
+                name="execution.batch_workers",
+            ),
+            max_in_flight=_positive_int(
+                raw.get("max_in_flight", defaults.max_in_flight),
+                name="execution.max_in_flight",
+            ),
+            query_workers=_positive_int(
+                raw.get("query_workers", defaults.query_workers),
+                name="execution.query_workers",
+            ),
+            max_query_bytes=_positive_int(
+                raw.get("max_query_bytes", defaults.max_query_bytes),
+                name="execution.max_query_bytes",
+            ),
+            merge_duplicate_queries=bool(
+                raw.get("merge_duplicate_queries", defaults.merge_duplicate_queries)
+            ),
+            auto_dtypes=bool(raw.get("auto_dtypes", defaults.auto_dtypes)),
+            validate_fields=bool(raw.get("validate_fields", defaults.validate_fields)),
+            describe_ttl_seconds=_parse_duration(
+                raw.get("describe_ttl", defaults.describe_ttl_seconds),
+                name="execution.describe_ttl",
+            ),
+            cache_directory=cache_directory,
+            state_directory=state_directory,
+            api_usage=ApiUsageConfig.from_raw(raw.get("api_usage")),
         )
 
 
@@ -218,6 +483,24 @@ class QueryConfig:
     incremental: Optional[QueryIncrementalConfig] = None
     relationship_filters: List[QueryRelationshipFilter] = field(default_factory=list)
     write_output: bool = True
+    api: Optional[str] = None
+    bulk2_threshold: Optional[int] = None
+    batch_workers: Optional[int] = None
+    cache: Optional[QueryCacheConfig] = None
+    watermark: Optional[QueryWatermarkConfig] = None
+    dtypes: Optional[ColumnTypesConfig] = None
+    # True when ``where`` was rendered from the incremental window rather
+    # than configured explicitly.
+    where_from_incremental: bool = False
+
+    @property
+    def sobject(self) -> Optional[str]:
+        parts = split_select(self.soql)
+        return parts[1] if parts else None
+
+    def select_fields(self) -> List[str]:
+        parts = split_select(self.soql)
+        return parts[0] if parts else []
 
     def build_query(self, additional_conditions: Iterable[str] = ()) -> str:
         conditions = []
@@ -237,12 +520,74 @@ class QueryConfig:
         return f"{base_soql} WHERE {' AND '.join(conditions)}"
 
 
+@dataclass
+class SessionCacheConfig:
+    path: Optional[Path] = None
+    ttl_seconds: int = 7200
+    key_env: str = "SALESFORCE_SESSION_CACHE_KEY"
+
+    @classmethod
+    def from_raw(cls, raw: Any, *, base_dir: Path) -> "SessionCacheConfig":
+        if raw is None:
+            return cls()
+        if not isinstance(raw, dict):
+            raise ValueError("salesforce.session_cache must be a mapping")
+
+        defaults = cls()
+        path = None
+        if raw.get("path"):
+            path = Path(raw["path"]).expanduser()
+            if not path.is_absolute():
+                path = (base_dir / path).resolve()
+        return cls(
+            path=path,
+            ttl_seconds=_parse_duration(
+                raw.get("ttl", defaults.ttl_seconds), name="session_cache.ttl"
+            ),
+            key_env=str(raw.get("key_env", defaults.key_env)),
+        )
+
+
+@dataclass
+class TransportConfig:
+    pool_size: int = 10
+    max_retries: int = 4
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    timeout: float = 120.0
+
+    @classmethod
+    def from_raw(cls, raw: Any) -> "TransportConfig":
+        if raw is None:
+            return cls()
+        if not isinstance(raw, dict):
+            raise ValueError("salesforce.transport must be a mapping")
+
+        defaults = cls()
+        max_retries = int(raw.get("max_retries", defaults.max_retries))
+        if max_retries < 0:
+            raise ValueError("salesforce.transport.max_retries must not be negative")
+        return cls(
+            pool_size=_positive_int(
+                raw.get("pool_size", defaults.pool_size),
+                name="salesforce.transport.pool_size",
+            ),
+            max_retries=max_retries,
+            backoff_base=float(raw.get("backoff_base", defaults.backoff_base)),
+            backoff_max=float(raw.get("backoff_max", defaults.backoff_max)),
+            timeout=float(raw.get("timeout", defaults.timeout)),
+        )
+
+
 @dataclass
 class SalesforceAuth:
     username: str
     password: str
     security_token: Optional[str] = None
     domain: str = "login"
+    login_url: Optional[str] = None
+    session_cache: SessionCacheConfig = field(default_factory=SessionCacheConfig)
+    transport: TransportConfig = field(default_factory=TransportConfig)
 
 
 @dataclass
@@ -347,6 +692,18 @@ class AppConfig:
     combined_outputs: List["CombinedOutputConfig"] = field(default_factory=list)
     facility_name: Optional[str] = None
     facility_key: Optional[str] = None
+    execution: ExecutionConfig = field(default_factory=ExecutionConfig)
+    config_path: Optional[Path] = None
+
+    @property
+    def state_key(self) -> str:
+        """Name identifying this facility's persisted state."""
+
+        if self.facility_key:
+            return self.facility_key
+        if self.config_path is not None:
+            return self.config_path.stem
+        return self.facility_name or "default"
 
     @classmethod
     def load(
@@ -402,6 +759,10 @@ class AppConfig:
                 end_offset_days=int(incremental_raw.get("end_offset_days", 1)),
             )
 
+        execution = ExecutionConfig.from_raw(
+            raw_config.get("execution"), base_dir=base_dir
+        )
+
         salesforce_raw = raw_config["salesforce"]
         security_token = salesforce_raw.get("security_token")
         if security_token == "":
@@ -412,6 +773,11 @@ class AppConfig:
             password=salesforce_raw["password"],
             security_token=security_token,
             domain=salesforce_raw.get("domain", "login"),
+            login_url=(salesforce_raw.get("login_url") or "").rstrip("/") or None,
+            session_cache=SessionCacheConfig.from_raw(
+                salesforce_raw.get("session_cache"), base_dir=base_dir
+            ),
+            transport=TransportConfig.from_raw(salesforce_raw.get("transport")),
         )
 
         queries_raw: Iterable[Dict[str, Any]] = raw_config.get("queries", [])
@@ -436,6 +802,15 @@ class AppConfig:
             else:
                 write_output = bool(write_output_raw)
 
+            api_raw = query_raw.get("api")
+            api = (
+                _normalize_api(api_raw, name=f"queries[{query_raw['name']}].api")
+                if api_raw is not None
+                else None
+            )
+            bulk2_threshold_raw = query_raw.get("bulk2_threshold")
+            batch_workers_raw = query_raw.get("batch_workers")
+
             query = QueryConfig(
                 name=query_raw["name"],
                 soql=query_raw["soql"],
@@ -444,6 +819,35 @@ class AppConfig:
                 incremental=incremental_override,
                 relationship_filters=relationship_filters,
                 write_output=write_output,
+                api=api,
+                bulk2_threshold=(
+                    int(bulk2_threshold_raw)
+                    if bulk2_threshold_raw is not None
+                    else None
+                ),
+                batch_workers=(
+                    _positive_int(
+                        batch_workers_raw,
+                        name=f"queries[{query_raw['name']}].batch_workers",
+                    )
+                    if batch_workers_raw is not None
+                    else None
+                ),
+                cache=(
+                    QueryCacheConfig.from_raw(
+                        query_raw["cache"], name=f"queries[{query_raw['name']}].cache"
+                    )
+                    if query_raw.get("cache")
+                    else None
+                ),
+                watermark=QueryWatermarkConfig.from_raw(
+                    query_raw.get("watermark"),
+                    name=f"queries[{query_raw['name']}].watermark",
+                ),
+                dtypes=ColumnTypesConfig.from_raw(
+                    query_raw.get("dtypes"),
+                    name=f"queries[{query_raw['name']}].dtypes",
+                ),
             )
             queries.append(query)
 
@@ -464,6 +868,7 @@ class AppConfig:
                 query.where = incremental.render_where_clause(
                     timezone, overrides=overrides or None
                 )
+                query.where_from_incremental = True
             elif overrides:
                 missing_keys = {
                     key for key in ("field", "where_template") if not overrides.get(key)
@@ -482,8 +887,9 @@ class AppConfig:
                     end_offset_days=int(overrides.get("end_offset_days", 1)),
                 )
                 query.where = temp_incremental.render_where_clause(timezone)
+                query.where_from_incremental = True
 
-        return cls(
+        app_config = cls(
             s3=s3_info,
             csv=csv_config,
             salesforce=salesforce_auth,
@@ -493,7 +899,99 @@ class AppConfig:
             combined_outputs=combined_outputs,
             facility_name=facility_name,
             facility_key=facility_key,
+            execution=execution,
+            config_path=path,
         )
+        app_config.validate_dependencies()
+        return app_config
+
+    def semi_join_conditions(
+        self,
+        query: QueryConfig,
+        field_type: Optional[Callable[[str, str], Optional[str]]] = None,
+    ) -> Dict[int, str]:
+        """Return SOQL semi-join conditions for pushed-down relationship filters.
+
+        Maps the index of each eligible ``pushdown`` filter to a condition such
+        as ``Field IN (SELECT Id FROM Object WHERE ...)``. A filter is eligible
+        when its source query is a plain ``SELECT ... FROM object`` on another
+        sObject without relationship filters of its own, since SOQL does not
+        allow nested semi-joins or more than two per WHERE clause.
+
+        When *field_type* is given it is called with an sObject and a field
+        path and must return the Salesforce field type (or ``None`` when
+        unknown); both fields must then be ``id`` or ``reference`` fields, as
+        semi-joins require.
+        """
+
+        queries_by_name = {candidate.name: candidate for candidate in self.queries}
+        target_object = query.sobject or ""
+        conditions: Dict[int, str] = {}
+        for index, filter_config in enumerate(query.relationship_filters):
+            if not filter_config.pushdown:
+                continue
+            source = queries_by_name.get(filter_config.source_query)
+            if source is None or source.relationship_filters:
+                continue
+            parts = split_select(source.soql)
+            if parts is None or parts[2].strip():
+                continue
+            if parts[1].lower() == target_object.lower() or len(conditions) >= 2:
+                continue
+            if field_type is not None and (
+                "." in filter_config.source_field
+                or field_type(parts[1], filter_config.source_field)
+                not in SEMI_JOIN_FIELD_TYPES
+                or field_type(target_object, filter_config.target_field)
+                not in SEMI_JOIN_FIELD_TYPES
+            ):
+                continue
+
+            subquery = f"SELECT {filter_config.source_field} FROM {parts[1]}"
+            if source.where and source.where.strip():
+                subquery += f" WHERE {source.where.strip()}"
+            conditions[index] = f"{filter_config.target_field} IN ({subquery})"
+        return conditions
+
+    def dependency_graph(
+        self, field_type: Optional[Callable[[str, str], Optional[str]]] = None
+    ) -> Dict[str, List[str]]:
+        """Map every query and combined output to the steps it depends on."""
+
+        graph: Dict[str, List[str]] = {}
+        for query in self.queries:
+            pushed_down = self.semi_join_conditions(query, field_type)
+            graph[query.name] = [
+                filter_config.source_query
+                for index, filter_config in enumerate(query.relationship_filters)
+                if index not in pushed_down
+            ]
+        for combined in self.combined_outputs:
+            graph[combined.name] = combined.dependencies()
+        return graph
+
+    def validate_dependencies(self) -> None:
+        names = [query.name for query in self.queries] + [
+            combined.name for combined in self.combined_outputs
+        ]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(
+                "Query and combined output names must be unique: "
+                + ", ".join(duplicates)
+            )
+
+        graph = self.dependency_graph()
+        for name, dependencies in graph.items():
+            for dependency in dependencies:
+                if dependency not in graph:
+                    raise ValueError(
+                        f"'{name}' depends on '{dependency}' which is not defined"
+                    )
+
+        cycle = find_cycle(graph)
+        if cycle:
+            raise ValueError("Dependency cycle detected: " + " -> ".join(cycle))
 
 
 @dataclass
@@ -504,6 +1002,13 @@ class CombinedOutputConfig:
     joins: List[QueryJoinConfig] = field(default_factory=list)
     skip_joins_if_sources_empty: bool = False
 
+    def dependencies(self) -> List[str]:
+        dependencies = [self.base_query]
+        for join in self.joins:
+            if join.source_query not in dependencies:
+                dependencies.append(join.source_query)
+        return dependencies
+
     @classmethod
     def from_raw(cls, raw: Any) -> "CombinedOutputConfig":
         if not isinstance(raw, dict):
@@ -536,16 +1041,23 @@ class CombinedOutputConfig:
 
 
 __all__ = [
+    "ApiUsageConfig",
     "AppConfig",
+    "ColumnTypesConfig",
     "FacilityConfig",
     "FacilityExportConfig",
     "CsvConfig",
+    "ExecutionConfig",
     "IncrementalConfig",
+    "QueryCacheConfig",
     "QueryIncrementalConfig",
     "QueryConfig",
     "QueryJoinConfig",
     "QueryRelationshipFilter",
+    "QueryWatermarkConfig",
     "S3Info",
     "SalesforceAuth",
+    "SessionCacheConfig",
+    "TransportConfig",
     "CombinedOutputConfig",
 ]
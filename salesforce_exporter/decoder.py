@@ -0,0 +1,131 @@
+"""Column-oriented decoding of REST query pages."""
+
+from __future__ import annotations
+
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class RecordColumnsDecoder:
+    """Accumulate REST query pages straight into per-column arrays.
+
+    The column list comes from the SOQL SELECT clause (matched
+    case-insensitively against the keys Salesforce returns) so no union of
+    dict keys has to be computed, and ``attributes`` is never copied. Each
+    record is read with a single ``itemgetter`` call into a per-page block,
+    whose columns are copied into arrays sized from the query's
+    ``totalSize`` up front and grown only if more rows arrive than
+    announced. Parent relationship fields are flattened into dot-named
+    columns one relationship level at a time.
+    """
+
+    def __init__(self, fields: Sequence[str], expected_rows: int = 0) -> None:
+        self.fields = list(fields)
+        self._capacity = max(int(expected_rows), 0)
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._paths: Dict[str, Tuple[str, ...]] = {}
+        self._keys: Tuple[str, ...] = ()
+        self._rows = 0
+
+    def add_page(self, records: List[Dict[str, object]]) -> None:
+        if not records:
+            return
+        if self._columns is None:
+            self._paths = self._resolve_columns(records[0])
+            # Top-level keys to read; relationship columns share their parent's.
+            self._keys = tuple(dict.fromkeys(path[0] for path in self._paths.values()))
+            self._columns = {
+                name: np.empty(max(self._capacity, len(records)), dtype=object)
+                for name in self._paths
+            }
+
+        block = np.empty((len(records), len(self._keys)), dtype=object)
+        getter = itemgetter(*self._keys)
+        try:
+            rows = list(map(getter, records))
+        except KeyError:
+            rows = [tuple(record.get(key) for key in self._keys) for record in records]
+        if len(self._keys) == 1:
+            block[:, 0] = rows
+        else:
+            block[:] = rows
+        del rows
+
+        start = self._rows
+        end = start + len(records)
+        positions = {key: index for index, key in enumerate(self._keys)}
+        for name, values in self._columns.items():
+            if end > len(values):
+                values = np.concatenate(
+                    [values, np.empty(max(end, len(values) * 2) - len(values), object)]
+                )
+                self._columns[name] = values
+            path = self._paths[name]
+            top = block[:, positions[path[0]]]
+            values[start:end] = top if len(path) == 1 else _descend(top, path[1:])
+        self._rows = end
+
+    def to_frame(self) -> pd.DataFrame:
+        if self._columns is None or not self._rows:
+            return pd.DataFrame()
+        frame = pd.DataFrame(
+            {key: values[: self._rows] for key, values in self._columns.items()},
+            copy=False,
+        )
+        # Let each column settle on its natural dtype (float for numbers with
+        # nulls, str for text) exactly as a list-of-dicts DataFrame would.
+        return frame.infer_objects()
+
+    def _resolve_columns(self, record: Dict[str, object]) -> Dict[str, Tuple[str, ...]]:
+        """Map each output column to the key path that reads it from a record.
+
+        Plain fields use the key Salesforce returned; parent relationship
+        fields such as ``ps__Relcontact__r.Name`` become flat columns named as
+        in the SELECT clause and are read by walking the nested objects.
+        """
+
+        returned = [key for key in record if key != "attributes"]
+        by_lower = {key.lower(): key for key in returned}
+        paths: Dict[str, Tuple[str, ...]] = {}
+        for name in self.fields:
+            parts = name.split(".")
+            top = by_lower.get(parts[0].lower())
+            if top is None or "(" in name:
+                paths = {}
+                break
+            if len(parts) == 1:
+                paths[top] = (top,)
+            else:
+                paths[name] = (top,) + tuple(parts[1:])
+
+        covered = {path[0] for path in paths.values()}
+        if paths and covered == set(returned):
+            return paths
+        # Aggregate or sub-query results do not map onto the SELECT list;
+        # fall back to the keys Salesforce actually returned.
+        return {key: (key,) for key in returned}
+
+
+def _descend(parents: np.ndarray, path: Tuple[str, ...]) -> List[object]:
+    """Walk *path* through a column of nested relationship objects.
+
+    Salesforce spells a nested key the same way in every record of a
+    response, so its case is resolved once per level from the first parent
+    present; null parents yield nulls.
+    """
+
+    values: List[object] = list(parents)
+    for part in path:
+        key = part
+        first = next((value for value in values if isinstance(value, dict)), None)
+        if first is not None and part not in first:
+            lowered = part.lower()
+            key = next((name for name in first if name.lower() == lowered), part)
+        values = [value.get(key) if isinstance(value, dict) else None for value in values]
+    return values
+
+
+__all__ = ["RecordColumnsDecoder"]
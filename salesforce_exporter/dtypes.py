@@ -0,0 +1,209 @@
+"""Column dtype conversion for fetched query results."""
+
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable, Mapping, Optional
+
+import pandas as pd
+from pandas.api.types import (
+    DatetimeTZDtype,
+    is_datetime64_dtype,
+    is_object_dtype,
+    is_string_dtype,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# Salesforce serialises datetimes as 2024-01-31T09:30:00.000+0000 in REST
+# JSON (2024-01-31T09:30:00.000Z in Bulk 2.0 CSV) and dates as 2024-01-31.
+DATETIME_PATTERN = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})"
+DATE_PATTERN = r"\d{4}-\d{2}-\d{2}"
+# Text columns with at most this share of distinct values become categories.
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+# 15- or 18-character record ids; such columns are never made categories.
+RECORD_ID_PATTERN = r"[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?"
+# Salesforce field types holding record ids.
+ID_FIELD_TYPES = ("id", "reference")
+# Salesforce field types the REST API returns as JSON numbers or booleans;
+# every other type arrives as a string in both APIs.
+REST_NUMBER_TYPES = ("int", "double", "currency", "percent")
+
+
+def infer_column_type(series: pd.Series) -> Optional[str]:
+    """Guess a compact dtype for a text column, or ``None`` to leave it alone.
+
+    Only booleans, Salesforce datetimes/dates and repetitive text
+    (picklists) are detected. Digit-only text is never turned into numbers
+    because fields such as reservation numbers keep leading zeros; numeric
+    Salesforce fields already arrive as numbers. Record ids stay text so
+    join keys keep the same dtype on both sides.
+    """
+
+    if not (is_object_dtype(series.dtype) or is_string_dtype(series.dtype)):
+        return None
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return None
+    values = series.dropna()
+    if values.empty:
+        return None
+
+    text = values.astype(str)
+    if text.str.lower().isin(("true", "false")).all():
+        return "boolean"
+    if text.str.fullmatch(DATETIME_PATTERN).all():
+        return "datetime"
+    if text.str.fullmatch(DATE_PATTERN).all():
+        return "date"
+    if text.nunique() > len(text) * CATEGORY_MAX_UNIQUE_RATIO:
+        return None
+    if text.str.fullmatch(RECORD_ID_PATTERN).all():
+        return None
+    return "category"
+
+
+def cast_column(series: pd.Series, column_type: str) -> pd.Series:
+    """Convert *series* to one of :data:`config.COLUMN_TYPES`."""
+
+    if column_type == "category":
+        return series.astype("category")
+    if column_type == "boolean":
+        if series.dtype == bool or str(series.dtype) == "boolean":
+            return series.astype("boolean")
+        lowered = series.astype("string").str.lower()
+        return lowered.map({"true": True, "false": False}).astype("boolean")
+    if column_type == "Int64":
+        return pd.to_numeric(series, errors="coerce").astype("Int64")
+    if column_type == "float":
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+    if column_type == "datetime":
+        return pd.to_datetime(series, utc=True, errors="coerce", format="ISO8601")
+    if column_type == "date":
+        return pd.to_datetime(series, errors="coerce", format="ISO8601")
+    if column_type == "string":
+        return series.astype("string")
+    raise ValueError(f"Unknown column type {column_type!r}")
+
+
+def apply_column_types(
+    df: pd.DataFrame,
+    columns: Mapping[str, str],
+    *,
+    auto: bool = False,
+    keep: Iterable[str] = (),
+    name: str = "",
+) -> pd.DataFrame:
+    """Return *df* with declared (and, with *auto*, inferred) dtypes applied.
+
+    Declared columns are matched case-insensitively; columns that cannot be
+    converted are logged and left as they are. Columns named in *keep* are
+    never inferred.
+    """
+
+    if df.empty:
+        return df
+
+    declared = {column.lower(): column_type for column, column_type in columns.items()}
+    kept = {column.lower() for column in keep}
+    converted: Dict[str, pd.Series] = {}
+    for column in df.columns:
+        column_type = declared.get(str(column).lower())
+        if column_type is None and auto and str(column).lower() not in kept:
+            column_type = infer_column_type(df[column])
+        if column_type is None:
+            continue
+        try:
+            converted[column] = cast_column(df[column], column_type)
+        except (TypeError, ValueError) as exc:
+            LOGGER.warning(
+                "Could not convert column %s of %s to %s: %s",
+                column,
+                name,
+                column_type,
+                exc,
+            )
+
+    missing = set(declared) - {str(column).lower() for column in df.columns}
+    if missing:
+        LOGGER.warning(
+            "Declared dtypes for %s name unknown column(s): %s",
+            name,
+            ", ".join(sorted(missing)),
+        )
+    if not converted:
+        return df
+
+    typed = df.assign(**converted)
+    if LOGGER.isEnabledFor(logging.DEBUG):
+        LOGGER.debug(
+            "Typed %d column(s) of %s: %.1f MB -> %.1f MB",
+            len(converted),
+            name,
+            df.memory_usage(deep=True).sum() / 1e6,
+            typed.memory_usage(deep=True).sum() / 1e6,
+        )
+    return typed
+
+
+def match_rest_types(
+    df: pd.DataFrame, field_types: Mapping[str, Optional[str]]
+) -> pd.DataFrame:
+    """Give Bulk API 2.0 text columns the types the REST API would return.
+
+    *field_types* maps columns to their Salesforce field type. Numbers and
+    booleans are decoded as REST JSON would be (``int64``/``float64``,
+    ``bool``), datetimes are rewritten from ``...Z`` to REST's ``...+0000``
+    and other text is left alone, so results do not depend on which API
+    fetched them.
+    """
+
+    converted: Dict[str, pd.Series] = {}
+    for column in df.columns:
+        field_type = field_types.get(column)
+        series = df[column]
+        if field_type == "int":
+            converted[column] = pd.to_numeric(series, errors="coerce")
+        elif field_type in REST_NUMBER_TYPES:
+            converted[column] = pd.to_numeric(series, errors="coerce").astype("float64")
+        elif field_type == "boolean":
+            flags = series.astype(object).str.lower().map({"true": True, "false": False})
+            flags = flags.astype(object)
+            converted[column] = flags.where(flags.notna(), None).infer_objects()
+        elif field_type == "datetime":
+            converted[column] = series.str.replace(r"Z$", "+0000", regex=True)
+    if not converted:
+        return df
+    return df.assign(**converted)
+
+
+def format_for_csv(df: pd.DataFrame) -> pd.DataFrame:
+    """Render datetime columns the way the REST API returns them.
+
+    Timezone-aware columns become ``2024-01-31T09:30:00.000+0000`` in UTC and
+    naive columns holding only dates become ``2024-01-31``, so typed date
+    and datetime columns produce the same CSV text as untyped ones. Other
+    types are written as pandas renders them: an ``Int64`` column with
+    missing values writes ``2`` where the untyped float column wrote ``2.0``.
+    """
+
+    formatted: Dict[str, pd.Series] = {}
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, DatetimeTZDtype):
+            text = series.dt.tz_convert("UTC").dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+            formatted[column] = text.str[:-3] + "+0000"
+        elif is_datetime64_dtype(series.dtype):
+            if (series.dropna() == series.dropna().dt.normalize()).all():
+                formatted[column] = series.dt.strftime("%Y-%m-%d")
+    if not formatted:
+        return df
+    return df.assign(**formatted)
+
+
+__all__ = [
+    "apply_column_types",
+    "cast_column",
+    "format_for_csv",
+    "infer_column_type",
+    "match_rest_types",
+]
@@ -2,41 +2,293 @@
 
 from __future__ import annotations
 
+import contextlib
 import csv
+import hashlib
+import io
 import logging
+import math
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from datetime import datetime
 from itertools import product
-from typing import Dict, Iterable, List, Optional
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import quote_plus
 
 import pandas as pd
 import numpy as np
 from pandas.api.types import DatetimeTZDtype
-from simple_salesforce import Salesforce, SalesforceLogin
+from simple_salesforce.exceptions import SalesforceError, SalesforceExpiredSession
 
+from .cache import QueryResultCache
+from .cassette import Cassette
+from .client import ExporterSalesforce
 from .config import AppConfig, CombinedOutputConfig, QueryConfig, QueryJoinConfig
+from .decoder import RecordColumnsDecoder
+from .dtypes import (
+    ID_FIELD_TYPES,
+    apply_column_types,
+    format_for_csv,
+    match_rest_types,
+)
+from .joins import JoinEngine
+from .metadata import DescribeCache, validate_config
+from .planner import QueryEstimate, estimate_calls, estimate_row_bytes, format_plan
 from .s3_uploader import upload_to_s3
+from .scheduler import run_dependency_graph
+from .session import SessionManager
+from .soql import split_select, to_count_query
+from .state import WatermarkStore
+from .stays import count_prior_stays
+from .usage import ApiUsageTracker
 
 LOGGER = logging.getLogger(__name__)
 
+# Field names that can be projected straight out of a REST or Bulk result.
+SIMPLE_FIELD_PATTERN = re.compile(r"^\w+(?:\.\w+)*$")
+# Salesforce rejects SOQL statements longer than this many characters.
+MAX_SOQL_LENGTH = 100_000
+# Room reserved for the " WHERE " / " AND " joining each extra condition.
+CONDITION_OVERHEAD = len(" WHERE ")
+IN_SEPARATOR = ", "
+IN_SEPARATOR_BYTES = len(quote_plus(IN_SEPARATOR))
+# Shape of the record ids --plan assumes relationship filters collect.
+STAND_IN_ID = "a" * 18
+
+# Datasets read by _apply_custom_transformations in addition to the declared
+# base query and joins; the scheduler waits for them when they are defined.
+CUSTOM_TRANSFORMATION_SOURCES: Dict[str, Tuple[str, ...]] = {
+    "Sales_history_combined": ("Reservations_history", "Reservations_onhand"),
+    "Sales_onhand_combined": ("Reservations_history", "Reservations_onhand"),
+    "Reservations_history_combined": ("Reservations_history", "Reservations_onhand"),
+    "Reservations_onhand_combined": ("Reservations_history", "Reservations_onhand"),
+}
+
+
+def copy_on_write() -> ContextManager[Any]:
+    """Enable pandas copy-on-write for a block; it is always on from pandas 3.
+
+    Combined outputs share memory with cached query results and rely on it
+    to never modify them.
+    """
+
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return contextlib.nullcontext()
+    return pd.option_context("mode.copy_on_write", True)
+
+
+@dataclass
+class RelationshipBatchPlan:
+    """Batch queries chosen for a query's relationship filters."""
+
+    batches: List[Tuple[str, ...]]
+    post_filters: List[Tuple[str, List[str]]] = field(default_factory=list)
+    # Fields fetched only so post_filters can be applied; dropped afterwards.
+    extra_fields: List[str] = field(default_factory=list)
+    description: str = ""
+    cartesian_calls: int = 1
+
+    @property
+    def estimated_calls(self) -> int:
+        return len(self.batches)
+
+
+@dataclass
+class FilterValueStats:
+    """Number and quoted size of one relationship filter's distinct values."""
+
+    count: int
+    total_bytes: int
+    total_chars: int
+
+    @classmethod
+    def of(cls, values: List[str]) -> "FilterValueStats":
+        quoted = [SalesforceExporter._quote(value) for value in values]
+        return cls(
+            count=len(quoted),
+            total_bytes=sum(len(quote_plus(value)) for value in quoted),
+            total_chars=sum(len(value) for value in quoted),
+        )
+
+    @classmethod
+    def repeated(cls, count: int, value: str) -> "FilterValueStats":
+        """Stats of *count* distinct values as long as *value*."""
+
+        quoted = SalesforceExporter._quote(value)
+        return cls(
+            count=count,
+            total_bytes=count * len(quote_plus(quoted)),
+            total_chars=count * len(quoted),
+        )
+
+    def condition_size(self, field_name: str) -> Tuple[int, int]:
+        """URL-encoded bytes and characters of one IN condition with every value."""
+
+        empty = SalesforceExporter._build_in_condition(field_name, [])
+        separators = max(self.count - 1, 0)
+        return (
+            len(quote_plus(empty)) + self.total_bytes + separators * IN_SEPARATOR_BYTES,
+            len(empty) + self.total_chars + separators * len(IN_SEPARATOR),
+        )
+
+    def chunk_count(
+        self,
+        field_name: str,
+        *,
+        byte_budget: int,
+        char_budget: int,
+        max_values: Optional[int] = None,
+    ) -> int:
+        """Estimate how many IN conditions the values need, from their mean size."""
+
+        if not self.count:
+            return 0
+        empty = SalesforceExporter._build_in_condition(field_name, [])
+        per_chunk = min(
+            _values_per_chunk(
+                byte_budget - len(quote_plus(empty)),
+                math.ceil(self.total_bytes / self.count),
+                IN_SEPARATOR_BYTES,
+            ),
+            _values_per_chunk(
+                char_budget - len(empty),
+                math.ceil(self.total_chars / self.count),
+                len(IN_SEPARATOR),
+            ),
+        )
+        if max_values is not None:
+            per_chunk = min(per_chunk, max_values)
+        return math.ceil(self.count / per_chunk)
+
+
+def _values_per_chunk(room: int, value_size: int, separator_size: int) -> int:
+    return max((room + separator_size) // (value_size + separator_size), 1)
+
+
+@dataclass
+class RelationshipLayout:
+    """How each relationship filter of a query is applied.
+
+    The driver (and, when the SOQL cannot be widened, any ``multiplied``
+    filters) is chunked into batches; ``inlined`` filters are added whole
+    to every batch and ``local`` ones are applied after the fetch. The
+    budgets are what the chunked filters share.
+    """
+
+    driver: int
+    inlined: List[int] = field(default_factory=list)
+    local: List[int] = field(default_factory=list)
+    multiplied: List[int] = field(default_factory=list)
+    extra_fields: List[str] = field(default_factory=list)
+    byte_budget: int = 0
+    char_budget: int = 0
+    notes: List[str] = field(default_factory=list)
+    cartesian_calls: int = 1
+
+    @property
+    def chunked(self) -> List[int]:
+        return [self.driver] + self.multiplied
+
+    def chunk_budgets(self) -> Tuple[int, int]:
+        """Byte and character budget of each chunked filter's conditions."""
+
+        shares = len(self.chunked)
+        return (
+            self.byte_budget // shares - CONDITION_OVERHEAD,
+            self.char_budget // shares - CONDITION_OVERHEAD,
+        )
+
+    def describe(self, filters: List[Any], driver_chunks: int) -> str:
+        target = filters[self.driver].target_field
+        if len(filters) == 1:
+            return f"{target} in {driver_chunks} chunk(s)"
+        description = f"driving on {target} ({driver_chunks} chunk(s))"
+        if self.notes:
+            description += "; " + ", ".join(self.notes)
+        return (
+            description + f"; Cartesian plan would need {self.cartesian_calls} call(s)"
+        )
+
+
+@dataclass
+class SharedFetch:
+    """One SOQL fetch whose result is shared by several equivalent queries."""
+
+    query: QueryConfig
+    members: List[str]
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    result: Optional[pd.DataFrame] = None
+    remaining: int = 0
+
 
 class SalesforceExporter:
     """Export data from Salesforce and upload it to S3."""
 
-    def __init__(self, config: AppConfig) -> None:
+    def __init__(self, config: AppConfig, cassette: Optional[Cassette] = None) -> None:
         self.config = config
 
-        login_kwargs = {
-            "username": config.salesforce.username,
-            "password": config.salesforce.password,
-            "domain": config.salesforce.domain,
-        }
-        if config.salesforce.security_token:
-            login_kwargs["security_token"] = config.salesforce.security_token
-
-        session_id, instance = SalesforceLogin(**login_kwargs)
-        self.sf = Salesforce(instance=instance, session_id=session_id)
+        self.usage = ApiUsageTracker(config.execution.api_usage)
+        # Responses are recorded to or replayed from *cassette* when given;
+        # a replayed run never logs in.
+        self._cassette = cassette
+        self.sf: Optional[ExporterSalesforce] = None
+        if cassette is None or not cassette.replay:
+            self.sf = ExporterSalesforce(
+                config.salesforce,
+                SessionManager(config.salesforce.session_cache),
+                usage=self.usage,
+            )
+        # Caps the number of Salesforce queries running at once across all
+        # worker threads so we stay under the org's concurrency limits.
+        self._request_slots = threading.BoundedSemaphore(
+            config.execution.max_in_flight
+        )
+        self._result_cache = QueryResultCache(config.execution.cache_directory)
+        self._joins = JoinEngine()
+        # Combined outputs still to join against each source; its key index
+        # is released once the count drops to zero.
+        self._join_consumers: Dict[str, int] = {}
+        for combined in config.combined_outputs:
+            for source in {join.source_query for join in combined.joins}:
+                self._join_consumers[source] = self._join_consumers.get(source, 0) + 1
+        self._join_consumers_lock = threading.Lock()
+        self._org_key = (
+            f"{config.salesforce.login_url or config.salesforce.domain}:"
+            f"{config.salesforce.username}"
+        )
+        self._describe_cache = DescribeCache(
+            config.execution.cache_directory
+            / "describe"
+            / hashlib.sha256(self._org_key.encode("utf-8")).hexdigest()[:16],
+            config.execution.describe_ttl_seconds,
+            self._describe,
+        )
+        self._watermarks = WatermarkStore(
+            config.execution.state_directory / f"{config.state_key}.json"
+        )
+        self._pending_watermarks: Dict[str, str] = {}
+        self._failed_uploads: List[str] = []
+        self._shared_fetches: Dict[str, SharedFetch] = {}
+        if config.execution.merge_duplicate_queries:
+            self._shared_fetches = self._find_shared_fetches(config.queries)
 
     def run(self) -> None:
+        with copy_on_write():
+            self._run()
+
+    def _run(self) -> None:
         facility_label = (
             self.config.facility_name or self.config.facility_key or "single config"
         )
@@ -49,41 +301,497 @@ class SalesforceExporter:
         if self.config.csv.archive_directory:
             self.config.csv.archive_directory.mkdir(parents=True, exist_ok=True)
 
+        if self.config.execution.validate_fields:
+            self._validate_fields()
+
+        queries = {query.name: query for query in self.config.queries}
+        combined_outputs = {
+            combined.name: combined for combined in self.config.combined_outputs
+        }
+        graph = self._build_graph(queries)
+
         results_cache: Dict[str, pd.DataFrame] = {}
-        for query_config in self.config.queries:
-            df = self._export_query(query_config, results_cache)
-            results_cache[query_config.name] = df
 
-        for combined_config in self.config.combined_outputs:
-            df = self._build_combined_output(combined_config, results_cache)
-            results_cache[combined_config.name] = df
+        def run_step(name: str) -> None:
+            if name in queries:
+                df = self._export_query(queries[name], results_cache)
+            else:
+                df = self._build_combined_output(combined_outputs[name], results_cache)
+                self._release_join_sources(combined_outputs[name])
+            results_cache[name] = df
+
+        run_dependency_graph(
+            graph, run_step, max_workers=self.config.execution.query_workers
+        )
+
+        LOGGER.info("Salesforce API usage for %s:", facility_label)
+        for line in self.usage.summary_lines():
+            LOGGER.info("  %s", line)
+
+        if self._failed_uploads:
+            LOGGER.warning(
+                "Not saving watermarks because %d upload(s) failed",
+                len(self._failed_uploads),
+            )
+        elif self._cassette is not None and self._cassette.replay:
+            LOGGER.info("Not saving watermarks for a replayed run")
+        else:
+            self._watermarks.commit(self._pending_watermarks)
+
+    def _build_graph(self, queries: Dict[str, QueryConfig]) -> Dict[str, List[str]]:
+        """Return the dependency graph of the datasets this run has to produce."""
+
+        graph = self.config.dependency_graph(self._field_type)
+        for name, sources in CUSTOM_TRANSFORMATION_SOURCES.items():
+            if name in graph:
+                graph[name] = graph[name] + [
+                    source for source in sources if source in graph
+                ]
+
+        # Intermediate datasets that are only consumed through semi-joins
+        # pushed down to Salesforce never need to be fetched.
+        referenced = {source for sources in graph.values() for source in sources}
+        pushdown_sources = {
+            query.relationship_filters[index].source_query
+            for query in self.config.queries
+            for index in self.config.semi_join_conditions(query, self._field_type)
+        }
+        for name in sorted(pushdown_sources - referenced):
+            if name in queries and not queries[name].write_output:
+                LOGGER.info(
+                    "Skipping query %s because it is only used by pushed-down "
+                    "relationship filters",
+                    name,
+                )
+                del graph[name]
+        return graph
+
+    def plan(self) -> List[str]:
+        """Estimate rows, batches, API calls and bytes without fetching data.
+
+        Only ``SELECT COUNT()`` probes are issued, and none for queries whose
+        result cache entry is still fresh. Relationship filters are laid out
+        by the same code as a real run, with chunk counts computed from the
+        upstream row estimates as if each row contributed one distinct id.
+        """
+
+        if self.config.execution.validate_fields:
+            self._validate_fields()
+
+        queries = {query.name: query for query in self.config.queries}
+        graph = self._build_graph(queries)
+        estimates: Dict[str, QueryEstimate] = {}
+        probe_calls = 0
+
+        def plan_step(name: str) -> None:
+            nonlocal probe_calls
+            if name not in queries:
+                return
+            estimate, probes = self._estimate_query(queries[name], estimates)
+            probe_calls += probes
+            estimates[name] = estimate
+
+        run_dependency_graph(graph, plan_step)
+        return format_plan(list(estimates.values()), probe_calls)
+
+    def _estimate_query(
+        self,
+        query_config: QueryConfig,
+        estimates: Dict[str, QueryEstimate],
+    ) -> Tuple[QueryEstimate, int]:
+        """Estimate one query; returns the estimate and the probes it issued."""
+
+        shared = self._shared_fetches.get(query_config.name)
+        if shared is not None:
+            for member in shared.members:
+                if member in estimates and member != query_config.name:
+                    first = estimates[member]
+                    return (
+                        replace(first, name=query_config.name, shared_with=member),
+                        0,
+                    )
+
+        query_config = self._apply_watermark(query_config)
+        query_config = self._push_down_relationship_filters(query_config)
+        filtered = bool(query_config.relationship_filters)
+        rows, row_source, probes = self._estimate_rows(query_config, filtered)
+
+        api = query_config.api or self.config.execution.api
+        estimate = QueryEstimate(name=query_config.name, rows=rows, row_source=row_source)
+        if rows is None:
+            estimate.api = api
+            return estimate, probes
+
+        if row_source == "cached":
+            estimate.api = "cache"
+            estimate.calls = 1 if query_config.cache and query_config.cache.probe else 0
+            return estimate, probes
+
+        if filtered:
+            filters = query_config.relationship_filters
+            source_rows = [
+                estimates[filter_config.source_query].rows
+                if filter_config.source_query in estimates
+                else None
+                for filter_config in filters
+            ]
+            missing = [
+                filter_config.source_query
+                for filter_config, count in zip(filters, source_rows)
+                if count is None
+            ]
+            if missing:
+                estimate.plan = f"unknown ({', '.join(missing)} not estimated)"
+                estimate.api = api
+                return estimate, probes
+            if not all(source_rows):
+                estimate.batches = estimate.cartesian_batches = 0
+                estimate.plan = "no related records"
+            else:
+                stats = [
+                    FilterValueStats.repeated(count, STAND_IN_ID) for count in source_rows
+                ]
+                layout = self._layout_relationship_filters(query_config, stats)
+                byte_budget, char_budget = layout.chunk_budgets()
+                chunks = [
+                    stats[index].chunk_count(
+                        filters[index].target_field,
+                        byte_budget=byte_budget,
+                        char_budget=char_budget,
+                        max_values=filters[index].chunk_size,
+                    )
+                    for index in layout.chunked
+                ]
+                estimate.batches = math.prod(chunks)
+                estimate.cartesian_batches = (
+                    layout.cartesian_calls if len(filters) > 1 else estimate.batches
+                )
+                estimate.plan = layout.describe(filters, chunks[0])
+                query_config = self._with_fields(query_config, layout.extra_fields)
+
+        if api == "auto":
+            threshold = query_config.bulk2_threshold
+            if threshold is None:
+                threshold = self.config.execution.bulk2_threshold
+            per_batch = rows / max(estimate.batches, 1)
+            estimate.api = "bulk2" if per_batch >= threshold else "rest"
+        else:
+            estimate.api = api
+
+        estimate.calls = estimate_calls(
+            rows,
+            estimate.batches,
+            estimate.api,
+            self.config.execution.bulk2_page_size,
+        )
+        if api == "auto":
+            estimate.calls += estimate.batches
+        sobject = query_config.sobject
+        estimate.bytes = rows * estimate_row_bytes(
+            query_config.select_fields(),
+            estimate.api,
+            lambda name: (
+                self._describe_cache.resolve(sobject, name)[0]
+                if sobject is not None and SIMPLE_FIELD_PATTERN.match(name)
+                else None
+            ),
+        )
+        return estimate, probes
+
+    def _estimate_rows(
+        self, query_config: QueryConfig, filtered: bool
+    ) -> Tuple[Optional[int], str, int]:
+        """Return ``(rows, source, probes issued)`` for *query_config*."""
+
+        soql = query_config.build_query()
+        if query_config.cache is not None and not filtered:
+            key = self._result_cache.key(self._org_key, soql)
+            cached = self._result_cache.cached_rows(
+                key, max_age=query_config.cache.ttl_seconds
+            )
+            if cached is not None:
+                return cached, "cached", 0
+
+        count_query = to_count_query(soql)
+        if count_query is None:
+            return None, "not countable", 0
+        try:
+            with self._request_slots, self.usage.scope(query_config.name):
+                total = int(
+                    self._query_once(count_query, f"{query_config.name} COUNT()").get(
+                        "totalSize", 0
+                    )
+                )
+        except SalesforceError:
+            LOGGER.warning(
+                "COUNT() probe failed for %s", query_config.name, exc_info=True
+            )
+            return None, "probe failed", 1
+        # Relationship filters can only shrink the result, so the unfiltered
+        # count is an upper bound.
+        return total, "COUNT() upper bound" if filtered else "COUNT()", 1
+
+    def _describe(self, sobject: str) -> Dict[str, object]:
+        with self._request_slots, self.usage.scope("(describe)"):
+            if self._cassette is None:
+                return getattr(self._client, sobject).describe()
+            return self._cassette.call(
+                "describe",
+                sobject,
+                sobject,
+                lambda: getattr(self._client, sobject).describe(),
+            )
+
+    def _field_type(self, sobject: str, path: str) -> Optional[str]:
+        """Salesforce type of *path* on *sobject*, or ``None`` if unknown."""
+
+        if not sobject:
+            return None
+        field_config, _ = self._describe_cache.resolve(sobject, path)
+        return str(field_config.get("type")) if field_config is not None else None
+
+    @property
+    def _client(self) -> ExporterSalesforce:
+        if self.sf is None:
+            raise RuntimeError("Salesforce is not connected while replaying a cassette")
+        return self.sf
+
+    def _query_once(self, soql: str, label: str) -> Dict[str, Any]:
+        """Run a query whose answer fits one response (COUNT() and probes)."""
+
+        if self._cassette is None:
+            return self._client.query(soql)
+        return self._cassette.call("query", soql, label, lambda: self._client.query(soql))
+
+    def _pages(
+        self, kind: str, soql: str, label: str, fetch: Callable[[], Iterable[Any]]
+    ) -> Iterable[Any]:
+        """Response pages of *soql*, through the cassette when one is set."""
+
+        if self._cassette is None:
+            return fetch()
+        return self._cassette.pages(kind, soql, label, fetch)
+
+    def _validate_fields(self) -> None:
+        """Fail before any data query when the config names unknown fields."""
+
+        errors = validate_config(self.config, self._describe_cache)
+        if errors:
+            raise ValueError(
+                "Configuration does not match Salesforce metadata:\n  "
+                + "\n  ".join(errors)
+            )
+
+    def _find_shared_fetches(
+        self, queries: List[QueryConfig]
+    ) -> Dict[str, SharedFetch]:
+        """Group queries that read the same rows of the same sObject.
+
+        Queries qualify when they are plain ``SELECT field, ... FROM object``
+        statements without relationship filters; those sharing an object,
+        WHERE clause and API are served from a single fetch of the union of
+        their fields.
+        """
+
+        groups: Dict[Tuple[str, str, str], List[QueryConfig]] = {}
+        for query_config in queries:
+            parts = split_select(query_config.soql)
+            if (
+                parts is None
+                or query_config.relationship_filters
+                or query_config.cache is not None
+                or query_config.watermark is not None
+            ):
+                continue
+            fields, sobject, remainder = parts
+            if remainder.strip() or not all(
+                SIMPLE_FIELD_PATTERN.match(name) for name in fields
+            ):
+                continue
+            key = (
+                sobject.lower(),
+                " ".join((query_config.where or "").split()),
+                query_config.api or self.config.execution.api,
+            )
+            groups.setdefault(key, []).append(query_config)
+
+        shared_fetches: Dict[str, SharedFetch] = {}
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            fields: Dict[str, str] = {}
+            for member in members:
+                for name in member.select_fields():
+                    fields.setdefault(name.lower(), name)
+            first = members[0]
+            thresholds = {member.bulk2_threshold for member in members}
+            shared_query = QueryConfig(
+                name="+".join(member.name for member in members),
+                soql=f"SELECT {', '.join(fields.values())} FROM {first.sobject}",
+                where=first.where,
+                api=first.api,
+                bulk2_threshold=min(
+                    (value for value in thresholds if value is not None),
+                    default=None,
+                ),
+            )
+            shared = SharedFetch(
+                query=shared_query,
+                members=[member.name for member in members],
+                remaining=len(members),
+            )
+            LOGGER.info(
+                "Merging queries %s into a single fetch from %s",
+                ", ".join(shared.members),
+                first.sobject,
+            )
+            for member in members:
+                shared_fetches[member.name] = shared
+        return shared_fetches
+
+    def _run_shared_query(
+        self, query_config: QueryConfig, shared: SharedFetch
+    ) -> pd.DataFrame:
+        """Project *query_config*'s columns out of a fetch shared with others."""
+
+        with shared.lock:
+            if shared.result is None:
+                shared.result = self._run_single_query(shared.query, ())
+            result = shared.result
+            shared.remaining -= 1
+            if shared.remaining <= 0:
+                shared.result = None
+
+        if result.empty:
+            return pd.DataFrame()
+        columns = {column.lower(): column for column in result.columns}
+        selected = [
+            columns[name.lower()]
+            for name in query_config.select_fields()
+            if name.lower() in columns
+        ]
+        return result[selected]
+
+    def _run_cached_query(self, query_config: QueryConfig) -> pd.DataFrame:
+        """Serve *query_config* from the on-disk cache, refreshing it on a miss."""
+
+        cache_config = query_config.cache
+        if cache_config is None or self._cassette is not None:
+            # Recordings must contain every query and replays must not
+            # depend on the local result cache.
+            return self._run_single_query(query_config, ())
+        soql = query_config.build_query()
+        key = self._result_cache.key(self._org_key, soql)
+        fingerprint = (
+            self._probe_freshness(query_config) if cache_config.probe else None
+        )
+
+        cached = self._result_cache.load(
+            key, max_age=cache_config.ttl_seconds, fingerprint=fingerprint
+        )
+        if cached is not None:
+            LOGGER.info(
+                "Loaded %d cached row(s) for %s", len(cached.index), query_config.name
+            )
+            return cached
+
+        df = self._run_single_query(query_config, ())
+        self._result_cache.store(key, df, fingerprint=fingerprint)
+        return df
+
+    def _probe_freshness(self, query_config: QueryConfig) -> Optional[str]:
+        """Fingerprint the rows behind *query_config* with one aggregate query."""
+
+        sobject = query_config.sobject
+        if sobject is None:
+            return None
+        probe = f"SELECT MAX(SystemModstamp) latest, COUNT(Id) total FROM {sobject}"
+        if query_config.where and query_config.where.strip():
+            probe += f" WHERE {query_config.where.strip()}"
+
+        try:
+            with self._request_slots, self.usage.scope(query_config.name):
+                records = self._query_once(probe, f"{query_config.name} probe").get(
+                    "records", []
+                )
+        except SalesforceError:
+            LOGGER.warning(
+                "Freshness probe failed for %s; relying on the cache TTL only",
+                query_config.name,
+                exc_info=True,
+            )
+            return None
+
+        if not records:
+            return None
+        return f"{records[0].get('latest')}|{records[0].get('total')}"
 
     def _export_query(
         self,
         query_config: QueryConfig,
         results_cache: Dict[str, pd.DataFrame],
     ) -> pd.DataFrame:
-        batches = self._build_relationship_batches(query_config, results_cache)
+        query_config = self._apply_watermark(query_config)
+        query_config = self._push_down_relationship_filters(query_config)
+        plan = self._plan_relationship_batches(query_config, results_cache)
+        if plan is not None and query_config.cache is not None:
+            LOGGER.warning(
+                "Ignoring cache for %s because it uses relationship filters",
+                query_config.name,
+            )
 
         dataframes: List[pd.DataFrame] = []
-        if batches is None:
-            batches_to_process = [()]
+        if plan is None:
+            batches_to_process: List[Tuple[str, ...]] = [()]
             chunked = False
-        elif not batches:
+        elif not plan.batches:
             LOGGER.info(
                 "Skipping query %s because no related records were found",
                 query_config.name,
             )
             return pd.DataFrame()
         else:
-            batches_to_process = product(*batches)
+            LOGGER.info(
+                "Relationship filter plan for %s: %s; estimated %d call(s)",
+                query_config.name,
+                plan.description,
+                plan.estimated_calls,
+            )
+            batches_to_process = plan.batches
             chunked = True
 
-        for index, additional_conditions in enumerate(batches_to_process, start=1):
-            batch_index = index if chunked else None
-            df = self._run_single_query(
-                query_config, additional_conditions, batch_index=batch_index
+        workers = query_config.batch_workers or self.config.execution.batch_workers
+        jobs = [
+            (additional_conditions, index if chunked else None)
+            for index, additional_conditions in enumerate(batches_to_process, start=1)
+        ]
+
+        shared = self._shared_fetches.get(query_config.name) if plan is None else None
+        fetch_config = query_config
+        if plan is not None and plan.extra_fields:
+            fetch_config = self._with_fields(query_config, plan.extra_fields)
+
+        def run_batch(job: Tuple[Iterable[str], Optional[int]]) -> pd.DataFrame:
+            additional_conditions, batch_index = job
+            if shared is not None:
+                return self._run_shared_query(query_config, shared)
+            if query_config.cache is not None and batch_index is None:
+                return self._run_cached_query(query_config)
+            return self._run_single_query(
+                fetch_config, additional_conditions, batch_index=batch_index
             )
+
+        if workers > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(
+                max_workers=min(workers, len(jobs)),
+                thread_name_prefix=f"{query_config.name}-batch",
+            ) as executor:
+                # map() yields in submission order, so batches stay ordered.
+                results = list(executor.map(run_batch, jobs))
+        else:
+            results = [run_batch(job) for job in jobs]
+
+        for df in results:
             if not df.empty:
                 dataframes.append(df)
 
@@ -92,6 +800,20 @@ class SalesforceExporter:
             return pd.DataFrame()
 
         combined = pd.concat(dataframes, ignore_index=True)
+        if plan is not None and plan.post_filters:
+            combined = self._apply_post_filters(query_config, combined, plan)
+            extra = {name.lower() for name in plan.extra_fields}
+            combined = combined.drop(
+                columns=[column for column in combined.columns if column.lower() in extra]
+            )
+            if combined.empty:
+                LOGGER.warning("Query %s returned no data", query_config.name)
+                return pd.DataFrame()
+
+        combined = self._apply_column_types(query_config, combined)
+
+        if query_config.watermark is not None:
+            self._record_watermark(query_config, combined)
 
         if query_config.write_output:
             self._write_output(query_config.name, query_config.output_file, combined)
@@ -101,6 +823,51 @@ class SalesforceExporter:
             )
         return combined
 
+    @staticmethod
+    def _apply_post_filters(
+        query_config: QueryConfig, df: pd.DataFrame, plan: RelationshipBatchPlan
+    ) -> pd.DataFrame:
+        columns = {column.lower(): column for column in df.columns}
+        mask = pd.Series(True, index=df.index)
+        for target_field, values in plan.post_filters:
+            column = columns.get(target_field.lower())
+            if column is None:
+                raise ValueError(
+                    f"Field '{target_field}' not found in results of query "
+                    f"'{query_config.name}' for local relationship filtering"
+                )
+            mask &= df[column].astype(str).isin(values) & df[column].notna()
+        return df[mask].reset_index(drop=True)
+
+    def _apply_column_types(
+        self, query_config: QueryConfig, df: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Cast *df* to the query's declared or inferred dtypes at ingest."""
+
+        dtypes = query_config.dtypes
+        auto = self.config.execution.auto_dtypes
+        if dtypes is not None and dtypes.auto is not None:
+            auto = dtypes.auto
+        columns = dtypes.columns if dtypes is not None else {}
+        if not auto and not columns:
+            return df
+        keep: List[str] = []
+        if auto and query_config.sobject is not None:
+            # Declared Salesforce field types beat guessing from the values.
+            described = self._describe_cache.column_types(
+                query_config.sobject, query_config.select_fields()
+            )
+            columns = {**described, **columns}
+            keep = [
+                name
+                for name in query_config.select_fields()
+                if SIMPLE_FIELD_PATTERN.match(name)
+                and self._field_type(query_config.sobject, name) in ID_FIELD_TYPES
+            ]
+        return apply_column_types(
+            df, columns, auto=auto, keep=keep, name=query_config.name
+        )
+
     def _build_combined_output(
         self,
         combined_config: CombinedOutputConfig,
@@ -113,7 +880,9 @@ class SalesforceExporter:
                 f"'{combined_config.base_query}' which has not been executed"
             )
 
-        df = base_df.copy()
+        # Transforms below return new frames (copy-on-write), so the cached
+        # base is shared rather than copied and is never modified.
+        df = base_df
         if df.empty:
             LOGGER.warning(
                 "Combined output %s has no base rows; skipping joins",
@@ -143,15 +912,98 @@ class SalesforceExporter:
         self._write_output(combined_config.name, combined_config.output_file, df)
         return df
 
-    def _build_relationship_batches(
+    def _apply_watermark(self, query_config: QueryConfig) -> QueryConfig:
+        """Narrow the query to ``field > watermark`` once a mark is stored.
+
+        The mark replaces a WHERE clause rendered from the incremental window
+        and is ANDed onto an explicitly configured one.
+        """
+
+        if query_config.watermark is None:
+            return query_config
+
+        watermark = self._watermarks.get(query_config.name)
+        if watermark is None:
+            LOGGER.info(
+                "No watermark stored for %s yet; using the configured window",
+                query_config.name,
+            )
+            return query_config
+
+        where = f"{query_config.watermark.field} > {watermark}"
+        if (
+            query_config.where
+            and query_config.where.strip()
+            and not query_config.where_from_incremental
+        ):
+            where = f"({query_config.where.strip()}) AND {where}"
+        LOGGER.info("Fetching %s changed since %s", query_config.name, watermark)
+        return replace(query_config, where=where, where_from_incremental=False)
+
+    def _record_watermark(self, query_config: QueryConfig, df: pd.DataFrame) -> None:
+        """Remember the newest modification time seen for *query_config*."""
+
+        if query_config.watermark is None:
+            return
+        columns = {column.lower(): column for column in df.columns}
+        column = columns.get(query_config.watermark.field.lower())
+        if column is None:
+            LOGGER.warning(
+                "Watermark field %s is not selected by %s; watermark not advanced",
+                query_config.watermark.field,
+                query_config.name,
+            )
+            return
+
+        latest = pd.to_datetime(df[column], utc=True, errors="coerce").max()
+        if pd.isna(latest):
+            return
+        previous = self._watermarks.get(query_config.name)
+        if previous is not None and pd.Timestamp(previous) >= latest:
+            return
+        self._pending_watermarks[query_config.name] = (
+            latest.strftime("%Y-%m-%dT%H:%M:%S.") + f"{latest.microsecond // 1000:03d}Z"
+        )
+
+    def _push_down_relationship_filters(self, query_config: QueryConfig) -> QueryConfig:
+        """Fold eligible ``pushdown`` filters into the WHERE clause as semi-joins."""
+
+        conditions = self.config.semi_join_conditions(query_config, self._field_type)
+        if not conditions:
+            return query_config
+
+        where_parts = [query_config.where.strip()] if query_config.where else []
+        where_parts.extend(conditions.values())
+        LOGGER.info(
+            "Pushing down %d relationship filter(s) for %s as semi-joins",
+            len(conditions),
+            query_config.name,
+        )
+        return replace(
+            query_config,
+            where=" AND ".join(f"({part})" for part in where_parts),
+            relationship_filters=[
+                filter_config
+                for index, filter_config in enumerate(query_config.relationship_filters)
+                if index not in conditions
+            ],
+        )
+
+    def _collect_relationship_values(
         self,
         query_config: QueryConfig,
         results_cache: Dict[str, pd.DataFrame],
     ) -> Optional[List[List[str]]]:
+        """Return the distinct source values for each relationship filter.
+
+        ``None`` means the query has no relationship filters and an empty list
+        means at least one filter matched nothing, so the query can be skipped.
+        """
+
         if not query_config.relationship_filters:
             return None
 
-        batches: List[List[str]] = []
+        collected: List[List[str]] = []
         for filter_config in query_config.relationship_filters:
             source_df = results_cache.get(filter_config.source_query)
             if source_df is None:
@@ -177,19 +1029,219 @@ class SalesforceExporter:
             if not values:
                 return []
 
-            unique_values = list(dict.fromkeys(values))
-            chunked_conditions: List[str] = []
-            for start in range(0, len(unique_values), filter_config.chunk_size):
-                chunk = unique_values[start : start + filter_config.chunk_size]
-                condition = self._build_in_condition(filter_config.target_field, chunk)
-                chunked_conditions.append(condition)
-            batches.append(chunked_conditions)
+            collected.append(list(dict.fromkeys(values)))
+        return collected
+
+    def _query_budgets(self, query_config: QueryConfig) -> Tuple[int, int]:
+        """Return the (URL-encoded bytes, SOQL characters) left for filters."""
+
+        base_query = query_config.build_query()
+        max_query_bytes = min(
+            filter_config.max_query_bytes or self.config.execution.max_query_bytes
+            for filter_config in query_config.relationship_filters
+        )
+        return (
+            max_query_bytes - len(quote_plus(base_query)),
+            MAX_SOQL_LENGTH - len(base_query),
+        )
+
+    @staticmethod
+    def _with_fields(query_config: QueryConfig, fields: List[str]) -> QueryConfig:
+        """Return *query_config* also selecting *fields*, if its SOQL allows."""
+
+        parts = split_select(query_config.soql)
+        if parts is None or not fields:
+            return query_config
+        selected, sobject, remainder = parts
+        return replace(
+            query_config,
+            soql=f"SELECT {', '.join(selected + list(fields))} FROM {sobject}{remainder}",
+        )
+
+    def _layout_relationship_filters(
+        self, query_config: QueryConfig, stats: List[FilterValueStats]
+    ) -> RelationshipLayout:
+        """Decide how to apply each relationship filter from its value sizes.
+
+        Batching is driven by the filter with the fewest values. Other filters
+        are inlined whole into every batch when they are small enough and
+        otherwise applied locally after the fetch, selecting their target
+        field for it when needed. Only SOQL that cannot be widened that way
+        multiplies a filter into the batches.
+        """
+
+        filters = query_config.relationship_filters
+        order = sorted(range(len(filters)), key=lambda i: stats[i].count)
+        selected = {name.lower() for name in query_config.select_fields()}
+        widenable = split_select(query_config.soql) is not None
+        candidates = list(
+            dict.fromkeys(
+                filters[index].target_field
+                for index in order[1:]
+                if filters[index].target_field.lower() not in selected
+            )
+        )
+        # Budget for the widest SOQL this plan can produce.
+        byte_budget, char_budget = self._query_budgets(
+            self._with_fields(query_config, candidates)
+        )
+        layout = RelationshipLayout(
+            driver=order[0], byte_budget=byte_budget, char_budget=char_budget
+        )
+        if len(filters) == 1:
+            return layout
+
+        layout.cartesian_calls = math.prod(
+            stat.chunk_count(
+                filter_config.target_field,
+                byte_budget=byte_budget // len(filters) - CONDITION_OVERHEAD,
+                char_budget=char_budget // len(filters) - CONDITION_OVERHEAD,
+                max_values=filter_config.chunk_size,
+            )
+            for filter_config, stat in zip(filters, stats)
+        )
+        for index in order[1:]:
+            filter_config = filters[index]
+            condition_bytes, condition_chars = stats[index].condition_size(
+                filter_config.target_field
+            )
+            condition_bytes += CONDITION_OVERHEAD
+            condition_chars += CONDITION_OVERHEAD
+            if (
+                condition_bytes <= layout.byte_budget // 2
+                and condition_chars <= layout.char_budget // 2
+                and (
+                    filter_config.chunk_size is None
+                    or stats[index].count <= filter_config.chunk_size
+                )
+            ):
+                layout.inlined.append(index)
+                layout.byte_budget -= condition_bytes
+                layout.char_budget -= condition_chars
+                layout.notes.append(f"{filter_config.target_field} inlined")
+            elif filter_config.target_field.lower() in selected or widenable:
+                layout.local.append(index)
+                if filter_config.target_field.lower() not in selected:
+                    selected.add(filter_config.target_field.lower())
+                    layout.extra_fields.append(filter_config.target_field)
+                layout.notes.append(f"{filter_config.target_field} filtered locally")
+            else:
+                layout.multiplied.append(index)
+                layout.notes.append(f"{filter_config.target_field} multiplied")
+        return layout
+
+    def _plan_relationship_batches(
+        self,
+        query_config: QueryConfig,
+        results_cache: Dict[str, pd.DataFrame],
+    ) -> Optional[RelationshipBatchPlan]:
+        """Plan the batch queries needed to apply the relationship filters."""
+
+        values_per_filter = self._collect_relationship_values(
+            query_config, results_cache
+        )
+        if values_per_filter is None:
+            return None
+        if not values_per_filter:
+            return RelationshipBatchPlan(batches=[], description="no related records")
+
+        filters = query_config.relationship_filters
+        layout = self._layout_relationship_filters(
+            query_config, [FilterValueStats.of(values) for values in values_per_filter]
+        )
+        byte_budget, char_budget = layout.chunk_budgets()
+        chunk_lists = [
+            self._chunk_in_conditions(
+                filters[index].target_field,
+                values_per_filter[index],
+                byte_budget=byte_budget,
+                char_budget=char_budget,
+                max_values=filters[index].chunk_size,
+            )
+            for index in layout.chunked
+        ]
+        bounded = tuple(
+            self._build_in_condition(filters[index].target_field, values_per_filter[index])
+            for index in layout.inlined
+        )
+        return RelationshipBatchPlan(
+            batches=[bounded + combination for combination in product(*chunk_lists)],
+            post_filters=[
+                (filters[index].target_field, values_per_filter[index])
+                for index in layout.local
+            ],
+            extra_fields=layout.extra_fields,
+            description=layout.describe(filters, len(chunk_lists[0])),
+            cartesian_calls=(
+                layout.cartesian_calls if len(filters) > 1 else len(chunk_lists[0])
+            ),
+        )
+
+    @staticmethod
+    def _chunk_in_conditions(
+        field: str,
+        values: List[str],
+        *,
+        byte_budget: int,
+        char_budget: int,
+        max_values: Optional[int] = None,
+    ) -> List[str]:
+        """Pack *values* into as few ``field IN (...)`` conditions as possible.
+
+        Each condition stays within *byte_budget* once URL encoded (as it is
+        sent in the REST query string) and within *char_budget* as raw SOQL.
+        *max_values* optionally caps the number of values per condition.
+        """
+
+        separator = IN_SEPARATOR
+        separator_bytes = IN_SEPARATOR_BYTES
+        empty_condition = SalesforceExporter._build_in_condition(field, [])
+        empty_bytes = len(quote_plus(empty_condition))
+
+        conditions: List[str] = []
+        chunk: List[str] = []
+        chunk_bytes = empty_bytes
+        chunk_chars = len(empty_condition)
+        for value in values:
+            quoted = SalesforceExporter._quote(value)
+            value_bytes = len(quote_plus(quoted))
+            value_chars = len(quoted)
+            if chunk:
+                value_bytes += separator_bytes
+                value_chars += len(separator)
+
+            if chunk and (
+                chunk_bytes + value_bytes > byte_budget
+                or chunk_chars + value_chars > char_budget
+                or (max_values is not None and len(chunk) >= max_values)
+            ):
+                conditions.append(SalesforceExporter._build_in_condition(field, chunk))
+                chunk = []
+                chunk_bytes = empty_bytes
+                chunk_chars = len(empty_condition)
+                value_bytes -= separator_bytes
+                value_chars -= len(separator)
+
+            if (
+                chunk_bytes + value_bytes > byte_budget
+                or chunk_chars + value_chars > char_budget
+            ):
+                raise ValueError(
+                    f"Value {value!r} for {field} does not fit in the query size "
+                    "budget; raise max_query_bytes"
+                )
 
-        return batches
+            chunk.append(value)
+            chunk_bytes += value_bytes
+            chunk_chars += value_chars
+
+        if chunk:
+            conditions.append(SalesforceExporter._build_in_condition(field, chunk))
+        return conditions
 
     @staticmethod
     def _build_in_condition(field: str, values: Iterable[str]) -> str:
-        formatted = ", ".join(SalesforceExporter._quote(value) for value in values)
+        formatted = IN_SEPARATOR.join(SalesforceExporter._quote(value) for value in values)
         return f"{field} IN ({formatted})"
 
     @staticmethod
@@ -212,15 +1264,134 @@ class SalesforceExporter:
             )
         LOGGER.debug("SOQL: %s", query)
 
-        results = self.sf.query_all(query)
-        records = results.get("records", [])
-        for record in records:
-            record.pop("attributes", None)
+        label = query_config.name
+        if batch_index is not None:
+            label += f" batch {batch_index}"
+        with self._request_slots, self.usage.scope(query_config.name, batch_index):
+            api = self._resolve_api(query_config, query, label)
+            if api == "bulk2":
+                df = self._fetch_bulk2(query_config, query, label)
+            else:
+                df = self._fetch_rest(query, query_config.select_fields(), label)
+        if api == "bulk2" and query_config.sobject is not None:
+            # Outside the request slot: describing may need one of its own.
+            df = match_rest_types(
+                df,
+                {
+                    column: self._field_type(query_config.sobject, column)
+                    for column in df.columns
+                    if SIMPLE_FIELD_PATTERN.match(str(column))
+                },
+            )
+        self.usage.add_rows(query_config.name, len(df.index))
+        return df
+
+    def _fetch_rest(self, query: str, fields: List[str], label: str) -> pd.DataFrame:
+        """Page through a REST query, decoding each page into column arrays.
 
-        if not records:
+        Only one page of raw records is alive at a time; the columns are
+        sized from ``totalSize`` and turned into a frame once the cursor is
+        exhausted.
+        """
+
+        decoder: Optional[RecordColumnsDecoder] = None
+        for page in self._pages("query", query, label, lambda: self._rest_pages(query)):
+            if decoder is None:
+                decoder = RecordColumnsDecoder(fields, page.get("totalSize", 0))
+            decoder.add_page(page.get("records", []))
+            del page
+
+        if decoder is None:
             return pd.DataFrame()
+        return decoder.to_frame()
+
+    def _rest_pages(self, query: str) -> Iterator[Dict[str, Any]]:
+        result = self._client.query(query)
+        while True:
+            next_url = None if result.get("done", True) else result.get("nextRecordsUrl")
+            yield result
+            if not next_url:
+                return
+            del result
+            result = self._client.query_more(next_url, identifier_is_url=True)
+
+    def _resolve_api(self, query_config: QueryConfig, query: str, label: str) -> str:
+        """Decide whether *query* should go through REST or Bulk API 2.0."""
+
+        api = query_config.api or self.config.execution.api
+        if api != "auto":
+            return api
+
+        count_query = to_count_query(query)
+        if count_query is None or query_config.sobject is None:
+            return "rest"
+
+        threshold = query_config.bulk2_threshold
+        if threshold is None:
+            threshold = self.config.execution.bulk2_threshold
+        total = int(self._query_once(count_query, f"{label} COUNT()").get("totalSize", 0))
+        api = "bulk2" if total >= threshold else "rest"
+        LOGGER.info(
+            "Query %s matches %d record(s); using %s API",
+            query_config.name,
+            total,
+            api,
+        )
+        return api
+
+    def _fetch_bulk2(
+        self, query_config: QueryConfig, query: str, label: str
+    ) -> pd.DataFrame:
+        """Run *query* as a Bulk API 2.0 job and stream the CSV result pages.
+
+        Unlike REST calls, the bulk handlers do not log in again when the
+        session has expired, so the job is resubmitted once on a fresh session.
+        """
+
+        sobject = query_config.sobject
+        if sobject is None:
+            raise ValueError(
+                f"Query '{query_config.name}' must be a plain SELECT ... FROM "
+                "statement to use the Bulk API 2.0"
+            )
 
-        return pd.DataFrame(records)
+        try:
+            return self._bulk2_frame(sobject, query, label)
+        except SalesforceExpiredSession:
+            LOGGER.info(
+                "Salesforce session expired during the bulk job for %s; retrying", label
+            )
+            self._client.refresh_session()
+            return self._bulk2_frame(sobject, query, label)
+
+    def _bulk2_frame(self, sobject: str, query: str, label: str) -> pd.DataFrame:
+        frames: List[pd.DataFrame] = []
+        pages = self._pages(
+            "bulk2",
+            query,
+            label,
+            lambda: getattr(self._client.bulk2, sobject).query(
+                query, max_records=self.config.execution.bulk2_page_size
+            ),
+        )
+        for page in pages:
+            if not page or not page.strip():
+                continue
+            # Bulk results are untyped CSV; read every value as text and map
+            # empty cells to missing values like the REST API's nulls. The
+            # caller types the columns from describe metadata.
+            frame = pd.read_csv(
+                io.StringIO(page),
+                dtype=str,
+                keep_default_na=False,
+                na_values=[""],
+            )
+            if not frame.empty:
+                frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
 
     def _apply_joins(
         self,
@@ -239,35 +1410,28 @@ class SalesforceExporter:
                     f"{owner_name} requires '{join.source_query}' before joining"
                 )
 
-            other_df = other.copy()
-            if other_df.empty and skip_empty_sources:
+            if other.empty and skip_empty_sources:
                 LOGGER.warning(
                     "Skipping join for %s because %s has no rows",
                     owner_name,
                     join.source_query,
                 )
                 continue
-            left_on: Iterable[str] | str
-            right_on: Iterable[str] | str
-            if len(join.left_on) == 1:
-                left_on = join.left_on[0]
-            else:
-                left_on = list(join.left_on)
-            if len(join.right_on) == 1:
-                right_on = join.right_on[0]
-            else:
-                right_on = list(join.right_on)
-
-            suffixes = join.suffixes or ("", f"_{join.source_query}")
-            result = result.merge(
-                other_df,
-                how=join.how,
-                left_on=left_on,
-                right_on=right_on,
-                suffixes=suffixes,
-            )
+            result = self._joins.join(result, other, join)
         return result
 
+    def _release_join_sources(self, combined_config: CombinedOutputConfig) -> None:
+        """Forget join indexes of sources no remaining combined output joins."""
+
+        with self._join_consumers_lock:
+            finished = []
+            for source in {join.source_query for join in combined_config.joins}:
+                self._join_consumers[source] -= 1
+                if self._join_consumers[source] == 0:
+                    finished.append(source)
+        for source in finished:
+            self._joins.release(source)
+
     def _apply_custom_transformations(
         self,
         name: str,
@@ -312,12 +1476,13 @@ class SalesforceExporter:
         reservations_lookup = reservations_df.set_index("Id")
 
         reservation_ids = df["ps__Relreserve__c"]
-        for column in ("ps__No__c", "ps__EntryTime__c"):
-            if column not in reservations_lookup.columns:
-                continue
-            df[column] = reservation_ids.map(reservations_lookup[column])
-
-        return df
+        return df.assign(
+            **{
+                column: reservation_ids.map(reservations_lookup[column])
+                for column in ("ps__No__c", "ps__EntryTime__c")
+                if column in reservations_lookup.columns
+            }
+        )
 
     def _add_number_of_use(
         self, df: pd.DataFrame, results_cache: Dict[str, pd.DataFrame]
@@ -349,63 +1514,36 @@ class SalesforceExporter:
             reservation_frames.append(frame[list(required_columns)])
 
         if not reservation_frames:
-            df["number_of_use"] = 0
-            return df
+            return df.assign(number_of_use=0)
 
         reservations = pd.concat(reservation_frames, ignore_index=True)
         reservations = reservations.dropna(subset=[contact_column])
-        reservations = reservations[reservations[status_column] == "確定"].copy()
+        reservations = reservations[reservations[status_column] == "確定"]
         if reservations.empty:
-            df["number_of_use"] = 0
-            return df
+            return df.assign(number_of_use=0)
 
-        reservations[entry_column] = self._normalize_datetime_series(
-            reservations[entry_column]
+        reservations = reservations.assign(
+            **{entry_column: self._normalize_datetime_series(reservations[entry_column])}
         )
         reservations = reservations.dropna(subset=[entry_column])
         if reservations.empty:
-            df["number_of_use"] = 0
-            return df
+            return df.assign(number_of_use=0)
 
         now = datetime.now(self.config.timezone).replace(tzinfo=None)
-        now_timestamp = pd.Timestamp(now)
         relevant = reservations[reservations[entry_column] <= now]
         if relevant.empty:
-            df["number_of_use"] = 0
-            return df
-
-        relevant = relevant.sort_values([contact_column, entry_column, "Id"])
-        times_by_contact = {
-            contact: pd.Index(group[entry_column].tolist())
-            for contact, group in relevant.groupby(contact_column)
-        }
-
-        entry_times = self._normalize_datetime_series(df[entry_column])
-        counts: List[int] = []
-        for contact, entry_time in zip(df[contact_column], entry_times):
-            if pd.isna(contact) or pd.isna(entry_time):
-                counts.append(0)
-                continue
-
-            times = times_by_contact.get(contact)
-            if times is None or times.empty:
-                counts.append(0)
-                continue
-
-            if not isinstance(entry_time, pd.Timestamp):
-                entry_time = pd.to_datetime(entry_time, errors="coerce")
-            if pd.isna(entry_time):
-                counts.append(0)
-                continue
-
-            if entry_time <= now_timestamp:
-                index = int(times.searchsorted(entry_time, side="left"))
-            else:
-                index = int(times.searchsorted(now_timestamp, side="right"))
-            counts.append(index)
-
-        df["number_of_use"] = counts
-        return df
+            return df.assign(number_of_use=0)
+
+        # Every relevant stay is in the past, so a reservation's count is
+        # its contact's stays that started before it (all of them when it is
+        # in the future).
+        counts = count_prior_stays(
+            df[contact_column],
+            self._normalize_datetime_series(df[entry_column]),
+            relevant[contact_column],
+            relevant[entry_column],
+        )
+        return df.assign(number_of_use=counts)
 
     def _normalize_datetime_series(self, series: pd.Series) -> pd.Series:
         """Convert a datetime-like series to naive timestamps in the app timezone."""
@@ -423,15 +1561,21 @@ class SalesforceExporter:
         local_filename = f"{output_name}_{timestamp}.csv"
         local_path = self.config.csv.output_directory / local_filename
         LOGGER.info("Writing %d rows to %s", len(df.index), local_path)
-        df.to_csv(
+        format_for_csv(df).to_csv(
             local_path,
             index=False,
             quoting=csv.QUOTE_NONNUMERIC,
             encoding=self.config.csv.encoding,
         )
 
+        if self._cassette is not None and self._cassette.replay:
+            LOGGER.info("Not uploading %s from a replayed run", local_path)
+            return
+
         remote_filename = f"{self.config.s3.file_name_prefix}{local_filename}"
         uploaded = upload_to_s3(local_path, self.config.s3, remote_filename)
+        if not uploaded:
+            self._failed_uploads.append(remote_filename)
 
         if uploaded and self.config.csv.archive_directory:
             destination = self.config.csv.archive_directory / local_filename
@@ -0,0 +1,301 @@
+"""Join engine for combined outputs.
+
+Most configured joins look up a parent record (room, plan, contact) by its
+Id: every left row matches at most one right row. Those run as an indexed
+lookup - the right-hand keys are hashed into a ``pandas.Index`` once per
+source dataset and reused by every join against it, and the matching rows
+are gathered with ``take``. Joins whose right-hand keys repeat, or that
+need ``right``/``outer`` semantics, fall back to ``DataFrame.merge``.
+
+Joins with ``columns`` add only those right-hand columns, and the
+right-hand keys are matched on but not added; for ``right``/``outer`` joins
+the keys of unmatched right rows are kept in the left key columns.
+``columns: auto`` adds every column except the keys and audit fields the
+left side already has.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import ExtensionDtype, take
+
+from .config import QueryJoinConfig
+
+LOGGER = logging.getLogger(__name__)
+
+LOOKUP_JOIN_TYPES = ("left", "inner")
+# System fields describing the joined record rather than the row; with
+# ``columns: auto`` they are dropped when the left side has them already.
+AUDIT_FIELDS = frozenset(
+    name.lower()
+    for name in (
+        "CreatedById",
+        "CreatedDate",
+        "IsDeleted",
+        "LastModifiedById",
+        "LastModifiedDate",
+        "SystemModstamp",
+    )
+)
+
+
+@dataclass
+class _KeyIndex:
+    frame: pd.DataFrame
+    index: pd.Index
+    unique: bool
+
+
+class JoinEngine:
+    """Run configured joins, using indexed lookups for many-to-one joins.
+
+    Key indexes are cached per ``(source_query, right_on)`` and reused for
+    as long as the source dataset is the same object, so a dimension joined
+    by several combined outputs is hashed only once per run. Call
+    :meth:`release` once nothing joins against a source any more.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._indexes: Dict[Tuple[str, Tuple[str, ...]], _KeyIndex] = {}
+
+    def join(
+        self, left: pd.DataFrame, right: pd.DataFrame, join: QueryJoinConfig
+    ) -> pd.DataFrame:
+        suffixes = join.suffixes or ("", f"_{join.source_query}")
+        added = _added_columns(left, right, join)
+        key_index = None
+        if join.how in LOOKUP_JOIN_TYPES and len(join.left_on) == len(join.right_on):
+            key_index = self._key_index(join.source_query, right, join.right_on)
+
+        indexer = None
+        if key_index is not None and key_index.unique:
+            indexer = _lookup_indexer(left, right, join, key_index.index)
+        if indexer is None:
+            LOGGER.debug("Joining %s with DataFrame.merge", join.source_query)
+            return _merge(left, right, join, suffixes, added)
+
+        result = _assemble(left, right, join, indexer, suffixes, added)
+        if result is None:
+            return _merge(left, right, join, suffixes, added)
+        LOGGER.debug(
+            "Joined %s by indexed lookup (%d of %d row(s) matched)",
+            join.source_query,
+            int((indexer >= 0).sum()),
+            len(indexer),
+        )
+        return result
+
+    def release(self, source_query: str) -> None:
+        """Drop the cached indexes (and frame references) of *source_query*."""
+
+        with self._lock:
+            for cache_key in [key for key in self._indexes if key[0] == source_query]:
+                del self._indexes[cache_key]
+
+    def _key_index(
+        self, source_query: str, right: pd.DataFrame, keys: Tuple[str, ...]
+    ) -> Optional[_KeyIndex]:
+        if any(key not in right.columns for key in keys):
+            return None
+        cache_key = (source_query, keys)
+        with self._lock:
+            cached = self._indexes.get(cache_key)
+            if cached is not None and cached.frame is right:
+                return cached
+
+            if len(keys) == 1:
+                index = pd.Index(right[keys[0]])
+            else:
+                if right[list(keys)].isna().to_numpy().any():
+                    return None
+                index = pd.MultiIndex.from_arrays([right[key] for key in keys])
+            cached = _KeyIndex(frame=right, index=index, unique=index.is_unique)
+            self._indexes[cache_key] = cached
+        if not cached.unique:
+            LOGGER.debug(
+                "%s has repeated %s values; joins against it use DataFrame.merge",
+                source_query,
+                ", ".join(keys),
+            )
+        return cached
+
+
+def _added_columns(
+    left: pd.DataFrame, right: pd.DataFrame, join: QueryJoinConfig
+) -> List[str]:
+    """Right-hand columns the join adds to *left*, in output order."""
+
+    if join.auto_columns:
+        keys = set(join.right_on)
+        left_columns = {column.lower() for column in left.columns}
+        return [
+            column
+            for column in right.columns
+            if column not in keys
+            and not (column.lower() in AUDIT_FIELDS and column.lower() in left_columns)
+        ]
+
+    shared_keys = {
+        left_key
+        for left_key, right_key in zip(join.left_on, join.right_on)
+        if left_key == right_key
+    }
+    if join.columns is None:
+        return [column for column in right.columns if column not in shared_keys]
+
+    available = {column.lower(): column for column in right.columns}
+    missing = [name for name in join.columns if name.lower() not in available]
+    if missing:
+        raise ValueError(
+            f"Join with '{join.source_query}' selects column(s) it does not "
+            f"have: {', '.join(missing)}"
+        )
+    selected = dict.fromkeys(available[name.lower()] for name in join.columns)
+    return [column for column in selected if column not in shared_keys]
+
+
+def _merge(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    join: QueryJoinConfig,
+    suffixes: Tuple[str, str],
+    added: List[str],
+) -> pd.DataFrame:
+    left_on = list(join.left_on)
+    right_on = list(join.right_on)
+    if not join.projected:
+        return left.merge(
+            right,
+            how=join.how,
+            left_on=left_on[0] if len(left_on) == 1 else left_on,
+            right_on=right_on[0] if len(right_on) == 1 else right_on,
+            suffixes=suffixes,
+        )
+
+    # Match on renamed copies of the keys so they can be dropped afterwards
+    # without touching same-named columns on either side.
+    match_keys = [f"__join_key_{index}__" for index in range(len(right_on))]
+    narrowed = pd.concat(
+        [right[right_on].set_axis(match_keys, axis=1), right[added]], axis=1
+    )
+    merged = left.merge(
+        narrowed,
+        how=join.how,
+        left_on=left_on,
+        right_on=match_keys,
+        suffixes=suffixes,
+    )
+    if join.how in ("right", "outer"):
+        # Right rows without a match only have the right-hand key; keep it
+        # in the left key column, as merge does for same-named keys.
+        merged = merged.assign(
+            **{
+                left_key: _coalesce(merged[left_key], merged[match_key])
+                for left_key, match_key in zip(left_on, match_keys)
+            }
+        )
+    return merged.drop(columns=match_keys)
+
+
+def _coalesce(primary: pd.Series, fallback: pd.Series) -> pd.Series:
+    if isinstance(primary.dtype, pd.CategoricalDtype) and primary.dtype != fallback.dtype:
+        primary = primary.astype(object)
+    return primary.where(primary.notna(), fallback)
+
+
+def _lookup_indexer(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    join: QueryJoinConfig,
+    index: pd.Index,
+) -> Optional[np.ndarray]:
+    """Positions of each left row's match in *right* (``-1`` for none).
+
+    Returns ``None`` unless every key pair has the same dtype: ``merge``
+    coerces mismatched keys (and un-categorises categorical ones), which the
+    lookup would not reproduce.
+    """
+
+    for left_key, right_key in zip(join.left_on, join.right_on):
+        if left_key not in left.columns or left[left_key].dtype != right[right_key].dtype:
+            return None
+
+    if len(join.left_on) == 1:
+        keys = left[join.left_on[0]]
+        if isinstance(keys.dtype, pd.CategoricalDtype):
+            # Look up each category once and expand through the codes; code
+            # -1 (missing) matches a missing right key, as it does in merge.
+            missing = int(np.flatnonzero(index.isna())[0]) if index.hasnans else -1
+            by_category = np.append(index.get_indexer(keys.cat.categories), missing)
+            return by_category[keys.cat.codes.to_numpy()]
+        return index.get_indexer(pd.Index(keys))
+    target = pd.MultiIndex.from_arrays([left[key] for key in join.left_on])
+    return index.get_indexer(target)
+
+
+def _take(
+    series: pd.Series, indexer: np.ndarray, allow_fill: bool, name: str, index: pd.Index
+) -> pd.Series:
+    if isinstance(series.dtype, ExtensionDtype):
+        values = series.array.take(indexer, allow_fill=allow_fill)
+    else:
+        values = take(series.to_numpy(), indexer, allow_fill=allow_fill)
+    # Pass the dtype through so object columns are not re-inferred as str.
+    return pd.Series(values, index=index, name=name, dtype=values.dtype, copy=False)
+
+
+def _assemble(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    join: QueryJoinConfig,
+    indexer: np.ndarray,
+    suffixes: Tuple[str, str],
+    right_columns: List[str],
+) -> Optional[pd.DataFrame]:
+    """Build the joined frame the way ``merge`` lays it out.
+
+    Returns ``None`` when the column names would collide, so ``merge`` can
+    raise its usual error.
+    """
+
+    if join.how == "inner":
+        matched = indexer >= 0
+        if not matched.all():
+            left = left[matched]
+            indexer = indexer[matched]
+    left = left.reset_index(drop=True)
+
+    overlap = set(left.columns) & set(right_columns)
+    left_suffix, right_suffix = suffixes
+    if overlap and not (left_suffix or right_suffix):
+        return None
+
+    left_names = [
+        f"{column}{left_suffix}" if column in overlap else column
+        for column in left.columns
+    ]
+    right_names = [
+        f"{column}{right_suffix}" if column in overlap else column
+        for column in right_columns
+    ]
+    if len(set(left_names) | set(right_names)) != len(left_names) + len(right_names):
+        return None
+
+    allow_fill = bool((indexer < 0).any())
+    gathered = [
+        _take(right[column], indexer, allow_fill, name, left.index)
+        for name, column in zip(right_names, right_columns)
+    ]
+    if overlap and left_suffix:
+        left = left.set_axis(left_names, axis=1)
+    return pd.concat([left, *gathered], axis=1)
+
+
+__all__ = ["JoinEngine"]
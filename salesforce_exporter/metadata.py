@@ -0,0 +1,240 @@
+"""Cached sObject describe metadata and configuration checks against it."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import AppConfig
+from .joins import AUDIT_FIELDS
+
+LOGGER = logging.getLogger(__name__)
+
+# Salesforce field types with a natural pandas dtype; anything else (text,
+# ids, references, addresses) is left to the automatic inference.
+FIELD_TYPE_DTYPES = {
+    "boolean": "boolean",
+    "int": "Int64",
+    "double": "float",
+    "currency": "float",
+    "percent": "float",
+    "date": "date",
+    "datetime": "datetime",
+    "picklist": "category",
+}
+_FIELD_KEYS = ("name", "type", "length", "relationshipName", "referenceTo")
+
+
+class DescribeCache:
+    """Field metadata per sObject, fetched once and kept on disk for a TTL.
+
+    *fetch* is called with an sObject name and must return the result of
+    ``describe()``; only the parts needed to check field names and pick
+    dtypes are stored. When describing fails (missing permission, unknown
+    object) the object is reported as unavailable and checks are skipped.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        ttl_seconds: int,
+        fetch: Callable[[str], Dict[str, Any]],
+    ) -> None:
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._fields: Dict[str, Optional[Dict[str, Dict[str, Any]]]] = {}
+
+    def fields(self, sobject: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Return ``{lowercase field name: field}`` for *sobject*, or ``None``."""
+
+        key = sobject.lower()
+        with self._lock:
+            if key not in self._fields:
+                self._fields[key] = self._load(sobject)
+            return self._fields[key]
+
+    def _load(self, sobject: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        path = self.directory / f"{sobject.lower()}.json"
+        try:
+            with path.open("r", encoding="utf-8") as fp:
+                cached = json.load(fp)
+            if time.time() - float(cached["fetched_at"]) <= self.ttl_seconds:
+                return {field["name"].lower(): field for field in cached["fields"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        try:
+            description = self._fetch(sobject)
+        except Exception:  # simple_salesforce raises several error types here
+            LOGGER.warning(
+                "Could not describe %s; skipping field checks for it",
+                sobject,
+                exc_info=True,
+            )
+            return None
+
+        fields = [
+            {key: field.get(key) for key in _FIELD_KEYS}
+            for field in description.get("fields", [])
+        ]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(".json.tmp")
+        with temp_path.open("w", encoding="utf-8") as fp:
+            json.dump({"fetched_at": time.time(), "fields": fields}, fp)
+        os.replace(temp_path, path)
+        LOGGER.info("Cached describe metadata for %s (%d fields)", sobject, len(fields))
+        return {field["name"].lower(): field for field in fields}
+
+    def resolve(
+        self, sobject: str, path: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Look up a (possibly dotted) field path starting at *sobject*.
+
+        Returns ``(field, None)`` when found, ``(None, error)`` when the path
+        is invalid and ``(None, None)`` when it cannot be checked, e.g. for
+        polymorphic lookups or objects that could not be described.
+        """
+
+        parts = path.strip().split(".")
+        current = sobject
+        for part in parts[:-1]:
+            fields = self.fields(current)
+            if fields is None:
+                return None, None
+            relationship = next(
+                (
+                    field
+                    for field in fields.values()
+                    if (field.get("relationshipName") or "").lower() == part.lower()
+                ),
+                None,
+            )
+            if relationship is None:
+                return None, f"{current} has no relationship '{part}'"
+            targets = relationship.get("referenceTo") or []
+            if len(targets) != 1:
+                return None, None
+            current = targets[0]
+
+        fields = self.fields(current)
+        if fields is None:
+            return None, None
+        field = fields.get(parts[-1].lower())
+        if field is None:
+            return None, f"{current} has no field '{parts[-1]}'"
+        return field, None
+
+    def column_types(self, sobject: str, columns: Sequence[str]) -> Dict[str, str]:
+        """Map selected columns to dtypes derived from their Salesforce types."""
+
+        types: Dict[str, str] = {}
+        for column in columns:
+            if not _is_field_path(column):
+                continue
+            field, _ = self.resolve(sobject, column)
+            if field is None:
+                continue
+            column_type = FIELD_TYPE_DTYPES.get(str(field.get("type")))
+            if column_type is not None:
+                types[column] = column_type
+        return types
+
+
+def _is_field_path(name: str) -> bool:
+    return bool(name) and "(" not in name and " " not in name.strip()
+
+
+def _selected(config: AppConfig, query_name: str) -> Optional[Dict[str, str]]:
+    """Columns selected by query *query_name*; ``None`` if it is not a query."""
+
+    for query in config.queries:
+        if query.name == query_name:
+            return {name.lower(): name for name in query.select_fields()}
+    return None
+
+
+def validate_config(config: AppConfig, catalog: DescribeCache) -> List[str]:
+    """Check the fields a configuration refers to; return readable errors.
+
+    SELECT lists, relationship-filter fields and watermark fields are checked
+    against the described sObjects; relationship-filter sources, join keys
+    and projected join columns must be selected by the queries they are read
+    from.
+    """
+
+    errors: List[str] = []
+
+    def check(sobject: str, path: str, where: str) -> None:
+        _, error = catalog.resolve(sobject, path)
+        if error is not None:
+            errors.append(f"{where}: {error}")
+
+    for query in config.queries:
+        sobject = query.sobject
+        if sobject is None:
+            continue
+        for name in query.select_fields():
+            if _is_field_path(name):
+                check(sobject, name, f"query '{query.name}'")
+        for filter_config in query.relationship_filters:
+            check(
+                sobject,
+                filter_config.target_field,
+                f"query '{query.name}' relationship filter",
+            )
+            source = _selected(config, filter_config.source_query)
+            if source is not None and filter_config.source_field.lower() not in source:
+                errors.append(
+                    f"query '{query.name}' relationship filter: "
+                    f"'{filter_config.source_field}' is not selected by "
+                    f"'{filter_config.source_query}'"
+                )
+        if query.watermark is not None:
+            check(sobject, query.watermark.field, f"query '{query.name}' watermark")
+
+    for combined in config.combined_outputs:
+        available = _selected(config, combined.base_query)
+        for join in combined.joins:
+            right = _selected(config, join.source_query)
+            if available is None or right is None:
+                # Columns of combined outputs are only known once built.
+                break
+            for key in join.left_on:
+                if key.lower() not in available:
+                    errors.append(
+                        f"combined output '{combined.name}': join key '{key}' is "
+                        f"not a column of the rows joined with '{join.source_query}'"
+                    )
+            for key in join.right_on:
+                if key.lower() not in right:
+                    errors.append(
+                        f"combined output '{combined.name}': join key '{key}' is "
+                        f"not selected by '{join.source_query}'"
+                    )
+            for name in join.columns or ():
+                if name.lower() not in right:
+                    errors.append(
+                        f"combined output '{combined.name}': join column '{name}' is "
+                        f"not selected by '{join.source_query}'"
+                    )
+            added = right
+            if join.columns is not None:
+                requested = {name.lower() for name in join.columns}
+                added = {key: name for key, name in right.items() if key in requested}
+            elif join.auto_columns:
+                skipped = {key.lower() for key in join.right_on}
+                skipped |= AUDIT_FIELDS & set(available)
+                added = {key: name for key, name in right.items() if key not in skipped}
+            for lowered, name in added.items():
+                available.setdefault(lowered, name)
+    return errors
+
+
+__all__ = ["DescribeCache", "FIELD_TYPE_DTYPES", "validate_config"]
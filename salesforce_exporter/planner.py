@@ -0,0 +1,115 @@
+"""Estimates used by the dry-run planner."""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence
+
+# Records per REST query page (Salesforce's default batch size).
+REST_PAGE_SIZE = 2000
+# Calls to create a Bulk API 2.0 query job and poll it until it completes.
+BULK2_JOB_CALLS = 2
+# JSON overhead of one REST record: braces, separators and "attributes".
+REST_RECORD_OVERHEAD = 80
+# Rough serialised widths per Salesforce field type; text fields use half
+# their declared length up to TEXT_WIDTH_CAP.
+FIELD_TYPE_WIDTHS = {
+    "id": 20,
+    "reference": 20,
+    "boolean": 5,
+    "int": 6,
+    "double": 12,
+    "currency": 12,
+    "percent": 6,
+    "date": 12,
+    "datetime": 30,
+}
+DEFAULT_FIELD_WIDTH = 24
+TEXT_WIDTH_CAP = 120
+
+
+@dataclass
+class QueryEstimate:
+    """Projected cost of one query in a dry run."""
+
+    name: str
+    rows: Optional[int]
+    row_source: str
+    api: str = "rest"
+    batches: int = 1
+    cartesian_batches: int = 1
+    plan: str = ""
+    calls: int = 0
+    bytes: int = 0
+    shared_with: str = ""
+
+
+def estimate_row_bytes(
+    fields: Sequence[str],
+    api: str,
+    describe: Callable[[str], Optional[Any]],
+) -> int:
+    """Approximate the payload size of one record of *fields*.
+
+    *describe* returns the describe entry for a field (or ``None``); REST
+    payloads repeat every field name per record, Bulk 2.0 CSV does not.
+    """
+
+    total = 0 if api == "bulk2" else REST_RECORD_OVERHEAD
+    for name in fields:
+        field = describe(name) or {}
+        field_type = str(field.get("type") or "")
+        width = FIELD_TYPE_WIDTHS.get(field_type)
+        if width is None:
+            length = field.get("length") or 0
+            width = min(int(length) // 2, TEXT_WIDTH_CAP) if length else DEFAULT_FIELD_WIDTH
+        total += width + (3 if api == "bulk2" else len(name) + 4)
+    return total
+
+
+def estimate_calls(rows: int, batches: int, api: str, bulk2_page_size: int) -> int:
+    """Approximate the API calls needed to fetch *rows* over *batches* SOQLs."""
+
+    if batches <= 0:
+        return 0
+    if api == "bulk2":
+        pages = max(batches, math.ceil(rows / bulk2_page_size))
+        return batches * BULK2_JOB_CALLS + pages
+    return max(batches, batches - 1 + math.ceil(rows / REST_PAGE_SIZE))
+
+
+def format_plan(estimates: List[QueryEstimate], probe_calls: int) -> List[str]:
+    """Render *estimates* as report lines."""
+
+    lines: List[str] = []
+    total_calls = probe_calls
+    total_bytes = 0
+    for estimate in estimates:
+        rows = "?" if estimate.rows is None else f"{estimate.rows:,}"
+        line = (
+            f"{estimate.name}: {rows} row(s) [{estimate.row_source}], "
+            f"{estimate.api}, {estimate.batches} batch(es)"
+        )
+        if estimate.cartesian_batches != estimate.batches:
+            line += f" (Cartesian product: {estimate.cartesian_batches:,})"
+        if estimate.plan:
+            line += f", plan: {estimate.plan}"
+        if estimate.shared_with:
+            line += f", fetched together with {estimate.shared_with}"
+        else:
+            line += (
+                f", ~{estimate.calls:,} call(s), "
+                f"~{estimate.bytes / 1_000_000:,.1f} MB"
+            )
+            total_calls += estimate.calls
+            total_bytes += estimate.bytes
+        lines.append(line)
+    lines.append(
+        f"Total: ~{total_calls:,} API call(s) including {probe_calls} probe(s), "
+        f"~{total_bytes / 1_000_000:,.1f} MB"
+    )
+    return lines
+
+
+__all__ = ["QueryEstimate", "estimate_calls", "estimate_row_bytes", "format_plan"]
@@ -0,0 +1,99 @@
+"""Dependency-aware scheduling of export steps."""
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+
+LOGGER = logging.getLogger(__name__)
+
+
+def find_cycle(graph: Mapping[str, Sequence[str]]) -> Optional[List[str]]:
+    """Return one dependency cycle in *graph* as a list of names, if any."""
+
+    visiting: Dict[str, int] = {}
+    stack: List[str] = []
+
+    def visit(name: str) -> Optional[List[str]]:
+        state = visiting.get(name)
+        if state == 2:
+            return None
+        if state == 1:
+            return stack[stack.index(name) :] + [name]
+
+        visiting[name] = 1
+        stack.append(name)
+        for dependency in graph.get(name, ()):
+            cycle = visit(dependency)
+            if cycle:
+                return cycle
+        stack.pop()
+        visiting[name] = 2
+        return None
+
+    for name in graph:
+        cycle = visit(name)
+        if cycle:
+            return cycle
+    return None
+
+
+def run_dependency_graph(
+    graph: Mapping[str, Sequence[str]],
+    run_node: Callable[[str], None],
+    *,
+    max_workers: int = 1,
+) -> None:
+    """Run every node of *graph* once all of its dependencies have finished.
+
+    Ready nodes are started in the graph's insertion order, with at most
+    *max_workers* running at a time. Dependencies that are not nodes of the
+    graph are ignored. When a node fails no further nodes are started; the
+    ones already running are allowed to finish and the first error is raised.
+    """
+
+    pending = {
+        name: {dependency for dependency in dependencies if dependency in graph}
+        for name, dependencies in graph.items()
+    }
+    completed: set = set()
+    running: Dict[Future, str] = {}
+    error: Optional[BaseException] = None
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="export"
+    ) as executor:
+        while pending or running:
+            if error is None:
+                for name in list(pending):
+                    if len(running) >= max_workers:
+                        break
+                    if pending[name] <= completed:
+                        del pending[name]
+                        running[executor.submit(run_node, name)] = name
+
+            if not running:
+                if error is None and pending:
+                    # Only reachable with an unvalidated cyclic graph.
+                    raise ValueError(
+                        "Unable to schedule: " + ", ".join(sorted(pending))
+                    )
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                exc = future.exception()
+                if exc is not None:
+                    if error is None:
+                        LOGGER.error("Export step %s failed", name)
+                        error = exc
+                    continue
+                completed.add(name)
+
+    if error is not None:
+        raise error
+
+
+__all__ = ["find_cycle", "run_dependency_graph"]
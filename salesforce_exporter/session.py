@@ -0,0 +1,171 @@
+"""Salesforce session reuse across facilities and runs."""
+
+from __future__ import annotations
+
+import base64
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from simple_salesforce import SalesforceLogin
+
+from .config import SalesforceAuth, SessionCacheConfig
+from .transport import RetryingSession
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedSession:
+    session_id: str
+    instance: str
+    expires_at: float
+
+
+class SessionManager:
+    """Hand out Salesforce sessions, logging in only when necessary.
+
+    Sessions are cached per (username, domain) in memory for the lifetime of
+    the process, so facilities sharing an integration user log in once. When
+    ``session_cache.path`` is configured and the encryption passphrase is
+    available in the environment, sessions are also kept in an encrypted file
+    so later runs can reuse them until they expire.
+    """
+
+    _memory: Dict[Tuple[str, str], CachedSession] = {}
+    _memory_lock = threading.Lock()
+
+    def __init__(self, config: Optional[SessionCacheConfig] = None) -> None:
+        self.config = config or SessionCacheConfig()
+        self._fernet = None
+        if self.config.path is not None:
+            passphrase = os.environ.get(self.config.key_env)
+            if not passphrase:
+                LOGGER.warning(
+                    "%s is not set; Salesforce sessions will not be cached on disk",
+                    self.config.key_env,
+                )
+            else:
+                from cryptography.fernet import Fernet
+
+                key = base64.urlsafe_b64encode(
+                    hashlib.sha256(passphrase.encode("utf-8")).digest()
+                )
+                self._fernet = Fernet(key)
+
+    def get(self, auth: SalesforceAuth) -> Tuple[str, str]:
+        """Return ``(session_id, instance)`` for *auth*, reusing a live session."""
+
+        cache_key = (auth.username, auth.login_url or auth.domain)
+        with self._memory_lock:
+            cached = self._memory.get(cache_key)
+            if cached is None:
+                cached = self._read_disk().get(cache_key)
+                if cached is not None:
+                    self._memory[cache_key] = cached
+            if cached is not None and cached.expires_at > time.time():
+                LOGGER.debug("Reusing Salesforce session for %s", auth.username)
+                return cached.session_id, cached.instance
+        return self.refresh(auth)
+
+    def refresh(self, auth: SalesforceAuth) -> Tuple[str, str]:
+        """Log in again for *auth* and replace any cached session."""
+
+        login_kwargs = {
+            "username": auth.username,
+            "password": auth.password,
+            "domain": auth.domain,
+            "session": RetryingSession(auth.transport),
+        }
+        if auth.security_token:
+            login_kwargs["security_token"] = auth.security_token
+        if auth.login_url:
+            # SOAP login against an explicit host instead of <domain>.salesforce.com.
+            login_kwargs["scratch_url"] = auth.login_url
+
+        LOGGER.info("Logging in to Salesforce as %s", auth.username)
+        session_id, instance = SalesforceLogin(**login_kwargs)
+        cached = CachedSession(
+            session_id=session_id,
+            instance=instance,
+            expires_at=time.time() + self.config.ttl_seconds,
+        )
+        cache_key = (auth.username, auth.login_url or auth.domain)
+        with self._memory_lock:
+            self._memory[cache_key] = cached
+            self._write_disk(cache_key, cached)
+        return session_id, instance
+
+    def _read_disk(self) -> Dict[Tuple[str, str], CachedSession]:
+        if self._fernet is None or self.config.path is None:
+            return {}
+        try:
+            payload = self._fernet.decrypt(self.config.path.read_bytes())
+            raw = json.loads(payload.decode("utf-8"))
+        except FileNotFoundError:
+            return {}
+        except Exception:  # corrupted file or a different passphrase
+            LOGGER.warning("Ignoring unreadable session cache %s", self.config.path)
+            return {}
+
+        sessions: Dict[Tuple[str, str], CachedSession] = {}
+        for entry in raw:
+            sessions[(entry["username"], entry["domain"])] = CachedSession(
+                session_id=entry["session_id"],
+                instance=entry["instance"],
+                expires_at=float(entry["expires_at"]),
+            )
+        return sessions
+
+    def _write_disk(self, cache_key: Tuple[str, str], cached: CachedSession) -> None:
+        if self._fernet is None or self.config.path is None:
+            return
+
+        path = self.config.path
+        temp_name: Optional[str] = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # --parallel-facilities runs facilities in separate processes that
+            # share this file; the lock keeps one read-merge-write from
+            # dropping a session another process just stored.
+            with open(path.with_suffix(path.suffix + ".lock"), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                sessions = self._read_disk()
+                sessions[cache_key] = cached
+                now = time.time()
+                entries = [
+                    {
+                        "username": username,
+                        "domain": domain,
+                        "session_id": session.session_id,
+                        "instance": session.instance,
+                        "expires_at": session.expires_at,
+                    }
+                    for (username, domain), session in sessions.items()
+                    if session.expires_at > now
+                ]
+                token = self._fernet.encrypt(json.dumps(entries).encode("utf-8"))
+                # Created readable by its owner only, like mkstemp.
+                with tempfile.NamedTemporaryFile(
+                    dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False
+                ) as temp_file:
+                    temp_name = temp_file.name
+                    temp_file.write(token)
+                os.replace(temp_name, path)
+        except Exception:
+            # The session stays cached in memory; only later runs miss it.
+            LOGGER.warning("Could not write session cache %s", path, exc_info=True)
+            if temp_name is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(temp_name)
+
+
+__all__ = ["CachedSession", "SessionManager"]
@@ -0,0 +1,54 @@
+"""Lightweight helpers for inspecting SOQL statements."""
+
+from __future__ import annotations
+
+import re
+from typing import List, Optional, Tuple
+
+_SELECT_PATTERN = re.compile(
+    r"^\s*SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<sobject>\w+)(?P<remainder>.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def split_select(soql: str) -> Optional[Tuple[List[str], str, str]]:
+    """Split *soql* into its SELECT fields, FROM object and trailing clauses.
+
+    Returns ``None`` when the statement does not look like a plain
+    ``SELECT ... FROM object`` query.
+    """
+
+    match = _SELECT_PATTERN.match(soql)
+    if match is None:
+        return None
+
+    fields: List[str] = []
+    depth = 0
+    current: List[str] = []
+    for char in match.group("fields"):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            fields.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if "".join(current).strip():
+        fields.append("".join(current).strip())
+
+    return fields, match.group("sobject"), match.group("remainder")
+
+
+def to_count_query(soql: str) -> Optional[str]:
+    """Rewrite *soql* into a ``SELECT COUNT() FROM ...`` probe."""
+
+    parts = split_select(soql)
+    if parts is None:
+        return None
+    _, sobject, remainder = parts
+    return f"SELECT COUNT() FROM {sobject}{remainder}"
+
+
+__all__ = ["split_select", "to_count_query"]
@@ -0,0 +1,58 @@
+"""Persistent incremental sync state."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+
+class WatermarkStore:
+    """High-water marks per query, persisted as one JSON file per facility."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._watermarks: Dict[str, str] = self._read()
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            with self.path.open("r", encoding="utf-8") as fp:
+                raw = json.load(fp)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            LOGGER.warning("Ignoring unreadable watermark state %s", self.path)
+            return {}
+        return {str(name): str(value) for name, value in raw.items() if value}
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            return self._watermarks.get(name)
+
+    def commit(self, updates: Mapping[str, str]) -> None:
+        """Merge *updates* into the store and atomically rewrite the file."""
+
+        if not updates:
+            return
+
+        with self._lock:
+            watermarks = dict(self._watermarks)
+            watermarks.update(updates)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with temp_path.open("w", encoding="utf-8") as fp:
+                json.dump(watermarks, fp, indent=2, sort_keys=True)
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(temp_path, self.path)
+            self._watermarks = watermarks
+        LOGGER.info("Saved %d watermark(s) to %s", len(updates), self.path)
+
+
+__all__ = ["WatermarkStore"]
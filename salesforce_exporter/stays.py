@@ -0,0 +1,54 @@
+"""Vectorized counting of a guest's earlier stays."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Resolution used to compare entry times; microseconds cover every year a
+# reservation can plausibly carry, unlike nanoseconds.
+TIME_UNIT = "datetime64[us]"
+
+
+def count_prior_stays(
+    contacts: pd.Series,
+    entry_times: pd.Series,
+    stay_contacts: pd.Series,
+    stay_times: pd.Series,
+) -> np.ndarray:
+    """For each row, count the stays of the same contact that started earlier.
+
+    *contacts*/*entry_times* describe the rows to annotate and
+    *stay_contacts*/*stay_times* the stays to count (missing values are
+    never matched). Each stay is encoded as ``contact code * stride + time
+    rank`` in one sorted array, so a row's count is the distance between
+    two ``searchsorted`` positions inside its contact's block.
+    """
+
+    counts = np.zeros(len(contacts), dtype=np.int64)
+    present = stay_contacts.notna().to_numpy() & stay_times.notna().to_numpy()
+    if not present.any():
+        return counts
+
+    stay_codes, uniques = pd.factorize(stay_contacts[present].to_numpy(dtype=object))
+    times = stay_times[present].to_numpy(dtype=TIME_UNIT)
+    distinct_times = np.unique(times)
+    stride = len(distinct_times) + 1
+    keys = np.sort(stay_codes * stride + np.searchsorted(distinct_times, times))
+
+    row_codes = pd.Index(uniques).get_indexer(contacts.to_numpy(dtype=object))
+    valid = (row_codes >= 0) & entry_times.notna().to_numpy()
+    if not valid.any():
+        return counts
+
+    block_starts = row_codes[valid] * stride
+    ranks = np.searchsorted(
+        distinct_times, entry_times.to_numpy(dtype=TIME_UNIT)[valid], side="left"
+    )
+    counts[valid] = np.searchsorted(keys, block_starts + ranks) - np.searchsorted(
+        keys, block_starts
+    )
+    return counts
+
+
+__all__ = ["count_prior_stays"]
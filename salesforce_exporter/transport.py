@@ -0,0 +1,124 @@
+"""HTTP transport with connection pooling and retries for Salesforce calls."""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import TransportConfig
+from .usage import ApiUsageTracker
+
+LOGGER = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_ERROR_CODES = ("REQUEST_LIMIT_EXCEEDED", "SERVER_UNAVAILABLE")
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class RetryingSession(requests.Session):
+    """``requests.Session`` that retries transient Salesforce failures.
+
+    Every request (one query page, one batch, one Bulk API call) is retried on
+    its own with jittered exponential backoff, honouring ``Retry-After`` when
+    the server sends it. Connection errors and retryable responses are only
+    retried for idempotent methods, except 429/503 which mean the request was
+    refused before being processed. When an :class:`ApiUsageTracker` is given,
+    every response is recorded with it.
+    """
+
+    def __init__(
+        self, config: TransportConfig, usage: Optional[ApiUsageTracker] = None
+    ) -> None:
+        super().__init__()
+        self.config = config
+        self.usage = usage
+        adapter = HTTPAdapter(
+            pool_connections=config.pool_size,
+            pool_maxsize=config.pool_size,
+            max_retries=0,
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(  # type: ignore[override]
+        self, method: str, url: str, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        kwargs.setdefault("timeout", self.config.timeout)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            if self.usage is not None:
+                self.usage.before_request()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if not idempotent or attempt >= self.config.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                LOGGER.warning(
+                    "%s %s failed (%s); retrying in %.1fs", method, url, exc, delay
+                )
+            else:
+                if self.usage is not None:
+                    self.usage.record_response(response)
+                if not self._should_retry(response, idempotent) or (
+                    attempt >= self.config.max_retries
+                ):
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                LOGGER.warning(
+                    "%s %s returned %d; retrying in %.1fs",
+                    method,
+                    url,
+                    response.status_code,
+                    delay,
+                )
+                response.close()
+
+            attempt += 1
+            time.sleep(delay)
+
+    @staticmethod
+    def _should_retry(response: requests.Response, idempotent: bool) -> bool:
+        if response.status_code in (429, 503):
+            return True
+        if not idempotent:
+            return False
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            return True
+        if response.status_code == 403:
+            return any(code in response.text for code in RETRYABLE_ERROR_CODES)
+        return False
+
+    def _backoff(self, attempt: int) -> float:
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * 2**attempt)
+        return random.uniform(0, ceiling)
+
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+        return min(max(delay, 0.0), self.config.backoff_max)
+
+
+__all__ = ["RetryingSession"]
@@ -0,0 +1,131 @@
+"""Accounting of Salesforce API calls made by the exporter."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+
+import requests
+from simple_salesforce import Salesforce
+
+from .config import ApiUsageConfig
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ApiLimitError(RuntimeError):
+    """Raised when the org's remaining daily API calls drop below the floor."""
+
+
+@dataclass
+class QueryUsage:
+    calls: int = 0
+    rows: int = 0
+    batches: Set[int] = field(default_factory=set)
+
+
+class ApiUsageTracker:
+    """Count API calls per query/batch and follow the ``Sforce-Limit-Info`` header.
+
+    Calls are attributed to whatever query the current thread declared with
+    :meth:`scope`; every HTTP response (one per page, job poll, etc.) counts
+    as one call.
+    """
+
+    def __init__(self, config: Optional[ApiUsageConfig] = None) -> None:
+        self.config = config or ApiUsageConfig()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._queries: Dict[str, QueryUsage] = {}
+        self.used: Optional[int] = None
+        self.limit: Optional[int] = None
+
+    @property
+    def remaining(self) -> Optional[int]:
+        if self.used is None or self.limit is None:
+            return None
+        return self.limit - self.used
+
+    @contextmanager
+    def scope(self, query: str, batch_index: Optional[int] = None) -> Iterator[None]:
+        previous = getattr(self._local, "scope", None)
+        self._local.scope = (query, batch_index)
+        try:
+            yield
+        finally:
+            self._local.scope = previous
+
+    def before_request(self) -> None:
+        """Throttle or abort when the remaining allocation is below the floor."""
+
+        floor = self.config.floor
+        remaining = self.remaining
+        if floor is None or remaining is None or remaining >= floor:
+            return
+        if self.config.action == "abort":
+            raise ApiLimitError(
+                f"Only {remaining} Salesforce API call(s) remain today "
+                f"(floor is {floor})"
+            )
+        LOGGER.warning(
+            "Only %d API call(s) remain (floor %d); pausing %.1fs",
+            remaining,
+            floor,
+            self.config.throttle_seconds,
+        )
+        time.sleep(self.config.throttle_seconds)
+
+    def record_response(self, response: requests.Response) -> None:
+        query, batch_index = getattr(self._local, "scope", None) or ("(other)", None)
+        limit_info = response.headers.get("Sforce-Limit-Info")
+        with self._lock:
+            usage = self._queries.setdefault(query, QueryUsage())
+            usage.calls += 1
+            if batch_index is not None:
+                usage.batches.add(batch_index)
+            if limit_info:
+                api_usage = Salesforce.parse_api_usage(limit_info).get("api-usage")
+                if api_usage is not None:
+                    self.used = api_usage.used
+                    self.limit = api_usage.total
+
+    def add_rows(self, query: str, rows: int) -> None:
+        with self._lock:
+            self._queries.setdefault(query, QueryUsage()).rows += rows
+
+    def summary_lines(self) -> List[str]:
+        with self._lock:
+            queries = dict(self._queries)
+
+        lines: List[str] = []
+        total_calls = 0
+        total_rows = 0
+        for name, usage in queries.items():
+            total_calls += usage.calls
+            total_rows += usage.rows
+            lines.append(
+                f"{name}: {usage.calls} call(s), {len(usage.batches) or 1} batch(es), "
+                f"{usage.rows} row(s), {self._per_thousand(usage.calls, usage.rows)} "
+                "call(s) per 1,000 rows"
+            )
+        total = (
+            f"Total: {total_calls} call(s), {total_rows} row(s), "
+            f"{self._per_thousand(total_calls, total_rows)} call(s) per 1,000 rows"
+        )
+        if self.remaining is not None:
+            total += f"; {self.remaining} of {self.limit} daily API call(s) remaining"
+        lines.append(total)
+        return lines
+
+    @staticmethod
+    def _per_thousand(calls: int, rows: int) -> str:
+        if not rows:
+            return "-"
+        return f"{calls * 1000 / rows:.2f}"
+
+
+__all__ = ["ApiLimitError", "ApiUsageTracker", "QueryUsage"]
@@ -0,0 +1,113 @@
+"""Shared fixtures: exporters that never contact Salesforce or S3."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+import pytest
+
+from benchmarks.fake_salesforce import FakeSalesforceServer
+from benchmarks.synthetic import generate
+from salesforce_exporter.cassette import LABELS_FILE, Cassette
+from salesforce_exporter.config import (
+    AppConfig,
+    CombinedOutputConfig,
+    CsvConfig,
+    ExecutionConfig,
+    QueryConfig,
+    S3Info,
+    SalesforceAuth,
+)
+from salesforce_exporter.exporter import SalesforceExporter
+from salesforce_exporter.session import SessionManager
+
+try:  # Python 3.9+
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover - Python < 3.9 not supported here
+    from backports.zoneinfo import ZoneInfo  # type: ignore
+
+
+def _config(
+    tmp_path: Path,
+    queries: List[QueryConfig],
+    combined_outputs: Optional[List[CombinedOutputConfig]],
+    execution: dict,
+    login_url: Optional[str] = None,
+) -> AppConfig:
+    config = AppConfig(
+        s3=S3Info("bucket", "key", "secret", "prefix_"),
+        csv=CsvConfig(output_directory=tmp_path / "output"),
+        salesforce=SalesforceAuth(
+            username="user", password="password", login_url=login_url
+        ),
+        queries=queries,
+        timezone=ZoneInfo("Asia/Tokyo"),
+        combined_outputs=combined_outputs or [],
+        execution=ExecutionConfig(
+            validate_fields=False,
+            cache_directory=tmp_path / "cache",
+            state_directory=tmp_path / "state",
+            **execution,
+        ),
+    )
+    config.csv.output_directory.mkdir(exist_ok=True)
+    return config
+
+
+@pytest.fixture
+def make_exporter(
+    tmp_path: Path,
+) -> Callable[..., SalesforceExporter]:
+    """Build an exporter replaying an empty recording under *tmp_path*.
+
+    Replaying keeps it offline and skips S3 uploads; anything that would
+    reach Salesforce raises ``MissingRecordingError``.
+    """
+
+    def build(
+        queries: List[QueryConfig],
+        combined_outputs: Optional[List[CombinedOutputConfig]] = None,
+        **execution: object,
+    ) -> SalesforceExporter:
+        config = _config(tmp_path, queries, combined_outputs, execution)
+        cassette_directory = tmp_path / "cassette"
+        cassette_directory.mkdir(exist_ok=True)
+        (cassette_directory / LABELS_FILE).write_text("{}", encoding="utf-8")
+        return SalesforceExporter(config, Cassette(cassette_directory, replay=True))
+
+    return build
+
+
+@pytest.fixture
+def fake_salesforce(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[FakeSalesforceServer]:
+    """A local fake org with 50 reservations and its certificate trusted."""
+
+    # Sessions are shared per process; keep other tests' logins out.
+    monkeypatch.setattr(SessionManager, "_memory", {})
+    with FakeSalesforceServer(
+        generate(50), certificate_directory=tmp_path / "certificate"
+    ) as server:
+        monkeypatch.setenv("REQUESTS_CA_BUNDLE", server.certificate)
+        yield server
+
+
+@pytest.fixture
+def make_live_exporter(
+    tmp_path: Path, fake_salesforce: FakeSalesforceServer
+) -> Callable[..., SalesforceExporter]:
+    """Build an exporter talking to :func:`fake_salesforce` over HTTPS."""
+
+    def build(
+        queries: List[QueryConfig],
+        combined_outputs: Optional[List[CombinedOutputConfig]] = None,
+        **execution: object,
+    ) -> SalesforceExporter:
+        config = _config(
+            tmp_path, queries, combined_outputs, execution, fake_salesforce.login_url
+        )
+        return SalesforceExporter(config)
+
+    return build
@@ -0,0 +1,21 @@
+"""Bulk API 2.0 fetches against the fake Salesforce server."""
+
+from __future__ import annotations
+
+from salesforce_exporter.config import QueryConfig
+
+
+def test_bulk2_job_is_resubmitted_after_session_expiry(
+    make_live_exporter, fake_salesforce
+) -> None:
+    query_config = QueryConfig(
+        name="Plans", soql="SELECT Id, Name FROM ps__Plan__c", api="bulk2"
+    )
+    exporter = make_live_exporter([query_config])
+    fake_salesforce.expire_sessions()
+
+    df = exporter._fetch_bulk2(query_config, query_config.build_query(), "Plans")
+
+    assert len(df.index) == 40
+    assert list(df.columns) == ["Id", "Name"]
+    assert exporter.sf.session_id == fake_salesforce.session_id
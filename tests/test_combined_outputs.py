@@ -0,0 +1,79 @@
+"""Combined outputs built from cached query results."""
+
+from __future__ import annotations
+
+from typing import Dict
+
+import pandas as pd
+import pytest
+
+from salesforce_exporter.config import CombinedOutputConfig, QueryConfig, QueryJoinConfig
+
+QUERIES = [
+    QueryConfig(name=name, soql=f"SELECT Id FROM {name}")
+    for name in ("Sales", "Reservations_onhand", "AccountMaster")
+]
+
+
+@pytest.fixture
+def results_cache() -> Dict[str, pd.DataFrame]:
+    return {
+        "Sales": pd.DataFrame(
+            {
+                "Id": ["S1", "S2", "S3"],
+                "ps__Relreserve__c": ["R1", "R2", None],
+                "ps__Field7__c": ["A1", "A2", "A1"],
+            }
+        ),
+        "Reservations_onhand": pd.DataFrame(
+            {
+                "Id": ["R1", "R2", "R3"],
+                "ps__No__c": ["0001", "0002", "0003"],
+                "ps__EntryTime__c": pd.to_datetime(
+                    ["2020-01-01 15:00", "2021-06-01 15:00", "2099-01-01 15:00"]
+                ),
+                "ps__Relcontact__c": ["C1", "C1", "C1"],
+                "ps__ReservedStatus__c": ["確定", "確定", "確定"],
+            }
+        ),
+        "AccountMaster": pd.DataFrame(
+            {"Id": ["A1", "A2"], "Name": ["Room", "Dinner"]}
+        ),
+    }
+
+
+@pytest.mark.parametrize(
+    "combined",
+    [
+        CombinedOutputConfig(
+            name="Sales_onhand_combined",
+            base_query="Sales",
+            joins=[
+                QueryJoinConfig(
+                    source_query="AccountMaster",
+                    left_on=("ps__Field7__c",),
+                    right_on=("Id",),
+                )
+            ],
+        ),
+        CombinedOutputConfig(name="Sales_onhand_combined", base_query="Sales"),
+        CombinedOutputConfig(
+            name="Reservations_onhand_combined", base_query="Reservations_onhand"
+        ),
+    ],
+    ids=["sales-with-join", "sales-without-join", "reservations"],
+)
+def test_combined_outputs_leave_cached_frames_unchanged(
+    make_exporter, results_cache: Dict[str, pd.DataFrame], combined
+) -> None:
+    exporter = make_exporter(QUERIES, [combined])
+    originals = {name: frame.copy(deep=True) for name, frame in results_cache.items()}
+
+    df = exporter._build_combined_output(combined, results_cache)
+
+    added = {"ps__No__c", "number_of_use"} - set(
+        results_cache[combined.base_query].columns
+    )
+    assert added & set(df.columns)
+    for name, original in originals.items():
+        pd.testing.assert_frame_equal(results_cache[name], original)
@@ -0,0 +1,101 @@
+"""Column typing of fetched query results."""
+
+from __future__ import annotations
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from salesforce_exporter.decoder import RecordColumnsDecoder
+from salesforce_exporter.dtypes import (
+    apply_column_types,
+    format_for_csv,
+    infer_column_type,
+    match_rest_types,
+)
+
+FIELD_TYPES = {
+    "Id": "id",
+    "ps__No__c": "string",
+    "ps__StayPersons__c": "int",
+    "ps__Amount__c": "currency",
+    "ps__Checked__c": "boolean",
+    "LastModifiedDate": "datetime",
+}
+
+
+def test_bulk2_columns_match_rest_types() -> None:
+    records = [
+        {
+            "attributes": {"type": "ps__Lead__c"},
+            "Id": "a0B000000000001AAA",
+            "ps__No__c": "0012",
+            "ps__StayPersons__c": 2,
+            "ps__Amount__c": 1500.0,
+            "ps__Checked__c": True,
+            "LastModifiedDate": "2024-01-31T09:30:00.000+0000",
+        },
+        {
+            "attributes": {"type": "ps__Lead__c"},
+            "Id": "a0B000000000002AAA",
+            "ps__No__c": "0013",
+            "ps__StayPersons__c": None,
+            "ps__Amount__c": 2.5,
+            "ps__Checked__c": False,
+            "LastModifiedDate": "2024-02-01T00:00:00.000+0000",
+        },
+    ]
+    decoder = RecordColumnsDecoder(list(FIELD_TYPES), len(records))
+    decoder.add_page(records)
+    rest = decoder.to_frame()
+
+    page = (
+        "Id,ps__No__c,ps__StayPersons__c,ps__Amount__c,ps__Checked__c,"
+        "LastModifiedDate\n"
+        "a0B000000000001AAA,0012,2,1500,true,2024-01-31T09:30:00.000Z\n"
+        "a0B000000000002AAA,0013,,2.5,false,2024-02-01T00:00:00.000Z\n"
+    )
+    bulk = pd.read_csv(
+        io.StringIO(page), dtype=str, keep_default_na=False, na_values=[""]
+    )
+
+    pd.testing.assert_frame_equal(match_rest_types(bulk, FIELD_TYPES), rest)
+
+
+def test_match_rest_types_keeps_missing_booleans_as_none() -> None:
+    bulk = pd.DataFrame({"ps__Checked__c": pd.Series(["true", np.nan], dtype=object)})
+
+    typed = match_rest_types(bulk, {"ps__Checked__c": "boolean"})
+
+    assert typed["ps__Checked__c"].tolist() == [True, None]
+
+
+def test_typed_datetimes_and_dates_keep_their_csv_text() -> None:
+    df = pd.DataFrame(
+        {
+            "LastModifiedDate": ["2024-01-31T09:30:00.000+0000", None],
+            "ps__ReservedDate__c": ["2024-01-31", "2024-02-01"],
+        }
+    )
+
+    typed = apply_column_types(
+        df, {"LastModifiedDate": "datetime", "ps__ReservedDate__c": "date"}
+    )
+
+    assert format_for_csv(typed).to_csv(index=False) == df.to_csv(index=False)
+
+
+def test_record_ids_are_not_inferred_as_categories() -> None:
+    contacts = pd.Series(["003000000000001AAA", "003000000000001AAA"] * 5)
+    statuses = pd.Series(["確定", "キャンセル"] * 5)
+
+    assert infer_column_type(contacts) is None
+    assert infer_column_type(statuses) == "category"
+    typed = apply_column_types(
+        pd.DataFrame({"ps__Relcontact__c": statuses}),
+        {},
+        auto=True,
+        keep=["ps__Relcontact__c"],
+    )
+    assert not isinstance(typed["ps__Relcontact__c"].dtype, pd.CategoricalDtype)
@@ -0,0 +1,77 @@
+"""Indexed lookup joins against DataFrame.merge."""
+
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from salesforce_exporter.config import QueryJoinConfig
+from salesforce_exporter.joins import JoinEngine
+
+PLAN_IDS = pd.CategoricalDtype(["P1", "P2", "P3"])
+
+
+@pytest.mark.parametrize("how", ["left", "inner"])
+@pytest.mark.parametrize("dtype", [object, PLAN_IDS], ids=["object", "category"])
+def test_lookup_matches_merge_with_missing_keys(how: str, dtype) -> None:
+    left = pd.DataFrame(
+        {
+            "Id": ["R1", "R2", "R3", "R4"],
+            "ps__Field310__c": pd.Series(["P1", None, "P3", "P2"], dtype=dtype),
+        }
+    )
+    right = pd.DataFrame(
+        {
+            "Id": pd.Series(["P1", None, "P2"], dtype=dtype),
+            "Name": ["Breakfast", "No plan", "Dinner"],
+        }
+    )
+    join = QueryJoinConfig(
+        source_query="Plan",
+        left_on=("ps__Field310__c",),
+        right_on=("Id",),
+        how=how,
+        suffixes=("", "_Plan"),
+    )
+
+    expected = left.merge(
+        right, how=how, left_on="ps__Field310__c", right_on="Id", suffixes=("", "_Plan")
+    )
+
+    pd.testing.assert_frame_equal(JoinEngine().join(left, right, join), expected)
+
+
+def test_release_forgets_cached_indexes() -> None:
+    engine = JoinEngine()
+    right = pd.DataFrame({"Id": ["P1", "P2"], "Name": ["Breakfast", "Dinner"]})
+    left = pd.DataFrame({"ps__Field310__c": ["P2"]})
+    join = QueryJoinConfig("Plan", ("ps__Field310__c",), ("Id",))
+
+    engine.join(left, right, join)
+    assert engine._indexes
+
+    engine.release("Plan")
+    assert not engine._indexes
+
+
+@pytest.mark.parametrize("how", ["right", "outer"])
+def test_projected_join_keeps_keys_of_unmatched_right_rows(how: str) -> None:
+    left = pd.DataFrame({"ps__Field310__c": ["P1", "P9"], "Nights": [1, 2]})
+    right = pd.DataFrame(
+        {"Id": ["P1", "P2"], "Name": ["Breakfast", "Dinner"], "Code": ["B", "D"]}
+    )
+    join = QueryJoinConfig(
+        source_query="Plan",
+        left_on=("ps__Field310__c",),
+        right_on=("Id",),
+        how=how,
+        columns=("Name",),
+    )
+
+    result = JoinEngine().join(left, right, join)
+
+    assert list(result.columns) == ["ps__Field310__c", "Nights", "Name"]
+    names = dict(zip(result["ps__Field310__c"], result["Name"]))
+    assert names["P1"] == "Breakfast"
+    assert names["P2"] == "Dinner"
+    assert ("P9" in names) == (how == "outer")
@@ -0,0 +1,116 @@
+"""Batch planning for queries with relationship filters."""
+
+from __future__ import annotations
+
+from typing import Dict, List
+
+import pandas as pd
+import pytest
+
+from salesforce_exporter.config import QueryConfig, QueryRelationshipFilter
+from salesforce_exporter.exporter import CONDITION_OVERHEAD
+from salesforce_exporter.planner import QueryEstimate
+
+
+def _ids(prefix: str, count: int) -> List[str]:
+    return [f"{prefix}{index:015d}" for index in range(count)]
+
+
+@pytest.fixture
+def results_cache() -> Dict[str, pd.DataFrame]:
+    return {
+        "Accounts": pd.DataFrame({"Id": _ids("001", 300)}),
+        "Owners": pd.DataFrame({"Id": _ids("005", 3000)}),
+    }
+
+
+def _contacts(fields: str = "Id, Name") -> QueryConfig:
+    return QueryConfig(
+        name="Contacts",
+        soql=f"SELECT {fields} FROM Contact",
+        write_output=False,
+        relationship_filters=[
+            QueryRelationshipFilter("Owners", "Id", "OwnerId"),
+            QueryRelationshipFilter("Accounts", "Id", "AccountId"),
+        ],
+    )
+
+
+def test_large_unselected_filter_is_fetched_and_filtered_locally(
+    make_exporter, results_cache: Dict[str, pd.DataFrame]
+) -> None:
+    query = _contacts()
+    exporter = make_exporter([query], max_query_bytes=4000)
+
+    plan = exporter._plan_relationship_batches(query, results_cache)
+
+    assert plan.extra_fields == ["OwnerId"]
+    assert [target for target, _ in plan.post_filters] == ["OwnerId"]
+    assert all(
+        len(batch) == 1 and batch[0].startswith("AccountId IN (") for batch in plan.batches
+    )
+    # The Cartesian figure is computed arithmetically; the ids all have the
+    # same length, so it matches chunking every filter for real.
+    filters = query.relationship_filters
+    byte_budget, char_budget = exporter._query_budgets(
+        exporter._with_fields(query, ["OwnerId"])
+    )
+    real = 1
+    for filter_config in filters:
+        real *= len(
+            exporter._chunk_in_conditions(
+                filter_config.target_field,
+                results_cache[filter_config.source_query]["Id"].tolist(),
+                byte_budget=byte_budget // len(filters) - CONDITION_OVERHEAD,
+                char_budget=char_budget // len(filters) - CONDITION_OVERHEAD,
+            )
+        )
+    assert plan.cartesian_calls == real > len(plan.batches)
+
+
+def test_locally_filtered_field_is_dropped_from_the_result(
+    make_exporter, results_cache: Dict[str, pd.DataFrame], monkeypatch
+) -> None:
+    query = _contacts()
+    exporter = make_exporter([query], max_query_bytes=4000)
+    owners = results_cache["Owners"]["Id"]
+    soql: List[str] = []
+
+    def fake_query(query_config, additional_conditions, batch_index=None):
+        soql.append(query_config.build_query(additional_conditions))
+        return pd.DataFrame(
+            {
+                "Id": ["003A", "003B"],
+                "Name": ["Kept", "Dropped"],
+                "OwnerId": [owners.iloc[-1], "005999999999999999"],
+            }
+        )
+
+    monkeypatch.setattr(exporter, "_run_single_query", fake_query)
+
+    result = exporter._export_query(query, results_cache)
+
+    assert all(statement.startswith("SELECT Id, Name, OwnerId FROM") for statement in soql)
+    assert list(result.columns) == ["Id", "Name"]
+    assert set(result["Name"]) == {"Kept"}
+
+
+def test_plan_estimates_the_batches_a_run_would_make(
+    make_exporter, results_cache: Dict[str, pd.DataFrame], monkeypatch
+) -> None:
+    query = _contacts()
+    exporter = make_exporter([query], max_query_bytes=4000)
+    monkeypatch.setattr(
+        exporter, "_estimate_rows", lambda *args: (10_000, "COUNT()", 1)
+    )
+    estimates = {
+        name: QueryEstimate(name=name, rows=len(frame.index), row_source="COUNT()")
+        for name, frame in results_cache.items()
+    }
+
+    estimate, _ = exporter._estimate_query(query, estimates)
+    plan = exporter._plan_relationship_batches(query, results_cache)
+
+    assert estimate.batches == len(plan.batches)
+    assert estimate.cartesian_batches == plan.cartesian_calls
+    assert estimate.plan == plan.description
@@ -0,0 +1,54 @@
+"""Encrypted on-disk session cache shared by facility processes."""
+
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from salesforce_exporter.config import SessionCacheConfig
+from salesforce_exporter.session import CachedSession, SessionManager
+
+
+@pytest.fixture
+def make_manager(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SALESFORCE_SESSION_CACHE_KEY", "passphrase")
+    return lambda path: SessionManager(SessionCacheConfig(path=path))
+
+
+def _session(index: int) -> CachedSession:
+    return CachedSession(f"00D!{index}", "example.my.salesforce.com", time.time() + 60)
+
+
+def test_concurrent_writers_keep_every_session(make_manager, tmp_path: Path) -> None:
+    path = tmp_path / "sessions.bin"
+    managers = [make_manager(path) for _ in range(16)]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        for index, manager in enumerate(managers):
+            executor.submit(manager._write_disk, (f"user{index}", "login"), _session(index))
+
+    sessions = make_manager(path)._read_disk()
+    assert {key: cached.session_id for key, cached in sessions.items()} == {
+        (f"user{index}", "login"): f"00D!{index}" for index in range(16)
+    }
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "sessions.bin",
+        "sessions.bin.lock",
+    ]
+
+
+def test_write_failure_is_logged_not_raised(
+    make_manager, tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("", encoding="utf-8")
+    manager = make_manager(blocker / "sessions.bin")
+
+    with caplog.at_level(logging.WARNING):
+        manager._write_disk(("user", "login"), _session(0))
+
+    assert "Could not write session cache" in caplog.text
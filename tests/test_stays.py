@@ -0,0 +1,78 @@
+"""Counting a guest's earlier stays for number_of_use."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from salesforce_exporter.config import QueryConfig
+from salesforce_exporter.stays import count_prior_stays
+
+
+def _times(*values):
+    return pd.Series(pd.to_datetime(list(values)))
+
+
+def test_counts_only_earlier_stays_of_the_same_contact() -> None:
+    stay_contacts = pd.Series(["C1", "C1", "C1", "C2"])
+    stay_times = _times(
+        "2020-01-01 15:00", "2021-01-01 15:00", "2022-01-01 15:00", "2020-06-01 15:00"
+    )
+
+    counts = count_prior_stays(
+        pd.Series(["C1", "C1", "C2", "C3"]),
+        _times("2021-01-01 15:00", "2021-06-01 15:00", "2020-06-01 15:00", "2023-01-01 15:00"),
+        stay_contacts,
+        stay_times,
+    )
+
+    # A stay at the same time as the row is not earlier than it.
+    assert counts.tolist() == [1, 2, 0, 0]
+
+
+def test_future_entries_count_every_past_stay() -> None:
+    counts = count_prior_stays(
+        pd.Series(["C1", "C1"]),
+        _times("2099-01-01 15:00", "2099-06-01 15:00"),
+        pd.Series(["C1", "C1", "C1"]),
+        _times("2020-01-01 15:00", "2021-01-01 15:00", "2022-01-01 15:00"),
+    )
+
+    assert counts.tolist() == [3, 3]
+
+
+def test_missing_contacts_and_entry_times_are_never_matched() -> None:
+    counts = count_prior_stays(
+        pd.Series(["C1", None, np.nan, "C1"]),
+        _times("2023-01-01", "2023-01-01", "2023-01-01", None),
+        pd.Series(["C1", None, "C1", np.nan]),
+        _times("2020-01-01", "2020-01-01", None, "2020-01-01"),
+    )
+
+    assert counts.tolist() == [1, 0, 0, 0]
+
+
+def test_number_of_use_ignores_future_and_unconfirmed_stays(make_exporter) -> None:
+    exporter = make_exporter(
+        [QueryConfig(name="Reservations_history", soql="SELECT Id FROM ps__Lead__c")]
+    )
+    reservations = pd.DataFrame(
+        {
+            "Id": ["R1", "R2", "R3", "R4", "R5"],
+            "ps__Relcontact__c": ["C1", "C1", "C1", "C1", None],
+            "ps__EntryTime__c": [
+                "2020-01-01T06:00:00.000+0000",
+                "2021-01-01T06:00:00.000+0000",
+                "2022-01-01T06:00:00.000+0000",
+                "2099-01-01T06:00:00.000+0000",
+                "2021-01-01T06:00:00.000+0000",
+            ],
+            "ps__ReservedStatus__c": ["確定", "キャンセル", "確定", "確定", "確定"],
+        }
+    )
+
+    result = exporter._add_number_of_use(
+        reservations, {"Reservations_history": reservations}
+    )
+
+    assert result["number_of_use"].tolist() == [0, 1, 1, 2, 0]
@@ -0,0 +1,125 @@
+"""Retry policy of RetryingSession, driven through a scripted adapter."""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from salesforce_exporter import transport
+from salesforce_exporter.config import TransportConfig
+from salesforce_exporter.transport import RetryingSession
+
+URL = "https://example.my.salesforce.com/services/data/v59.0/query"
+LIMIT_EXCEEDED = '[{"errorCode": "REQUEST_LIMIT_EXCEEDED", "message": "Too many"}]'
+
+Reply = Tuple[int, str, Dict[str, str]]
+
+
+class ScriptedAdapter(BaseAdapter):
+    """Answer requests from a list of ``(status, body, headers)`` replies."""
+
+    def __init__(self, replies: List[Reply]) -> None:
+        super().__init__()
+        self.replies = list(replies)
+        self.methods: List[str] = []
+
+    def send(self, request, **kwargs) -> requests.Response:  # type: ignore[override]
+        self.methods.append(request.method)
+        status, body, headers = self.replies.pop(0)
+        response = requests.Response()
+        response.status_code = status
+        response._content = body.encode("utf-8")
+        response.headers = CaseInsensitiveDict(headers)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    delays: List[float] = []
+    monkeypatch.setattr(transport.time, "sleep", delays.append)
+    return delays
+
+
+def _session(
+    replies: List[Reply], max_retries: int = 4
+) -> Tuple[RetryingSession, ScriptedAdapter]:
+    session = RetryingSession(TransportConfig(max_retries=max_retries, backoff_max=30.0))
+    adapter = ScriptedAdapter(replies)
+    session.mount("https://", adapter)
+    return session, adapter
+
+
+def _reply(status: int, body: str = "", headers: Optional[Dict[str, str]] = None) -> Reply:
+    return status, body, headers or {}
+
+
+@pytest.mark.parametrize("method", ["GET", "POST", "PATCH"])
+@pytest.mark.parametrize("status", [429, 503])
+def test_refused_requests_are_retried_for_any_method(
+    sleeps: List[float], method: str, status: int
+) -> None:
+    session, adapter = _session(
+        [_reply(status, headers={"Retry-After": "7"}), _reply(200, "{}")]
+    )
+
+    response = session.request(method, URL)
+
+    assert response.status_code == 200
+    assert adapter.methods == [method, method]
+    assert sleeps == [7.0]
+
+
+@pytest.mark.parametrize(
+    "reply",
+    [_reply(500), _reply(502), _reply(504), _reply(403, LIMIT_EXCEEDED)],
+    ids=["500", "502", "504", "403-limit"],
+)
+def test_server_errors_are_retried_only_for_idempotent_methods(
+    sleeps: List[float], reply: Reply
+) -> None:
+    session, adapter = _session([reply, _reply(200, "{}")])
+    assert session.request("GET", URL).status_code == 200
+    assert len(adapter.methods) == 2
+    assert len(sleeps) == 1 and 0 <= sleeps[0] <= 0.5
+
+    session, adapter = _session([reply, _reply(200, "{}")])
+    assert session.request("POST", URL).status_code == reply[0]
+    assert adapter.methods == ["POST"]
+
+
+def test_other_403_is_returned_without_retry(sleeps: List[float]) -> None:
+    session, adapter = _session(
+        [_reply(403, '[{"errorCode": "INSUFFICIENT_ACCESS"}]'), _reply(200, "{}")]
+    )
+
+    assert session.request("GET", URL).status_code == 403
+    assert len(adapter.methods) == 1
+    assert sleeps == []
+
+
+def test_gives_up_after_max_retries(sleeps: List[float]) -> None:
+    session, adapter = _session([_reply(503)] * 4, max_retries=2)
+
+    response = session.request("GET", URL)
+
+    assert response.status_code == 503
+    assert len(adapter.methods) == 3
+    assert len(sleeps) == 2
+    assert len(adapter.replies) == 1
+
+
+def test_retry_after_is_capped_at_backoff_max(sleeps: List[float]) -> None:
+    session, _ = _session([_reply(429, headers={"Retry-After": "600"}), _reply(200)])
+
+    session.request("GET", URL)
+
+    assert sleeps == [30.0]
@@ -0,0 +1,178 @@
+"""Incremental extraction through stored SystemModstamp watermarks."""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from simple_salesforce.exceptions import SalesforceError
+
+from salesforce_exporter import exporter as exporter_module
+from salesforce_exporter import state as state_module
+from salesforce_exporter.config import QueryConfig, QueryWatermarkConfig
+from salesforce_exporter.state import WatermarkStore
+
+LEAD_FIELDS = "Id, ps__ReservedStatus__c, ps__StayPersons__c, SystemModstamp"
+LEADS = QueryConfig(
+    name="Leads",
+    soql=f"SELECT {LEAD_FIELDS} FROM ps__Lead__c",
+    watermark=QueryWatermarkConfig(),
+)
+
+
+def _mark(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%S.000Z"
+    )
+
+
+@pytest.fixture
+def uploads(monkeypatch: pytest.MonkeyPatch):
+    """Stub S3 uploads; set ``uploads["ok"]`` to False to make them fail."""
+
+    outcome = {"ok": True}
+    monkeypatch.setattr(
+        exporter_module,
+        "upload_to_s3",
+        lambda local_path, s3_info, remote_filename: outcome["ok"],
+    )
+    return outcome
+
+
+def test_first_run_uses_configured_where_and_stores_latest_mark(
+    make_live_exporter, fake_salesforce, uploads
+) -> None:
+    modified = fake_salesforce.evaluator.objects["ps__lead__c"].columns[
+        "SystemModstamp"
+    ].values
+    query_config = QueryConfig(
+        name="Leads",
+        soql=LEADS.soql,
+        where="ps__StayPersons__c >= 2",
+        watermark=QueryWatermarkConfig(),
+    )
+    exporter = make_live_exporter([query_config])
+    assert exporter._apply_watermark(query_config) is query_config
+
+    exporter.run()
+
+    persons = fake_salesforce.evaluator.objects["ps__lead__c"].columns[
+        "ps__StayPersons__c"
+    ].values
+    with exporter._watermarks.path.open(encoding="utf-8") as fp:
+        assert json.load(fp) == {"Leads": _mark(int(modified[persons >= 2].max()))}
+
+    # The next run only asks for rows modified after the stored mark.
+    rerun = make_live_exporter([query_config])
+    assert rerun._run_single_query(rerun._apply_watermark(query_config), []).empty
+
+
+@pytest.mark.parametrize("from_incremental", [False, True], ids=["explicit", "window"])
+def test_stored_mark_is_anded_onto_explicit_where_only(
+    make_exporter, from_incremental: bool
+) -> None:
+    query_config = QueryConfig(
+        name="Leads",
+        soql=LEADS.soql,
+        where="ps__ReservedStatus__c = '確定'",
+        watermark=QueryWatermarkConfig(),
+        where_from_incremental=from_incremental,
+    )
+    exporter = make_exporter([query_config])
+    exporter._watermarks.commit({"Leads": "2024-01-01T00:00:00.000Z"})
+
+    narrowed = exporter._apply_watermark(query_config)
+
+    mark = "SystemModstamp > 2024-01-01T00:00:00.000Z"
+    if from_incremental:
+        assert narrowed.where == mark
+    else:
+        assert narrowed.where == f"(ps__ReservedStatus__c = '確定') AND {mark}"
+    assert not narrowed.where_from_incremental
+
+
+def test_watermark_is_anded_onto_explicit_where_against_fake_server(
+    make_live_exporter, fake_salesforce
+) -> None:
+    leads = fake_salesforce.evaluator.objects["ps__lead__c"]
+    modified = leads.columns["SystemModstamp"].values
+    mark = int(np.median(modified))
+    query_config = QueryConfig(
+        name="Leads",
+        soql=LEADS.soql,
+        where="ps__ReservedStatus__c = '確定' AND ps__StayPersons__c >= 2",
+        watermark=QueryWatermarkConfig(),
+    )
+    exporter = make_live_exporter([query_config])
+    exporter._watermarks.commit({"Leads": _mark(mark)})
+
+    narrowed = exporter._apply_watermark(query_config)
+    df = exporter._run_single_query(narrowed, [])
+
+    expected = (
+        (leads.columns["ps__ReservedStatus__c"].values == 0)
+        & (leads.columns["ps__StayPersons__c"].values >= 2)
+        & (modified > mark)
+    )
+    assert narrowed.build_query().endswith(
+        "WHERE (ps__ReservedStatus__c = '確定' AND ps__StayPersons__c >= 2)"
+        f" AND SystemModstamp > {_mark(mark)}"
+    )
+    assert 0 < len(df.index) == int(expected.sum())
+    assert set(df["ps__ReservedStatus__c"]) == {"確定"}
+
+
+def test_failed_upload_keeps_previous_mark(
+    make_live_exporter, fake_salesforce, uploads
+) -> None:
+    exporter = make_live_exporter([LEADS])
+    exporter._watermarks.commit({"Leads": "2000-01-01T00:00:00.000Z"})
+    uploads["ok"] = False
+
+    exporter.run()
+
+    assert exporter._pending_watermarks
+    assert WatermarkStore(exporter._watermarks.path).get("Leads") == (
+        "2000-01-01T00:00:00.000Z"
+    )
+
+
+def test_failed_query_saves_no_marks(
+    make_live_exporter, fake_salesforce, uploads
+) -> None:
+    broken = QueryConfig(name="Broken", soql="SELECT Id, NoSuchField__c FROM Contact")
+    exporter = make_live_exporter([LEADS, broken])
+
+    with pytest.raises(SalesforceError):
+        exporter.run()
+
+    assert exporter._pending_watermarks
+    assert not exporter._watermarks.path.exists()
+
+
+def test_commit_replaces_state_file_atomically(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "state" / "facility.json"
+    store = WatermarkStore(path)
+    store.commit({"Leads": "2024-01-01T00:00:00.000Z"})
+    store.commit({"Sales": "2024-02-01T00:00:00.000Z"})
+    assert json.loads(path.read_text(encoding="utf-8")) == {
+        "Leads": "2024-01-01T00:00:00.000Z",
+        "Sales": "2024-02-01T00:00:00.000Z",
+    }
+    assert [p.name for p in path.parent.iterdir()] == ["facility.json"]
+
+    def crash(source, destination):
+        raise OSError("disk full")
+
+    before = path.read_bytes()
+    monkeypatch.setattr(state_module.os, "replace", crash)
+    with pytest.raises(OSError):
+        store.commit({"Leads": "2024-03-01T00:00:00.000Z"})
+
+    assert path.read_bytes() == before
+    assert store.get("Leads") == "2024-01-01T00:00:00.000Z"
+    assert WatermarkStore(path).get("Leads") == "2024-01-01T00:00:00.000Z"